@@ -5,4 +5,5 @@ class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
 
-
+    def ready(self):
+        from . import checks, signals  # noqa: F401
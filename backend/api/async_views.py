@@ -0,0 +1,158 @@
+# backend/api/async_views.py
+"""
+Versiones async (ASGI) de las lecturas que el dashboard consulta por polling.
+
+Replican la autenticación y los permisos de las vistas DRF equivalentes, pero
+leen con el ORM async de Django para no retener un hilo del servidor mientras
+esperan a la base. Se publican bajo ``/async/...`` con la misma respuesta JSON
+que la ruta síncrona.
+"""
+
+import asyncio
+from functools import wraps
+from time import monotonic
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.http.response import HttpResponseBase
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+
+from .db_routers import is_primary_sticky, replica_reads
+from .estado import aestado_arriendos_rows, aestado_bodega_rows
+from .events import format_sse, get_broker
+from .models import Cliente, Maquinaria
+from .permissions import IsAuthenticatedReadStaffWrite, IsStaffOrSuperUser
+from .renderers import ColumnarJSONRenderer
+from .serializers import ClienteSerializer, MaquinariaSerializer
+from .views import search_clientes, search_maquinarias
+
+
+def _json_response(data, status=200, request=None):
+    if request is not None and request.GET.get("format") == ColumnarJSONRenderer.format:
+        renderer = ColumnarJSONRenderer()
+    else:
+        renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    return HttpResponse(
+        renderer.render(data, renderer_context={"request": request}),
+        status=status,
+        content_type=renderer.media_type,
+    )
+
+
+def _error(exc):
+    return _json_response({"detail": exc.detail}, status=exc.status_code)
+
+
+def _authenticate(request):
+    """Mismo orden que DRF: la primera clase que reconoce el header gana."""
+    for auth_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = auth_class().authenticate(request)
+        if result is not None:
+            return result[0]
+    return None
+
+
+def async_read_view(permission_class):
+    """Envuelve una corrutina de solo lectura con auth JWT y permisos DRF."""
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return _error(exceptions.MethodNotAllowed(request.method))
+            try:
+                user = await sync_to_async(_authenticate)(request)
+            except exceptions.AuthenticationFailed as exc:
+                return _error(exc)
+            if user is None:
+                return _error(exceptions.NotAuthenticated())
+            request.user = user
+            if not permission_class().has_permission(request, None):
+                return _error(exceptions.PermissionDenied())
+
+            with replica_reads(not await sync_to_async(is_primary_sticky)(user)):
+                data = await view(request, *args, **kwargs)
+            if isinstance(data, HttpResponseBase):
+                return data
+            return _json_response(data, request=request)
+
+        return wrapper
+
+    return decorator
+
+
+def _query(request):
+    return (request.GET.get("query") or "").strip()
+
+
+@async_read_view(IsStaffOrSuperUser)
+async def estado_arriendos(request):
+    return await aestado_arriendos_rows(_query(request))
+
+
+@async_read_view(IsStaffOrSuperUser)
+async def estado_bodega(request):
+    return await aestado_bodega_rows(_query(request))
+
+
+@async_read_view(IsAuthenticatedReadStaffWrite)
+async def maquinarias_list(request):
+    qs = search_maquinarias(Maquinaria.objects.all(), _query(request))
+    maquinas = [maq async for maq in qs]
+    return MaquinariaSerializer(maquinas, many=True).data
+
+
+@async_read_view(IsAuthenticatedReadStaffWrite)
+async def clientes_list(request):
+    qs = search_clientes(Cliente.objects.all(), _query(request))
+    clientes = [cli async for cli in qs]
+    return ClienteSerializer(clientes, many=True).data
+
+
+def _last_event_id(request):
+    raw = request.headers.get("Last-Event-ID") or request.GET.get("desde") or ""
+    try:
+        return max(int(raw), 0)
+    except ValueError:
+        return None
+
+
+async def _fleet_stream(broker, last_id):
+    poll = getattr(settings, "FLEET_EVENTS_POLL_SECONDS", 1.0)
+    heartbeat = getattr(settings, "FLEET_EVENTS_HEARTBEAT_SECONDS", 15.0)
+    max_seconds = getattr(settings, "FLEET_EVENTS_MAX_STREAM_SECONDS", 300.0)
+    started = last_beat = monotonic()
+
+    # El navegador reconecta solo (con Last-Event-ID) cuando el stream se cierra.
+    yield f"retry: {int(poll * 1000) or 1000}\n\n"
+    while True:
+        events = await broker.asince(last_id)
+        for event in events:
+            last_id = event.id
+            yield format_sse(event)
+        now = monotonic()
+        if now - started >= max_seconds:
+            return
+        if events:
+            continue
+        if now - last_beat >= heartbeat:
+            last_beat = now
+            yield ": ping\n\n"
+        await asyncio.sleep(poll)
+
+
+@async_read_view(IsStaffOrSuperUser)
+async def eventos_flota(request):
+    """Stream SSE con los cambios de flota (ver ``api.events``)."""
+    broker = get_broker()
+    last_id = _last_event_id(request)
+    if last_id is None:
+        last_id = await broker.alatest_id()
+    response = StreamingHttpResponse(
+        _fleet_stream(broker, last_id), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
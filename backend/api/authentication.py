@@ -0,0 +1,235 @@
+# backend/api/authentication.py
+"""
+Autenticación JWT sin consulta de ``User`` por request.
+
+Los permisos de ``api.permissions`` solo miran ``is_active``, ``is_staff`` e
+``is_superuser``. ``AuthzRefreshToken`` embebe esos flags y la versión de
+permisos (``UserSecurity.perm_version``) en el token; ``StatelessJWTAuthentication``
+confía en ellos mientras la versión siga vigente: cambiar un flag o la clave
+la sube. La versión vigente se lee de un caché en memoria del proceso
+(``AUTHZ_VERSION_CACHE_SECONDS``), así que la base se consulta a lo más una vez
+por usuario y ventana, no en cada request. ``AuthzTokenRefreshSerializer``
+(``/auth/refresh``) vuelve a leer el usuario y sella los claims vigentes en el
+access nuevo.
+
+Si el token no trae claims o la versión cambió, se carga el usuario desde la
+base igual que ``JWTAuthentication``.
+
+También guarda el estado corto de login (usuario inexistente o bloqueado) que
+permite a ``login`` rechazar sin consultar la base ni calcular el hash.
+"""
+
+import hashlib
+import threading
+from time import monotonic
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from rest_framework.exceptions import AuthenticationFailed
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+AUTHZ_FLAGS = ("is_active", "is_staff", "is_superuser")
+PERM_VERSION_CLAIM = "pv"
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def _version_cache_ttl():
+    return getattr(settings, "AUTHZ_VERSION_CACHE_SECONDS", 30)
+
+
+def current_perm_version(user_id):
+    """Versión vigente del usuario (``None`` si no existe), con caché local."""
+    now = monotonic()
+    with _versions_lock:
+        cached = _versions.get(user_id)
+    if cached and cached[1] > now:
+        return cached[0]
+
+    rows = list(
+        User.objects.filter(pk=user_id).values_list("security__perm_version", flat=True)[:1]
+    )
+    version = (rows[0] or 0) if rows else None
+    with _versions_lock:
+        _versions[user_id] = (version, now + _version_cache_ttl())
+    return version
+
+
+def forget_perm_version(user_id):
+    with _versions_lock:
+        _versions.pop(user_id, None)
+
+
+def clear_perm_versions():
+    with _versions_lock:
+        _versions.clear()
+
+
+def perm_version_of(user):
+    """Versión de un usuario ya cargado (usa ``security`` si vino con select_related)."""
+    try:
+        return user.security.perm_version
+    except ObjectDoesNotExist:
+        return 0
+
+
+# -----------------------------
+# Estado corto de login
+# -----------------------------
+LOGIN_UNKNOWN = "unknown"
+LOGIN_LOCKED = "locked"
+
+
+def _login_state_key(username):
+    digest = hashlib.sha1(username.lower().encode("utf-8")).hexdigest()
+    return f"login:state:{digest}"
+
+
+def get_login_state(username):
+    return cache.get(_login_state_key(username))
+
+
+def set_login_state(username, state):
+    cache.set(
+        _login_state_key(username), state,
+        timeout=getattr(settings, "LOGIN_STATE_CACHE_SECONDS", 60),
+    )
+
+
+def clear_login_state(username):
+    cache.delete(_login_state_key(username))
+
+
+# Fallos de login aún no persistidos en UserSecurity.failed_attempts; login los
+# escribe en lote (ver ``LOGIN_FAILED_FLUSH_EVERY``).
+def _pending_failures_key(user_id):
+    return f"login:fails:{user_id}"
+
+
+def pending_failures(user_id):
+    return cache.get(_pending_failures_key(user_id), 0)
+
+
+def add_pending_failure(user_id):
+    key = _pending_failures_key(user_id)
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:  # la clave expiró o fue desalojada entre add e incr
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+def take_pending_failures(user_id):
+    """
+    Descuenta y devuelve los fallos pendientes para persistirlos. Con
+    ``decr``/``incr`` atómicos dos flushes simultáneos no toman los mismos
+    fallos ni pierden los que llegan entre medio.
+    """
+    key = _pending_failures_key(user_id)
+    pending = cache.get(key, 0)
+    if pending <= 0:
+        return 0
+    try:
+        remaining = cache.decr(key, pending)
+    except ValueError:  # otro flush la borró
+        return 0
+    if remaining < 0:  # otro flush se llevó parte: se devuelve lo que sobra
+        cache.incr(key, -remaining)
+        return max(pending + remaining, 0)
+    return pending
+
+
+def clear_pending_failures(user_id):
+    cache.delete(_pending_failures_key(user_id))
+
+
+class AuthzRefreshToken(RefreshToken):
+    """Refresh token cuyos access tokens llevan los claims de autorización."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        cls.stamp_authz(token, user)
+        return token
+
+    @staticmethod
+    def stamp_authz(token, user):
+        """Escribe en ``token`` los flags y la versión de permisos de ``user``."""
+        for flag in AUTHZ_FLAGS:
+            token[flag] = bool(getattr(user, flag))
+        token["username"] = user.username
+        token[PERM_VERSION_CLAIM] = perm_version_of(user)
+
+
+class AuthzTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    ``/auth/refresh``: el access nuevo lleva los flags y la versión actuales
+    del usuario, no los copiados del login, para que tras un cambio de
+    permisos vuelva a atenderse sin consultar la base.
+    """
+
+    token_class = AuthzRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user = (
+            User.objects.select_related("security")
+            .filter(pk=refresh.payload.get(api_settings.USER_ID_CLAIM))
+            .first()
+        )
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(
+                self.error_messages["no_active_account"], "no_active_account"
+            )
+        AuthzRefreshToken.stamp_authz(refresh, user)
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION and hasattr(refresh, "blacklist"):
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            if hasattr(refresh, "outstand"):
+                refresh.outstand()
+            data["refresh"] = str(refresh)
+        return data
+
+
+class ClaimsUser(TokenUser):
+    """Usuario respaldado solo por los claims del token."""
+
+    @cached_property
+    def id(self):
+        return int(super().id)
+
+    @cached_property
+    def is_active(self):
+        return bool(self.token.get("is_active", False))
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if self._claims_are_trusted(validated_token):
+            return ClaimsUser(validated_token)
+        return super().get_user(validated_token)
+
+    @staticmethod
+    def _claims_are_trusted(token):
+        if any(flag not in token for flag in AUTHZ_FLAGS):
+            return False
+        if PERM_VERSION_CLAIM not in token or not token.get("is_active"):
+            return False
+        try:
+            user_id = int(token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            return False
+        return current_perm_version(user_id) == token[PERM_VERSION_CLAIM]
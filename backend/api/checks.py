@@ -0,0 +1,46 @@
+"""Chequeos de despliegue propios (``python manage.py check --deploy``)."""
+
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+LOCMEM = "django.core.cache.backends.locmem.LocMemCache"
+
+
+def _cache_local():
+    return settings.CACHES.get("default", {}).get("BACKEND") == LOCMEM
+
+
+@register(Tags.caches, deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    if not _cache_local():
+        return []
+    return [
+        Warning(
+            "El caché por defecto es LocMemCache (uno por proceso).",
+            hint=(
+                "Con varios workers el throttle de login y los fallos pendientes "
+                "no se comparten: defina DJANGO_CACHE_BACKEND/DJANGO_CACHE_LOCATION "
+                "(Redis o Memcached)."
+            ),
+            id="api.W001",
+        )
+    ]
+
+
+@register(Tags.caches, Tags.database)
+def replica_sticky_cache_check(app_configs, **kwargs):
+    # La marca "leer del primario tras escribir" vive en el caché: si es
+    # por proceso, la siguiente petición en otro worker lee la réplica.
+    if not getattr(settings, "REPLICA_DB_NAME", None) or not _cache_local():
+        return []
+    return [
+        Error(
+            "DJANGO_REPLICA_DB_NAME requiere un caché compartido.",
+            hint=(
+                "La fijación al primario tras escribir (REPLICA_STICKY_SECONDS) "
+                "se guarda en el caché: defina DJANGO_CACHE_BACKEND/"
+                "DJANGO_CACHE_LOCATION (Redis o Memcached)."
+            ),
+            id="api.E001",
+        )
+    ]
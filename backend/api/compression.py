@@ -0,0 +1,178 @@
+# backend/api/compression.py
+"""
+Compresión negociada (brotli si está instalado, si no gzip) de respuestas
+grandes de la API.
+
+- Solo bodies desde ``COMPRESSION_MIN_BYTES`` y de tipos de texto/JSON.
+- Las respuestas en streaming (SSE, descargas) se comprimen por trozos con
+  flush en cada uno, así que el cliente sigue recibiendo cada evento al tiro.
+- Nunca comprime ``COMPRESSION_EXCLUDED_PATHS`` (``/auth/``, ``/admin/``):
+  tokens/CSRF junto a datos que controla el usuario son el escenario BREACH.
+- Bytes de entrada/salida y ahorro quedan en ``api.metrics``
+  (``compression.*``, visibles en ``GET /metricas``).
+"""
+
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from . import metrics
+
+try:  # Dependencia opcional.
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/x-ndjson",
+)
+
+
+class _GzipStream:
+    name = "gzip"
+
+    def __init__(self):
+        self._z = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush()
+
+    @staticmethod
+    def whole(data):
+        z = zlib.compressobj(6, zlib.DEFLATED, 31)
+        return z.compress(data) + z.flush()
+
+
+class _BrotliStream:
+    name = "br"
+
+    def __init__(self):
+        self._c = brotli.Compressor(quality=5)
+
+    def chunk(self, data):
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self):
+        return self._c.finish()
+
+    @staticmethod
+    def whole(data):
+        return brotli.compress(data, quality=5)
+
+
+def negotiate(accept_encoding):
+    """Codificación a usar según ``Accept-Encoding`` (q-values), o None."""
+    weights = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    def accepted(name):
+        return weights.get(name, weights.get("*", 0.0)) > 0
+
+    if brotli is not None and accepted("br"):
+        return _BrotliStream
+    if accepted("gzip"):
+        return _GzipStream
+    return None
+
+
+def _record(encoder, bytes_in, bytes_out):
+    metrics.incr(f"compression.{encoder.name}.responses")
+    metrics.incr("compression.bytes_in", bytes_in)
+    metrics.incr("compression.bytes_out", bytes_out)
+    metrics.incr("compression.bytes_saved", bytes_in - bytes_out)
+
+
+def _compress_stream(encoder, content):
+    stream = encoder()
+    sizes = [0, 0]
+    try:
+        for item in content:
+            sizes[0] += len(item)
+            data = stream.chunk(item)
+            sizes[1] += len(data)
+            yield data
+        data = stream.finish()
+        sizes[1] += len(data)
+        yield data
+    finally:
+        _record(encoder, *sizes)
+
+
+async def _compress_stream_async(encoder, content):
+    stream = encoder()
+    sizes = [0, 0]
+    try:
+        async for item in content:
+            sizes[0] += len(item)
+            data = stream.chunk(item)
+            sizes[1] += len(data)
+            yield data
+        data = stream.finish()
+        sizes[1] += len(data)
+        yield data
+    finally:
+        _record(encoder, *sizes)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        if not getattr(settings, "COMPRESSION_ENABLED", True):
+            return response
+        if response.has_header("Content-Encoding"):
+            return response
+        if any(request.path.startswith(p) for p in settings.COMPRESSION_EXCLUDED_PATHS):
+            return response
+        content_type = response.get("Content-Type", "").lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES) and "+json" not in content_type:
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_BYTES:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoder = negotiate(request.META.get("HTTP_ACCEPT_ENCODING"))
+        if encoder is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _compress_stream_async(
+                    encoder, response.streaming_content
+                )
+            else:
+                response.streaming_content = _compress_stream(encoder, response.streaming_content)
+            del response.headers["Content-Length"]
+        else:
+            original = response.content
+            compressed = encoder.whole(original)
+            if len(compressed) >= len(original):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+            _record(encoder, len(original), len(compressed))
+
+        # Mismo criterio que GZipMiddleware: el ETag fuerte deja de valer.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoder.name
+        return response
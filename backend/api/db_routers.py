@@ -0,0 +1,84 @@
+"""Enrutamiento de lecturas hacia la réplica de solo lectura."""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+REPLICA_ALIAS = "replica"
+PRIMARY_ALIAS = "default"
+
+_replica_reads = ContextVar("replica_reads", default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in connections.settings
+
+
+def replica_reads_enabled():
+    return _replica_reads.get()
+
+
+def enable_replica_reads():
+    """Habilita lecturas desde la réplica en el contexto actual."""
+    _replica_reads.set(True)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Habilita (o deshabilita) lecturas desde la réplica dentro del bloque."""
+    token = _replica_reads.set(bool(enabled))
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def _sticky_key(user_id):
+    return f"replica:sticky:{user_id}"
+
+
+def mark_primary_sticky(user):
+    """
+    Tras una escritura, el usuario lee desde el primario por una ventana corta.
+    La marca vive en el caché de Django, que debe ser compartido entre workers
+    cuando hay réplica (chequeo ``api.E001``).
+    """
+    if user is None or not getattr(user, "is_authenticated", False):
+        return
+    seconds = getattr(settings, "REPLICA_STICKY_SECONDS", 0)
+    if seconds > 0:
+        cache.set(_sticky_key(user.pk), True, timeout=seconds)
+
+
+def is_primary_sticky(user):
+    if user is None or not getattr(user, "is_authenticated", False):
+        return False
+    return bool(cache.get(_sticky_key(user.pk)))
+
+
+class ReadReplicaRouter:
+    """
+    Envía lecturas a ``replica`` solo cuando la petición actual lo habilitó
+    explícitamente (acciones seguras de lectura). Toda escritura y migración
+    va al primario; la réplica se sincroniza con ``sync_read_replica``.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and replica_configured():
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {PRIMARY_ALIAS, REPLICA_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY_ALIAS
@@ -0,0 +1,154 @@
+# backend/api/disponibilidad.py
+"""
+Disponibilidad futura de la flota (``GET /maquinarias/disponibles``).
+
+Una máquina está ocupada en ``[desde, hasta]`` si algún arriendo suyo (por
+``Arriendo.maquinaria`` o por ``ArriendoItem``) se cruza con el rango:
+
+- ``Terminado``: ocupa de ``fecha_inicio`` a ``fecha_termino`` (o solo el
+  día de inicio si no tiene término).
+- ``Activo``: ``fecha_termino`` es el término planificado. Sin término, o
+  con el término ya vencido sin RETI, la máquina sigue afuera sin fecha de
+  vuelta y se considera ocupada desde el inicio en adelante.
+- Los arriendos cuyas OT son todas ``SERV`` no ocupan la máquina: son el
+  arriendo ``Terminado`` que se crea para facturar un servicio
+  (``_arriendo_para_serv``), p. ej. una reparación en obra de una
+  máquina que ya está arrendada.
+
+El cruce se resuelve en la base con subconsultas ``NOT EXISTS`` por máquina
+sobre el índice ``(maquinaria, fecha_inicio, fecha_termino)``, así que el
+costo es una búsqueda por máquina candidata y no depende del historial.
+
+Con las mismas reglas se detectan arriendos que reservan dos veces una
+máquina: ``conflictos_maquinas`` valida un arriendo nuevo contra el índice
+y ``detectar_solapes`` barre toda la tabla (``manage.py detectar_solapes``).
+"""
+
+import heapq
+from collections import defaultdict
+from datetime import date
+
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Arriendo, ArriendoItem, Maquinaria, OrdenTrabajo
+
+MAQUINA_VALUES = (
+    "id", "serie", "marca", "modelo", "categoria", "altura", "tipo_altura", "combustible",
+)
+# Fin de la ocupación de un arriendo activo sin fecha de vuelta.
+SIN_FIN = date.max
+CONFLICTO_VALUES = ("id", "maquinaria_id", "fecha_inicio", "fecha_termino", "estado")
+
+
+def fin_ocupacion(estado, inicio, termino, hoy):
+    """Último día que el arriendo ocupa su máquina (``SIN_FIN`` si no se sabe)."""
+    if (estado or "").lower() == "activo":
+        return termino if termino is not None and termino >= hoy else SIN_FIN
+    return termino or inicio
+
+
+def arriendos_de_servicio():
+    """Subconsulta con los ids de arriendos cuyas OT son todas ``SERV``."""
+    otras = (
+        OrdenTrabajo.objects.filter(arriendo_id__isnull=False)
+        .exclude(tipo="SERV")
+        .values("arriendo_id")
+    )
+    return (
+        OrdenTrabajo.objects.filter(tipo="SERV", arriendo_id__isnull=False)
+        .exclude(arriendo_id__in=otras)
+        .values("arriendo_id")
+    )
+
+
+def cruce_arriendos(desde, hasta, hoy=None, prefijo=""):
+    """``Q`` de los arriendos que ocupan su máquina en algún día de ``[desde, hasta]``."""
+    hoy = hoy or timezone.now().date()
+
+    def q(**filtros):
+        return Q(**{prefijo + campo: valor for campo, valor in filtros.items()})
+
+    return q(fecha_inicio__lte=hasta) & (
+        q(fecha_termino__gte=desde)
+        | q(fecha_termino__isnull=True, estado__iexact="Activo")
+        | q(fecha_termino__isnull=True, fecha_inicio__gte=desde)
+        | q(fecha_termino__lt=hoy, estado__iexact="Activo")
+    ) & ~q(id__in=arriendos_de_servicio())
+
+
+def maquinas_disponibles(desde, hasta, maquinas=None, hoy=None):
+    """Máquinas (no para venta) sin arriendos que se crucen con ``[desde, hasta]``."""
+    directo = Arriendo.objects.filter(
+        cruce_arriendos(desde, hasta, hoy), maquinaria_id=OuterRef("pk")
+    )
+    por_item = ArriendoItem.objects.filter(
+        cruce_arriendos(desde, hasta, hoy, prefijo="arriendo__"), maquinaria_id=OuterRef("pk")
+    )
+    maquinas = Maquinaria.objects.all() if maquinas is None else maquinas
+    return (
+        maquinas.exclude(estado="Para venta")
+        .exclude(Exists(directo))
+        .exclude(Exists(por_item))
+    )
+
+
+def conflictos_maquinas(maquina_ids, desde, hasta, excluir=None, hoy=None):
+    """
+    Arriendos que ya ocupan alguna de ``maquina_ids`` en ``[desde, hasta]``.
+    Consulta solo los intervalos de esas máquinas, por índice.
+    """
+    maquina_ids = [maq_id for maq_id in maquina_ids if maq_id]
+    if not maquina_ids:
+        return []
+    directos = Arriendo.objects.filter(
+        cruce_arriendos(desde, hasta, hoy), maquinaria_id__in=maquina_ids
+    ).values_list(*CONFLICTO_VALUES)
+    por_item = ArriendoItem.objects.filter(
+        cruce_arriendos(desde, hasta, hoy, prefijo="arriendo__"), maquinaria_id__in=maquina_ids
+    ).values_list(
+        "arriendo_id", "maquinaria_id", "arriendo__fecha_inicio",
+        "arriendo__fecha_termino", "arriendo__estado",
+    )
+    vistos = set()
+    conflictos = []
+    for fila in sorted([*directos, *por_item], key=lambda f: (f[0], f[1])):
+        if fila[0] == excluir or fila[:2] in vistos:
+            continue
+        vistos.add(fila[:2])
+        conflictos.append(dict(zip(("arriendo_id", *CONFLICTO_VALUES[1:]), fila)))
+    return conflictos
+
+
+def cargar_ocupaciones(hoy=None):
+    """``{maquinaria_id: [(inicio, fin, arriendo_id), ...]}`` de todos los arriendos."""
+    hoy = hoy or timezone.now().date()
+    filas = Arriendo.objects.exclude(id__in=arriendos_de_servicio()).values_list(
+        "id", "maquinaria_id", "items__maquinaria_id", "fecha_inicio", "fecha_termino", "estado"
+    )
+    por_maquina = defaultdict(set)
+    for arriendo_id, maq_id, item_maq_id, inicio, termino, estado in filas:
+        fin = fin_ocupacion(estado, inicio, termino, hoy)
+        for maquina in {maq_id, item_maq_id} - {None}:
+            por_maquina[maquina].add((inicio, fin, arriendo_id))
+    return por_maquina
+
+
+def detectar_solapes(ocupaciones):
+    """
+    Barrido ordenado por máquina, O(n log n + cruces): los intervalos aún
+    abiertos van en un heap por fecha de término; cada intervalo nuevo
+    descarta los que terminaron antes de su inicio y se reporta contra todos
+    los que quedan, así que salen todos los pares que se cruzan.
+    Devuelve ``[(maquinaria_id, arriendo_a, arriendo_b, desde, hasta)]``.
+    """
+    solapes = []
+    for maq_id in sorted(ocupaciones):
+        abiertos = []
+        for inicio, fin, arriendo_id in sorted(ocupaciones[maq_id]):
+            while abiertos and abiertos[0][0] < inicio:
+                heapq.heappop(abiertos)
+            for fin_abierto, otro_id in sorted(abiertos):
+                solapes.append((maq_id, otro_id, arriendo_id, inicio, min(fin, fin_abierto)))
+            heapq.heappush(abiertos, (fin, arriendo_id))
+    return solapes
@@ -0,0 +1,291 @@
+# backend/api/estado.py
+"""
+Filas de las pantallas de estado (arriendos en terreno y bodega).
+
+Cada pantalla se arma con un número fijo de consultas: los querysets se
+resuelven por completo (con sus prefetch) y luego las filas se construyen en
+memoria, sin volver a la base. Así las mismas funciones sirven para las vistas
+síncronas de DRF y para las vistas async (``api.async_views``).
+
+Los arriendos multi-máquina dan una fila por ``ArriendoItem`` (mismo ``id``
+de arriendo, con ``item_id`` y ``maquinaria_id``); los documentos y la OT son
+los del arriendo. Un arriendo sin ítems cae a ``Arriendo.maquinaria``.
+"""
+
+from django.db.models import Exists, OuterRef, Prefetch, Q, Subquery
+
+from .models import Arriendo, ArriendoItem, Documento, Maquinaria, OrdenTrabajo
+
+# Cliente “empresa” (usado en Bodega y OT RETI)
+CLIENTE_EMPRESA = {
+    "rut": "16.357.179-K",
+    "razon_social": "Franz Heim SPA",
+    "direccion": "Bodega 4061, Macul",
+}
+
+
+def active_rentals():
+    """Legacy operational source for machinery that remains out on rent."""
+    return Arriendo.objects.filter(estado__iexact="Activo")
+
+
+def doc_label(doc):
+    if not doc:
+        return ""
+    if doc.tipo == "FACT":
+        pref = "F"
+    elif doc.tipo == "GD":
+        pref = "G"
+    else:
+        pref = doc.get_tipo_display()[0]
+    return f"{pref}{doc.numero}"
+
+
+def _ot_meta(ot):
+    if not ot:
+        return {
+            "ot_id": None,
+            "ot_folio": "",
+            "orden_compra": "",
+            "vendedor": "",
+            "ot_tipo": "",
+        }
+    pref_ot = ot.tipo_comercial or (ot.tipo[:1] if ot.tipo else "OT")
+    return {
+        "ot_id": ot.id,
+        "ot_folio": f"{pref_ot}{str(ot.id).zfill(4)}",
+        "orden_compra": getattr(ot, "orden_compra", "") or "",
+        "vendedor": getattr(ot, "vendedor", "") or "",
+        "ot_tipo": ot.tipo,
+    }
+
+
+def _latest_doc(docs, predicate):
+    """Equivale a ``.filter(...).order_by("fecha_emision", "id").last()``."""
+    candidates = [doc for doc in docs if predicate(doc)]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda doc: (doc.fecha_emision, doc.id))
+
+
+# -----------------------------
+# Estado de arriendos
+# -----------------------------
+def _items_de(arriendo_ref):
+    return ArriendoItem.objects.filter(arriendo_id=arriendo_ref)
+
+
+def estado_arriendos_queryset(q="", ids=None):
+    arr_qs = (
+        active_rentals().select_related("cliente", "maquinaria", "obra")
+        .prefetch_related(
+            "documentos",
+            Prefetch(
+                "ordenes",
+                queryset=OrdenTrabajo.objects.select_related("guia", "factura"),
+            ),
+            Prefetch(
+                "items",
+                queryset=ArriendoItem.objects.select_related("maquinaria").order_by("id"),
+            ),
+        )
+        .filter(Q(maquinaria_id__isnull=False) | Exists(_items_de(OuterRef("pk"))))
+    )
+    if ids is not None:
+        arr_qs = arr_qs.filter(id__in=ids)
+    if q:
+        item_coincide = _items_de(OuterRef("pk")).filter(
+            Q(maquinaria__marca__icontains=q)
+            | Q(maquinaria__modelo__icontains=q)
+            | Q(maquinaria__serie__icontains=q)
+        )
+        arr_qs = arr_qs.filter(
+            Q(cliente__razon_social__icontains=q)
+            | Q(cliente__rut__icontains=q)
+            | Q(maquinaria__marca__icontains=q)
+            | Q(maquinaria__modelo__icontains=q)
+            | Q(maquinaria__serie__icontains=q)
+            | Exists(item_coincide)
+        )
+    return arr_qs.order_by("id")
+
+
+def _unidades(arr):
+    """``[(item_id, maquinaria)]`` del arriendo: sus ítems o, si no tiene, el FK antiguo."""
+    items = list(arr.items.all())
+    if items:
+        return [(item.id, item.maquinaria) for item in items]
+    return [(None, arr.maquinaria)] if arr.maquinaria_id else []
+
+
+def estado_arriendo_rows(arr):
+    """Filas (una por máquina) de un arriendo ya resuelto con ``estado_arriendos_queryset``."""
+    docs = list(arr.documentos.all())
+    if not docs:
+        return []
+
+    ordenes = list(arr.ordenes.all())
+    ot = max(ordenes, key=lambda o: (o.fecha_creacion, o.id)) if ordenes else None
+
+    # ✅ preferimos lo que está asociado a la OT (consistencia con toasts)
+    gd = ot.guia if ot and ot.guia_id else _latest_doc(
+        docs, lambda d: d.tipo == "GD" and not d.es_retiro
+    )
+    fact = ot.factura if ot and ot.factura_id else _latest_doc(
+        docs, lambda d: d.tipo == "FACT"
+    )
+    if not gd and not fact:
+        # no hay nada relevante que mostrar
+        return []
+
+    ultimo_mov = gd or fact
+    comunes = {
+        "id": arr.id,  # id del arriendo
+        "documento": doc_label(ultimo_mov) or "—",
+        "doc_tipo": ultimo_mov.tipo,
+        "doc_numero": ultimo_mov.numero,
+        "doc_fecha": ultimo_mov.fecha_emision,
+        "factura": doc_label(fact) if fact else "",
+        "factura_numero": fact.numero if fact else None,
+        "factura_fecha": fact.fecha_emision if fact else None,
+        "desde": arr.fecha_inicio,
+        "hasta": arr.fecha_termino,
+        "cliente": arr.cliente.razon_social if arr.cliente_id else "",
+        "rut_cliente": arr.cliente.rut if arr.cliente_id else "",
+        "obra": arr.obra.nombre if arr.obra_id else "",
+        **_ot_meta(ot),
+    }
+    return [
+        {
+            **comunes,
+            "item_id": item_id,
+            "maquinaria_id": maq.id,
+            "marca": maq.marca,
+            "modelo": maq.modelo,
+            "altura": getattr(maq, "altura", None),
+            "serie": maq.serie,
+        }
+        for item_id, maq in _unidades(arr)
+    ]
+
+
+def build_estado_arriendos(arriendos):
+    filas = []
+    for arr in arriendos:
+        filas.extend(estado_arriendo_rows(arr))
+    return filas
+
+
+def estado_arriendos_rows(q="", ids=None):
+    return build_estado_arriendos(estado_arriendos_queryset(q, ids))
+
+
+async def aestado_arriendos_rows(q="", ids=None):
+    arriendos = [arr async for arr in estado_arriendos_queryset(q, ids)]
+    return build_estado_arriendos(arriendos)
+
+
+# -----------------------------
+# Estado de bodega
+# -----------------------------
+def _latest_doc_id(tipo, **filters):
+    return Subquery(
+        Documento.objects.filter(
+            arriendo__maquinaria=OuterRef("pk"), tipo=tipo, **filters
+        )
+        .order_by("-fecha_emision", "-id")
+        .values("id")[:1]
+    )
+
+
+def estado_bodega_queryset(q="", ids=None):
+    active_rental = active_rentals().filter(maquinaria_id=OuterRef("pk"))
+    active_item = ArriendoItem.objects.filter(
+        maquinaria_id=OuterRef("pk"), arriendo__in=active_rentals()
+    )
+    ultima_obra = (
+        Arriendo.objects.filter(maquinaria=OuterRef("pk"))
+        .order_by("-fecha_inicio", "-id")
+        .values("obra__nombre")[:1]
+    )
+    maq_qs = (
+        Maquinaria.objects.filter(estado__iexact="Disponible")
+        .annotate(_has_active_rental=Exists(active_rental) | Exists(active_item))
+        .filter(_has_active_rental=False)
+    )
+    if ids is not None:
+        maq_qs = maq_qs.filter(id__in=ids)
+    maq_qs = (
+        maq_qs.annotate(
+            _ultima_obra=Subquery(ultima_obra),
+            _gd_retiro_id=_latest_doc_id("GD", es_retiro=True),
+            _factura_id=_latest_doc_id("FACT"),
+        )
+    )
+    if q:
+        maq_qs = maq_qs.filter(
+            Q(marca__icontains=q) | Q(modelo__icontains=q) | Q(serie__icontains=q)
+        )
+    return maq_qs.order_by("marca", "modelo", "serie")
+
+
+def bodega_related_querysets(maquinas):
+    """Documentos y OT de retiro referenciados por las máquinas ya resueltas."""
+    gd_ids = {m._gd_retiro_id for m in maquinas if m._gd_retiro_id}
+    doc_ids = gd_ids | {m._factura_id for m in maquinas if m._factura_id}
+    docs = Documento.objects.filter(id__in=doc_ids)
+    ordenes = (
+        OrdenTrabajo.objects.filter(guia_id__in=gd_ids)
+        .order_by("guia_id", "-fecha_creacion", "-id")
+    )
+    return docs, ordenes
+
+
+def build_estado_bodega(maquinas, docs, ordenes):
+    docs_by_id = {doc.id: doc for doc in docs}
+    ot_by_guia = {}
+    for ot in ordenes:
+        ot_by_guia.setdefault(ot.guia_id, ot)
+
+    filas = []
+    for maq in maquinas:
+        gd_retiro = docs_by_id.get(maq._gd_retiro_id)
+        fact = docs_by_id.get(maq._factura_id)
+        ot_retiro = ot_by_guia.get(gd_retiro.id) if gd_retiro else None
+        filas.append(
+            {
+                "id": maq.id,
+                "marca": maq.marca,
+                "modelo": maq.modelo or "",
+                "altura": getattr(maq, "altura", None),
+                "serie": maq.serie or "",
+                "cliente": CLIENTE_EMPRESA["razon_social"],
+                "rut_cliente": CLIENTE_EMPRESA["rut"],
+                "obra": maq._ultima_obra or "",
+                "desde": None,
+                "hasta": None,
+                "documento": doc_label(gd_retiro),
+                "doc_tipo": gd_retiro.tipo if gd_retiro else None,
+                "doc_numero": gd_retiro.numero if gd_retiro else None,
+                "doc_fecha": gd_retiro.fecha_emision if gd_retiro else None,
+                "factura": doc_label(fact) if fact else "",
+                "factura_numero": fact.numero if fact else None,
+                "factura_fecha": fact.fecha_emision if fact else None,
+                **_ot_meta(ot_retiro),
+            }
+        )
+    return filas
+
+
+def estado_bodega_rows(q="", ids=None):
+    maquinas = list(estado_bodega_queryset(q, ids))
+    docs, ordenes = bodega_related_querysets(maquinas)
+    return build_estado_bodega(maquinas, docs, ordenes)
+
+
+async def aestado_bodega_rows(q="", ids=None):
+    maquinas = [maq async for maq in estado_bodega_queryset(q, ids)]
+    docs, ordenes = bodega_related_querysets(maquinas)
+    docs = [doc async for doc in docs]
+    ordenes = [ot async for ot in ordenes]
+    return build_estado_bodega(maquinas, docs, ordenes)
@@ -0,0 +1,156 @@
+# backend/api/events.py
+"""
+Eventos compactos de cambios de flota para el stream SSE de las pantallas de
+estado.
+
+Cada evento lleva los ids afectados y las filas nuevas de ``estado_arriendos``
+y ``estado_bodega`` para esos ids (más los ids que dejaron de aparecer), de
+modo que el frontend parchea solo lo que cambió en vez de recargar todo.
+
+Brokers disponibles (``FLEET_EVENTS_BROKER``):
+
+* ``local``: buffer en memoria del proceso; suficiente con un solo worker.
+* ``database``: tabla ``EventoFlota`` compartida; sirve de pub/sub local
+  cuando hay varios workers apuntando a la misma base.
+"""
+
+import json
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from .estado import estado_arriendos_rows, estado_bodega_rows
+from .models import Arriendo, ArriendoItem, EventoFlota
+
+
+@dataclass(frozen=True)
+class FleetEvent:
+    id: int
+    tipo: str
+    data: str
+
+
+class LocalBroker:
+    """Buffer circular en memoria; los suscriptores leen por id creciente."""
+
+    def __init__(self, maxlen=1000):
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=maxlen)
+        self._last_id = 0
+
+    def publish(self, tipo, data):
+        with self._lock:
+            self._last_id += 1
+            self._events.append(FleetEvent(self._last_id, tipo, data))
+            return self._last_id
+
+    def latest_id(self):
+        return self._last_id
+
+    def since(self, last_id, limit=100):
+        with self._lock:
+            return [ev for ev in self._events if ev.id > last_id][:limit]
+
+    async def alatest_id(self):
+        return self.latest_id()
+
+    async def asince(self, last_id, limit=100):
+        return self.since(last_id, limit)
+
+
+class DatabaseBroker:
+    """Pub/sub sobre la tabla ``EventoFlota`` para varios workers."""
+
+    def publish(self, tipo, data):
+        evento = EventoFlota.objects.create(tipo=tipo, payload=data)
+        retention = getattr(settings, "FLEET_EVENTS_RETENTION_SECONDS", 3600)
+        EventoFlota.objects.filter(
+            creado__lt=timezone.now() - timedelta(seconds=retention)
+        ).delete()
+        return evento.id
+
+    def latest_id(self):
+        return EventoFlota.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+    def since(self, last_id, limit=100):
+        rows = EventoFlota.objects.filter(id__gt=last_id).order_by("id")[:limit]
+        return [FleetEvent(ev.id, ev.tipo, ev.payload) for ev in rows]
+
+    async def alatest_id(self):
+        ev = await EventoFlota.objects.order_by("-id").only("id").afirst()
+        return ev.id if ev else 0
+
+    async def asince(self, last_id, limit=100):
+        rows = EventoFlota.objects.filter(id__gt=last_id).order_by("id")[:limit]
+        return [FleetEvent(ev.id, ev.tipo, ev.payload) async for ev in rows]
+
+
+_local_broker = LocalBroker()
+
+
+def get_broker():
+    if getattr(settings, "FLEET_EVENTS_BROKER", "local") == "database":
+        return DatabaseBroker()
+    return _local_broker
+
+
+def build_fleet_change(tipo, *, ot_ids=(), arriendo_ids=(), maquinaria_ids=()):
+    """Arma el evento con las filas actuales de los ids afectados."""
+    arriendo_ids = sorted({i for i in arriendo_ids if i})
+    maquinaria_ids = set(i for i in maquinaria_ids if i)
+    if arriendo_ids:
+        # La máquina de un arriendo afectado puede entrar o salir de bodega.
+        maquinaria_ids.update(
+            Arriendo.objects.filter(id__in=arriendo_ids, maquinaria_id__isnull=False)
+            .values_list("maquinaria_id", flat=True)
+        )
+        maquinaria_ids.update(
+            ArriendoItem.objects.filter(arriendo_id__in=arriendo_ids)
+            .values_list("maquinaria_id", flat=True)
+        )
+    maquinaria_ids = sorted(maquinaria_ids)
+
+    arriendo_rows = estado_arriendos_rows(ids=arriendo_ids) if arriendo_ids else []
+    bodega_rows = estado_bodega_rows(ids=maquinaria_ids) if maquinaria_ids else []
+    present_arr = {row["id"] for row in arriendo_rows}
+    present_maq = {row["id"] for row in bodega_rows}
+    return {
+        "tipo": tipo,
+        "ot_ids": sorted({i for i in ot_ids if i}),
+        "arriendo_ids": arriendo_ids,
+        "maquinaria_ids": maquinaria_ids,
+        "estado_arriendos": {
+            "rows": arriendo_rows,
+            "removed": [i for i in arriendo_ids if i not in present_arr],
+        },
+        "estado_bodega": {
+            "rows": bodega_rows,
+            "removed": [i for i in maquinaria_ids if i not in present_maq],
+        },
+    }
+
+
+def publish_fleet_change(tipo, **ids):
+    """
+    Publica el cambio cuando la transacción en curso se confirma. Con
+    ``robust=True`` un error al armar o publicar el evento solo se registra
+    en el log: la escritura ya quedó confirmada y no debe responder 500 (el
+    cliente la reintentaría).
+    """
+
+    def _publish():
+        payload = build_fleet_change(tipo, **ids)
+        data = json.dumps(payload, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":"))
+        get_broker().publish(tipo, data)
+
+    transaction.on_commit(_publish, robust=True)
+
+
+def format_sse(event):
+    return f"id: {event.id}\nevent: {event.tipo}\ndata: {event.data}\n\n"
@@ -0,0 +1,281 @@
+# backend/api/facturacion.py
+"""
+Facturación recurrente de arriendos activos (comando ``facturar_arriendos``).
+
+Para cada arriendo ``Activo`` se calcula el siguiente periodo a cobrar y se
+genera una OT ``PROL`` pendiente de facturar, que después se emite como
+cualquier otra (``/ordenes/{id}/emitir`` o ``/ordenes/emitir-lote``).
+
+- Lo ya cubierto es el fin más alto de las líneas de las OT ALTA/PROL no
+  anuladas del arriendo: de ``OrdenTrabajoLinea`` o, si la OT aún no tiene
+  líneas normalizadas (datos antiguos, ``backfill_ot_lineas`` pendiente),
+  de su ``detalle_lineas``. Ambas fuentes pasan por ``fin_linea``: una
+  línea abierta (sin ``hasta``) cubre las unidades que cobró desde su
+  ``desde``, así la corrida siguiente no vuelve a cobrarlas. Sin OT con fechas, una FACT cubre
+  una unidad de ``periodo`` desde su emisión (se cobra por adelantado).
+- Un arriendo con OT ALTA/PROL sin ninguna fecha y sin FACT no se cobra:
+  no se sabe hasta dónde está cubierto, y se reporta en ``sin_cobertura``.
+- El periodo parte al día siguiente y abarca las unidades de ``periodo``
+  (Dia/Semana/Mes) ya iniciadas a la fecha de corte. Se cobra por
+  adelantado: una unidad iniciada va completa. ``fecha_termino`` no corta
+  el cobro: en un arriendo activo es el término pactado, y la máquina sigue
+  en obra hasta que una OT de retiro lo deja ``Terminado``.
+- ``tarifa`` es el valor de una unidad por máquina; las máquinas salen de
+  ``ArriendoItem`` o, en arriendos antiguos, de ``Arriendo.maquinaria``.
+
+Como la OT generada cubre el periodo, volver a correr el comando no duplica
+cobros: es reanudable sin guardar estado aparte.
+"""
+
+import calendar
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import Max
+
+from .estado import active_rentals
+from .models import (
+    ArriendoItem, Documento, OrdenTrabajo, OrdenTrabajoLinea, series_de_detalle,
+)
+from .ot_lineas import build_lineas, maquinas_por_serie, series_de
+
+IVA = Decimal("0.19")
+CENT = Decimal("0.01")
+
+ARRIENDO_VALUES = (
+    "id", "cliente_id", "cliente__rut", "cliente__razon_social",
+    "maquinaria_id", "maquinaria__serie", "obra__nombre",
+    "obra__direccion", "fecha_inicio", "periodo", "tarifa",
+)
+
+
+def sumar_meses(fecha, meses):
+    """``fecha`` + ``meses``, ajustando el día al último del mes si no existe."""
+    total = fecha.month - 1 + meses
+    anio, mes = fecha.year + total // 12, total % 12 + 1
+    return fecha.replace(year=anio, month=mes, day=min(fecha.day, calendar.monthrange(anio, mes)[1]))
+
+
+def fin_periodo(desde, periodo, unidades):
+    """Último día de ``unidades`` de ``periodo`` contadas desde ``desde``."""
+    if periodo == "Mes":
+        return sumar_meses(desde, unidades) - timedelta(days=1)
+    if periodo == "Semana":
+        return desde + timedelta(days=7 * unidades - 1)
+    return desde + timedelta(days=unidades - 1)
+
+
+def periodo_facturable(desde, periodo, corte):
+    """``(unidades, hasta)`` del periodo que parte en ``desde``, o None si aún no empieza."""
+    if desde > corte:
+        return None
+    if periodo == "Mes":
+        unidades = 1
+        while sumar_meses(desde, unidades) <= corte:
+            unidades += 1
+    elif periodo == "Semana":
+        unidades = (corte - desde).days // 7 + 1
+    else:
+        unidades = (corte - desde).days + 1
+    return unidades, fin_periodo(desde, periodo, unidades)
+
+
+def fin_linea(desde, hasta, unidad, cantidad):
+    """
+    Último día que cubre una línea de OT, o None si no tiene fechas.
+
+    Con ``hasta`` es ese día. Una línea abierta (solo ``desde``) cubre las
+    ``cantidad`` unidades de ``unidad`` que cobró, al menos una: se cobra
+    por adelantado.
+    """
+    if hasta:
+        return hasta
+    if not desde:
+        return None
+    unidad = unidad if unidad in ("Dia", "Semana", "Mes") else "Dia"
+    return fin_periodo(desde, unidad, max(cantidad or 0, 1))
+
+
+def _maquinas(arriendo_ids, filas):
+    """``{arriendo_id: [(maquinaria_id, serie), ...]}`` (ítems o máquina legada)."""
+    maquinas = {}
+    items = (
+        ArriendoItem.objects.filter(arriendo_id__in=arriendo_ids)
+        .order_by("arriendo_id", "id")
+        .values_list("arriendo_id", "maquinaria_id", "maquinaria__serie")
+    )
+    for arriendo_id, maq_id, serie in items:
+        maquinas.setdefault(arriendo_id, []).append((maq_id, serie or ""))
+    for fila in filas:
+        if fila["id"] not in maquinas and fila["maquinaria_id"]:
+            maquinas[fila["id"]] = [(fila["maquinaria_id"], fila["maquinaria__serie"] or "")]
+    return maquinas
+
+
+def _periodo(fila):
+    return fila["periodo"] if fila["periodo"] in ("Dia", "Semana", "Mes") else "Dia"
+
+
+def _fecha(valor):
+    try:
+        return date.fromisoformat(str(valor).strip()[:10]) if valor else None
+    except ValueError:
+        return None
+
+
+def _entero(valor):
+    try:
+        return int(valor or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _hasta_de_detalle(detalle):
+    """Fin (``fin_linea``) más alto de un ``detalle_lineas``, o None."""
+    fechas = []
+    for linea in detalle if isinstance(detalle, list) else []:
+        if not isinstance(linea, dict):
+            continue
+        fin = fin_linea(
+            _fecha(linea.get("desde")), _fecha(linea.get("hasta")),
+            linea.get("unidad"), _entero(linea.get("cantidadPeriodo")),
+        )
+        if fin is not None:
+            fechas.append(fin)
+    return max(fechas, default=None)
+
+
+def _cubierto_hasta(filas):
+    """
+    ``{arriendo_id: fecha}`` hasta donde ya hay OT o factura. ``None`` marca
+    los arriendos con OT sin fechas ni FACT: su cobertura es desconocida.
+    """
+    ids = [fila["id"] for fila in filas]
+    ordenes = (
+        OrdenTrabajo.objects.filter(arriendo_id__in=ids, tipo__in=("ALTA", "PROL"))
+        .exclude(estado="ANUL")
+    )
+    por_orden = {}
+    lineas = (
+        OrdenTrabajoLinea.objects.filter(orden__in=ordenes)
+        .values_list("orden_id", "desde", "hasta", "unidad", "cantidad_periodo")
+    )
+    for ot_id, desde, hasta, unidad, cantidad in lineas:
+        fin = fin_linea(desde, hasta, unidad, cantidad)
+        if fin is not None and (por_orden.get(ot_id) is None or fin > por_orden[ot_id]):
+            por_orden[ot_id] = fin
+    cubierto, sin_fecha = {}, set()
+    for ot_id, arriendo_id, detalle in ordenes.values_list("id", "arriendo_id", "detalle_lineas"):
+        hasta = por_orden.get(ot_id) or _hasta_de_detalle(detalle)
+        if hasta is None:
+            sin_fecha.add(arriendo_id)
+        elif cubierto.get(arriendo_id) is None or hasta > cubierto[arriendo_id]:
+            cubierto[arriendo_id] = hasta
+
+    periodos = {fila["id"]: _periodo(fila) for fila in filas}
+    facturas = (
+        Documento.objects.filter(tipo="FACT", arriendo_id__in=ids)
+        .values("arriendo_id")
+        .annotate(emitida=Max("fecha_emision"))
+        .values_list("arriendo_id", "emitida")
+    )
+    for arriendo_id, emitida in facturas:
+        if arriendo_id not in cubierto:
+            cubierto[arriendo_id] = periodo_facturable(emitida, periodos[arriendo_id], emitida)[1]
+    for arriendo_id in sin_fecha:
+        cubierto.setdefault(arriendo_id, None)
+    return cubierto
+
+
+def planificar(filas, corte):
+    """
+    Calcula de una vez las OT PROL de un bloque de arriendos (``ARRIENDO_VALUES``).
+
+    Devuelve ``(ordenes, omitidos)``: OT sin guardar (con ``detalle_lineas``)
+    y un conteo por motivo de los arriendos que no se pueden cobrar.
+    """
+    ids = [fila["id"] for fila in filas]
+    maquinas = _maquinas(ids, filas)
+    cubierto = _cubierto_hasta(filas)
+
+    ordenes = []
+    omitidos = {"sin_cliente": 0, "sin_cobertura": 0, "sin_maquinas": 0, "sin_tarifa": 0}
+    for fila in filas:
+        if fila["id"] in cubierto and cubierto[fila["id"]] is None:
+            omitidos["sin_cobertura"] += 1
+            continue
+        previo = cubierto.get(fila["id"])
+        desde = previo + timedelta(days=1) if previo else fila["fecha_inicio"]
+        periodo = _periodo(fila)
+        calculo = periodo_facturable(desde, periodo, corte)
+        if calculo is None:
+            continue
+        if not fila["cliente_id"]:
+            omitidos["sin_cliente"] += 1
+            continue
+        if not maquinas.get(fila["id"]):
+            omitidos["sin_maquinas"] += 1
+            continue
+        if not fila["tarifa"] or fila["tarifa"] <= 0:
+            omitidos["sin_tarifa"] += 1
+            continue
+
+        unidades, hasta = calculo
+        valor = (fila["tarifa"] * unidades).quantize(CENT)
+        iva = (valor * IVA).quantize(CENT)
+        detalle = [
+            {
+                "serie": serie,
+                "unidad": periodo,
+                "cantidadPeriodo": unidades,
+                "desde": desde.isoformat(),
+                "hasta": hasta.isoformat(),
+                "valor": float(valor),
+                "flete": 0.0,
+                "tipoFlete": "",
+                "neto": float(valor),
+                "iva": float(iva),
+                "total": float(valor + iva),
+            }
+            for _maq_id, serie in maquinas[fila["id"]]
+        ]
+        cantidad = len(detalle)
+        ordenes.append(
+            OrdenTrabajo(
+                tipo="PROL",
+                estado="PEND",
+                tipo_comercial="A",
+                es_facturable=True,
+                cliente_id=fila["cliente_id"],
+                maquinaria_id=maquinas[fila["id"]][0][0],
+                arriendo_id=fila["id"],
+                obra_nombre=fila["obra__nombre"],
+                direccion=fila["obra__direccion"],
+                detalle_lineas=detalle,
+                monto_neto=valor * cantidad,
+                monto_iva=iva * cantidad,
+                monto_total=(valor + iva) * cantidad,
+                observaciones=(
+                    f"Generada por facturación recurrente ({desde.isoformat()} a {hasta.isoformat()})."
+                ),
+                # Derivados del listado sin una consulta por OT (ver refresh_denormalized).
+                series_cache=series_de_detalle(detalle),
+                orden_compra_cache="",
+                cliente_rut_cache=fila["cliente__rut"] or "",
+                cliente_razon_cache=fila["cliente__razon_social"] or "",
+            )
+        )
+    return ordenes, omitidos
+
+
+def guardar(ordenes):
+    """Inserta las OT planificadas y sus líneas normalizadas; devuelve cuántas líneas."""
+    OrdenTrabajo.objects.bulk_create(ordenes)
+    maquinas = maquinas_por_serie(series_de(ordenes))
+    lineas = [linea for ot in ordenes for linea in build_lineas(ot, maquinas)]
+    OrdenTrabajoLinea.objects.bulk_create(lineas)
+    return len(lineas)
+
+
+def arriendos_activos():
+    return active_rentals().order_by("id")
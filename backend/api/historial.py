@@ -0,0 +1,138 @@
+# backend/api/historial.py
+"""
+Línea de tiempo de una máquina (``GET /maquinarias/<id>/historial?page=``).
+
+Mezcla arriendos (por ``fecha_inicio``), OT (por día de creación) y GD/FACT
+(por ``fecha_emision``) de la máquina, incluidos los arriendos y OT
+multi-máquina que la nombran en ``ArriendoItem``/``OrdenTrabajoLinea``.
+
+Cada página cuesta un número fijo de consultas, sin importar cuánta vida
+tenga la máquina:
+
+1. ``COUNT`` del ``UNION`` de las tres fuentes.
+2. Las claves ``(fecha, prioridad, clase, id)`` de la página, ordenadas y
+   cortadas en la base sobre ese mismo ``UNION``.
+3. Una consulta por fuente con el detalle de los ids de la página.
+"""
+
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import TruncDate
+
+from .models import Arriendo, ArriendoItem, Documento, OrdenTrabajo, OrdenTrabajoLinea
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+DOC_TIPOS = ("GD", "FACT")
+# Dentro de un mismo día, primero (en orden descendente) los documentos,
+# luego el arriendo y al final la OT que lo originó.
+PRIORIDAD = {"ot": 0, "arriendo": 1, "GD": 2, "FACT": 3}
+
+
+def _arriendos(maq_id):
+    return Arriendo.objects.filter(
+        Q(maquinaria_id=maq_id)
+        | Q(id__in=ArriendoItem.objects.filter(maquinaria_id=maq_id).values("arriendo_id"))
+    )
+
+
+def _ordenes(maq_id):
+    return OrdenTrabajo.objects.filter(
+        Q(maquinaria_id=maq_id)
+        | Q(id__in=OrdenTrabajoLinea.objects.filter(maquinaria_id=maq_id).values("orden_id"))
+    )
+
+
+def _documentos(maq_id):
+    return Documento.objects.filter(tipo__in=DOC_TIPOS, arriendo_id__in=_arriendos(maq_id).values("id"))
+
+
+def _claves(qs, fecha, prioridad, clase):
+    return qs.order_by().annotate(
+        t_fecha=fecha, t_prioridad=prioridad, t_clase=clase
+    ).values_list("t_fecha", "t_prioridad", "t_clase", "id")
+
+
+def _eventos(maq_id):
+    """``UNION ALL`` de las claves de las tres fuentes."""
+    entero = IntegerField()
+    arriendos = _claves(
+        _arriendos(maq_id), F("fecha_inicio"),
+        Value(PRIORIDAD["arriendo"], output_field=entero), Value("arriendo"),
+    )
+    ordenes = _claves(
+        _ordenes(maq_id), TruncDate("fecha_creacion"),
+        Value(PRIORIDAD["ot"], output_field=entero), Value("ot"),
+    )
+    documentos = _claves(
+        _documentos(maq_id), F("fecha_emision"),
+        Case(
+            When(tipo="FACT", then=Value(PRIORIDAD["FACT"])),
+            default=Value(PRIORIDAD["GD"]),
+            output_field=entero,
+        ),
+        F("tipo"),
+    )
+    return arriendos.union(ordenes, documentos, all=True)
+
+
+def _doc_label(doc):
+    return f"{doc.get_tipo_display()} {doc.numero}"
+
+
+def _monto(valor):
+    return None if valor is None else f"{valor:.2f}"
+
+
+def pagina(maq_id, page, page_size):
+    """``{count, page, page_size, results}`` con la página pedida de la línea de tiempo."""
+    eventos = _eventos(maq_id)
+    total = eventos.count()
+    inicio = (page - 1) * page_size
+    claves = list(eventos.order_by("-t_fecha", "-t_prioridad", "-id")[inicio:inicio + page_size])
+
+    ids = {"arriendo": [], "ot": [], "doc": []}
+    for _fecha, _prioridad, clase, obj_id in claves:
+        ids["doc" if clase in DOC_TIPOS else clase].append(obj_id)
+    arriendos = Arriendo.objects.select_related("obra", "cliente").in_bulk(ids["arriendo"])
+    ordenes = OrdenTrabajo.objects.select_related("cliente").in_bulk(ids["ot"])
+    documentos = Documento.objects.in_bulk(ids["doc"])
+
+    results = []
+    for fecha, _prioridad, clase, obj_id in claves:
+        if clase == "arriendo":
+            arr = arriendos[obj_id]
+            results.append({
+                "tipo": "arriendo",
+                "id": arr.id,
+                "fecha": fecha,
+                "fecha_inicio": arr.fecha_inicio,
+                "fecha_termino": arr.fecha_termino,
+                "estado": arr.estado,
+                "obra": arr.obra.nombre if arr.obra_id else "—",
+                "cliente": arr.cliente.razon_social if arr.cliente_id else "",
+            })
+        elif clase == "ot":
+            ot = ordenes[obj_id]
+            results.append({
+                "tipo": "ot",
+                "id": ot.id,
+                "fecha": fecha,
+                "ot_tipo": ot.tipo,
+                "estado": ot.estado,
+                "arriendo_id": ot.arriendo_id,
+                "cliente": ot.cliente.razon_social if ot.cliente_id else "",
+                "monto_total": _monto(ot.monto_total),
+            })
+        else:
+            doc = documentos[obj_id]
+            results.append({
+                "tipo": doc.tipo,
+                "id": doc.id,
+                "fecha": fecha,
+                "documento": _doc_label(doc),
+                "numero": doc.numero,
+                "arriendo_id": doc.arriendo_id,
+                "es_retiro": doc.es_retiro,
+                "monto_total": _monto(doc.monto_total),
+            })
+    return {"count": total, "page": page, "page_size": page_size, "results": results}
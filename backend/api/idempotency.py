@@ -0,0 +1,153 @@
+# backend/api/idempotency.py
+"""
+Soporte del header ``Idempotency-Key`` para POST que el frontend reintenta
+(crear OT, emitir GD/FACT).
+
+- La primera solicitud reserva ``(usuario, alcance, clave)`` con la huella
+  del método, la ruta y el cuerpo, y al terminar guarda status + JSON.
+- Un reintento con la misma clave y el mismo cuerpo recibe la respuesta
+  guardada (header ``Idempotent-Replayed: true``) sin volver a ejecutar nada.
+- Misma clave con otro cuerpo -> 422. Misma clave mientras la primera sigue
+  en curso -> 409 con ``Retry-After``.
+- La reserva dura ``IDEMPOTENCY_LEASE_SECONDS``: si el worker muere a mitad
+  de la solicitud, un reintento posterior la retoma (``UPDATE`` condicional,
+  gana uno solo) en vez de recibir 409 hasta que venza la clave. El plazo debe
+  superar el timeout de los workers.
+- Solo se guardan respuestas 2xx: un 4xx/5xx o una excepción liberan la
+  clave para reintentar después de corregir los datos.
+- Las claves vencen a los ``IDEMPOTENCY_TTL_SECONDS``.
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import metrics
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, separators=(",", ":"), cls=JSONEncoder)
+    raw = f"{request.method} {request.path}\n{body}".encode()
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _reserve(user_id, scope, key, fingerprint):
+    """
+    ``(registro, None)`` si esta solicitud debe ejecutarse, o ``(None, respuesta)``.
+
+    Recibe el id y no ``request.user``: con ``DJANGO_JWT_STATELESS_AUTHZ`` el
+    usuario es un ``ClaimsUser`` armado desde el token, no una instancia de ``User``.
+    """
+    now = timezone.now()
+    IdempotencyKey.objects.filter(expira__lt=now).delete()
+    ttl = getattr(settings, "IDEMPOTENCY_TTL_SECONDS", 86400)
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                user_id=user_id, scope=scope, key=key, fingerprint=fingerprint,
+                reservado=now, expira=now + timedelta(seconds=ttl),
+            )
+        return record, None
+    except IntegrityError:
+        pass
+
+    existing = IdempotencyKey.objects.filter(user_id=user_id, scope=scope, key=key).first()
+    if existing is not None and existing.fingerprint != fingerprint:
+        metrics.incr("idempotency.mismatch")
+        return None, Response(
+            {"detail": "La Idempotency-Key ya se usó con otra solicitud."}, status=422
+        )
+    if existing is not None and existing.status_code is None and _retomar(existing, now, ttl):
+        metrics.incr("idempotency.reclaimed")
+        return existing, None
+    if existing is None or existing.status_code is None:
+        metrics.incr("idempotency.in_progress")
+        return None, Response(
+            {"detail": "Hay una solicitud con la misma Idempotency-Key en curso."},
+            status=409,
+            headers={"Retry-After": "1"},
+        )
+    metrics.incr("idempotency.replayed")
+    return None, Response(
+        existing.response_body,
+        status=existing.status_code,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def _lease():
+    return timedelta(seconds=getattr(settings, "IDEMPOTENCY_LEASE_SECONDS", 300))
+
+
+def _retomar(record, now, ttl):
+    """Toma una reserva en curso cuyo plazo venció; solo un reintento lo logra."""
+    if record.reservado > now - _lease():
+        return False
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, status_code__isnull=True, reservado=record.reservado
+    ).update(reservado=now, expira=now + timedelta(seconds=ttl))
+    if taken:
+        record.reservado = now
+    return bool(taken)
+
+
+def _mine(record):
+    # Si otro reintento retomó la reserva, esta solicitud ya no la toca.
+    return IdempotencyKey.objects.filter(pk=record.pk, reservado=record.reservado)
+
+
+def _release(record):
+    _mine(record).delete()
+
+
+def _finish(record, response):
+    data = getattr(response, "data", None)
+    if not 200 <= response.status_code < 300 or data is None:
+        _release(record)
+        return
+    _mine(record).update(
+        status_code=response.status_code,
+        response_body=json.loads(json.dumps(data, cls=JSONEncoder)),
+    )
+
+
+def idempotent(scope):
+    """Decora un método de viewset (``self, request, ...``) que crea cosas."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(self, request, *args, **kwargs):
+            key = (request.headers.get(HEADER) or "").strip()
+            if not key:
+                return view(self, request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {"detail": f"Idempotency-Key admite hasta {MAX_KEY_LENGTH} caracteres."},
+                    status=400,
+                )
+
+            record, replay = _reserve(request.user.pk, scope, key, request_fingerprint(request))
+            if replay is not None:
+                return replay
+            try:
+                response = view(self, request, *args, **kwargs)
+            except Exception:
+                _release(record)
+                raise
+            _finish(record, response)
+            return response
+
+        return wrapper
+
+    return decorator
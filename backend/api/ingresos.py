@@ -0,0 +1,191 @@
+# backend/api/ingresos.py
+"""
+Resumen mensual de ingresos (``IngresoMensual``) y ``GET /reportes/ingresos``.
+
+- Clave: mes de emisión × cliente × categoría de la máquina del arriendo
+  (``Arriendo.maquinaria`` o su primer ``ArriendoItem``; si no hay, "otro")
+  × tipo (FACT/NC/ND). Las GD no son ingreso y no entran.
+- Se mantiene al vuelo: las señales de ``Documento`` suman/restan cada alta,
+  edición o borrado, y ``registrar_documentos`` cubre los ``bulk_create``
+  (emisión por lote). ``QuerySet.update()`` y ``bulk_update`` no emiten
+  señales: quien los use sobre documentos debe correr ``rebuild_ingresos``.
+  Si cambia la máquina de un arriendo ya facturado, la
+  categoría queda con la de la emisión hasta correr ``rebuild_ingresos``.
+- La consulta usa el resumen cuando el rango son meses completos; un rango
+  arbitrario se suma en la base sobre ``Documento``. En ambos casos la NC resta.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncMonth
+
+from .models import ArriendoItem, Documento, IngresoMensual
+
+TIPOS = ("FACT", "NC", "ND")
+CATEGORIA_DEFECTO = "otro"
+MONTOS = ("monto_neto", "monto_iva", "monto_total")
+GRUPOS = ("mes", "cliente", "categoria", "tipo")
+CERO = Decimal("0")
+
+
+def categoria_documento():
+    """Expresión con la categoría de la máquina del arriendo de cada documento."""
+    primer_item = (
+        ArriendoItem.objects.filter(arriendo_id=OuterRef("arriendo_id"))
+        .order_by("id")
+        .values("maquinaria__categoria")[:1]
+    )
+    return Coalesce(
+        "arriendo__maquinaria__categoria", Subquery(primer_item), Value(CATEGORIA_DEFECTO)
+    )
+
+
+def _filas_documentos(ids):
+    """Clave y montos de los documentos ``ids`` que cuentan como ingreso."""
+    return list(
+        Documento.objects.filter(id__in=ids, tipo__in=TIPOS)
+        .annotate(categoria=categoria_documento())
+        .values("id", "fecha_emision", "cliente_id", "categoria", "tipo", *MONTOS)
+    )
+
+
+def _clave(fila):
+    return (fila["fecha_emision"].replace(day=1), fila["cliente_id"], fila["categoria"], fila["tipo"])
+
+
+def _aplicar(deltas):
+    """Suma ``{clave: [documentos, neto, iva, total]}`` al resumen (upsert con F())."""
+    for (mes, cliente_id, categoria, tipo), (documentos, *montos) in deltas.items():
+        if documentos == 0 and not any(montos):
+            continue
+        filtro = {"mes": mes, "cliente_id": cliente_id, "categoria": categoria, "tipo": tipo}
+        cambios = {"documentos": F("documentos") + documentos}
+        cambios.update({campo: F(campo) + monto for campo, monto in zip(MONTOS, montos)})
+        if IngresoMensual.objects.filter(**filtro).update(**cambios):
+            continue
+        try:
+            with transaction.atomic():
+                IngresoMensual.objects.create(
+                    **filtro, documentos=documentos, **dict(zip(MONTOS, montos))
+                )
+        except IntegrityError:
+            # Otro proceso creó la fila entre el update y el insert.
+            IngresoMensual.objects.filter(**filtro).update(**cambios)
+
+
+def _acumular(deltas, fila, signo=1):
+    total = deltas[_clave(fila)]
+    total[0] += signo
+    for i, campo in enumerate(MONTOS, start=1):
+        total[i] += signo * (fila[campo] or CERO)
+
+
+def _nuevos_deltas():
+    return defaultdict(lambda: [0, CERO, CERO, CERO])
+
+
+def registrar_documentos(docs):
+    """Suma al resumen documentos recién creados sin señales (``bulk_create``)."""
+    deltas = _nuevos_deltas()
+    for fila in _filas_documentos([doc.pk for doc in docs]):
+        _acumular(deltas, fila)
+    _aplicar(deltas)
+
+
+def fila_actual(doc_id):
+    filas = _filas_documentos([doc_id])
+    return filas[0] if filas else None
+
+
+def aplicar_cambio(antes=None, despues=None):
+    """Resta la fila ``antes`` y suma ``despues`` (cualquiera puede ser None)."""
+    deltas = _nuevos_deltas()
+    if antes is not None:
+        _acumular(deltas, antes, -1)
+    if despues is not None:
+        _acumular(deltas, despues)
+    _aplicar(deltas)
+
+
+def filas_resumen(desde=None):
+    """Totales por clave calculados en la base, para ``rebuild_ingresos``."""
+    qs = Documento.objects.filter(tipo__in=TIPOS)
+    if desde is not None:
+        qs = qs.filter(fecha_emision__gte=desde)
+    decimal = DecimalField(max_digits=14, decimal_places=2)
+    return (
+        qs.annotate(mes=TruncMonth("fecha_emision"), categoria=categoria_documento())
+        .values("mes", "cliente_id", "categoria", "tipo")
+        .annotate(
+            suma_documentos=Count("id"),
+            **{
+                f"suma_{campo}": Coalesce(Sum(campo), Value(CERO), output_field=decimal)
+                for campo in MONTOS
+            },
+        )
+        .order_by("mes", "cliente_id", "categoria", "tipo")
+    )
+
+
+def _con_signo(expresion):
+    decimal = DecimalField(max_digits=14, decimal_places=2)
+    return Case(When(tipo="NC", then=-expresion), default=expresion, output_field=decimal)
+
+
+def consultar(desde, hasta, agrupar, cliente=None, categoria=None, tipo=None, usar_resumen=True):
+    """
+    Ingresos entre ``desde`` y ``hasta`` agrupados por ``agrupar`` (subconjunto
+    de ``GRUPOS``). Devuelve ``(filas, fuente)``.
+    """
+    meses_completos = desde.day == 1 and (hasta + timedelta(days=1)).day == 1
+    decimal = DecimalField(max_digits=14, decimal_places=2)
+    if usar_resumen and meses_completos:
+        fuente = "resumen"
+        qs = IngresoMensual.objects.filter(mes__range=(desde, hasta))
+        documentos = Sum("documentos")
+        montos = {f"suma_{campo}": Sum(_con_signo(F(campo))) for campo in MONTOS}
+    else:
+        fuente = "documentos"
+        qs = Documento.objects.filter(tipo__in=TIPOS, fecha_emision__range=(desde, hasta)).annotate(
+            mes=TruncMonth("fecha_emision"), categoria=categoria_documento()
+        )
+        documentos = Count("id")
+        montos = {
+            f"suma_{campo}": Sum(_con_signo(Coalesce(F(campo), Value(CERO), output_field=decimal)))
+            for campo in MONTOS
+        }
+
+    if cliente is not None:
+        qs = qs.filter(cliente_id=cliente)
+    if categoria:
+        qs = qs.filter(categoria=categoria)
+    if tipo:
+        qs = qs.filter(tipo=tipo)
+
+    campos = []
+    for grupo in agrupar:
+        if grupo == "cliente":
+            campos += ["cliente_id", "cliente__razon_social", "cliente__rut"]
+        else:
+            campos.append(grupo)
+    filas = []
+    for fila in qs.values(*campos).annotate(suma_documentos=documentos, **montos).order_by(*campos):
+        salida = {}
+        for grupo in agrupar:
+            if grupo == "mes":
+                salida["mes"] = fila["mes"].strftime("%Y-%m")
+            elif grupo == "cliente":
+                salida["cliente_id"] = fila["cliente_id"]
+                salida["cliente"] = fila["cliente__razon_social"] or ""
+                salida["rut_cliente"] = fila["cliente__rut"] or ""
+            else:
+                salida[grupo] = fila[grupo]
+        salida["documentos"] = fila["suma_documentos"]
+        for campo in MONTOS:
+            salida[campo] = fila[f"suma_{campo}"] or CERO
+        filas.append(salida)
+    return filas, fuente
@@ -0,0 +1,255 @@
+# backend/api/lean_serializers.py
+"""
+Lectura rápida de listados a partir de filas ``values()``.
+
+Arma exactamente el mismo JSON que ``OrdenTrabajoSerializer`` (más
+``_enrich_ot_rows``) y ``DocumentoDetalleSerializer``, pero sin instanciar
+modelos ni serializers anidados por fila: los ``get_*_display`` salen de mapas
+de choices precalculados y los Decimal/fechas se formatean con los mismos
+campos DRF que usa el serializer.
+
+Se activa por endpoint con ``LEAN_READ_ENDPOINTS`` (p. ej. ``ordenes,documentos``).
+"""
+
+from functools import lru_cache
+
+from django.conf import settings
+from rest_framework import serializers
+
+from .models import (
+    DOC_TIPO,
+    OT_ESTADO,
+    OT_TIPO,
+    Documento,
+    OrdenTrabajo,
+    orden_compra_de,
+    series_de_detalle,
+)
+
+DOC_TIPO_DISPLAY = dict(DOC_TIPO)
+OT_TIPO_DISPLAY = dict(OT_TIPO)
+OT_ESTADO_DISPLAY = dict(OT_ESTADO)
+OT_TIPO_COMERCIAL_DISPLAY = dict(OrdenTrabajo.TIPO_COMERCIAL)
+
+DOC_REL_FIELDS = ("tipo", "numero", "fecha_emision", "monto_neto", "monto_iva", "monto_total")
+
+
+def lean_enabled(basename):
+    return basename in getattr(settings, "LEAN_READ_ENDPOINTS", ())
+
+
+def _display(choices, value):
+    return None if value is None else choices.get(value, value)
+
+
+@lru_cache(maxsize=None)
+def _formatters():
+    """Campos DRF reutilizados solo para formatear Decimal / fechas."""
+    money = serializers.DecimalField(max_digits=12, decimal_places=2)
+    return {
+        "money": money.to_representation,
+        "date": serializers.DateField().to_representation,
+        "datetime": serializers.DateTimeField().to_representation,
+    }
+
+
+def _fmt(kind, value):
+    return None if value is None else _formatters()[kind](value)
+
+
+def _doc_relacion(row, prefix):
+    """Equivalente a ``DocumentoRelacionSerializer`` desde columnas ``prefix__*``."""
+    doc_id = row[f"{prefix}_id"]
+    if doc_id is None:
+        return None
+    tipo = row[f"{prefix}__tipo"]
+    numero = row[f"{prefix}__numero"]
+    return {
+        "id": doc_id,
+        "tipo": tipo,
+        "tipo_display": _display(DOC_TIPO_DISPLAY, tipo),
+        "numero": None if numero is None else str(numero),
+        "fecha_emision": _fmt("date", row[f"{prefix}__fecha_emision"]),
+        "monto_neto": _fmt("money", row[f"{prefix}__monto_neto"]),
+        "monto_iva": _fmt("money", row[f"{prefix}__monto_iva"]),
+        "monto_total": _fmt("money", row[f"{prefix}__monto_total"]),
+    }
+
+
+def _rel_values(prefix):
+    return (f"{prefix}_id", *(f"{prefix}__{field}" for field in DOC_REL_FIELDS))
+
+
+def _str_or_none(value):
+    return None if value is None else str(value)
+
+
+# -----------------------------
+# Órdenes de trabajo
+# -----------------------------
+OT_VALUES = (
+    "id", "tipo", "tipo_comercial", "estado", "es_facturable",
+    "fecha_creacion", "fecha_cierre",
+    "cliente_id", "cliente__razon_social", "cliente__rut",
+    "arriendo_id", "maquinaria_id",
+    "maquinaria__marca", "maquinaria__modelo", "maquinaria__serie",
+    *_rel_values("factura"), *_rel_values("guia"),
+    "observaciones", "direccion", "obra_nombre", "contactos",
+    "orden_compra", "vendedor", "fecha_emision_doc",
+    "detalle_lineas", "monto_neto", "monto_iva", "monto_total",
+    *OrdenTrabajo.DENORM_FIELDS,
+)
+
+
+def enrich_ot_row(row, *, rut, razon, serie_principal, series, oc, vendedor, fecha_emision_doc):
+    """Alias que el frontend espera en cada fila de /ordenes."""
+    r = dict(row)
+    r.setdefault("cliente_nombre", razon)
+    r.setdefault("cliente_razon_social", razon)
+    r.setdefault("cliente_razon", razon)
+
+    r["rut_cliente"] = rut
+    r["cliente_rut"] = rut
+    r["rut"] = rut
+
+    r["serie"] = serie_principal
+    r["maquinaria_serie"] = serie_principal
+
+    r["series_maquinas"] = series
+    r["series"] = series
+
+    r["orden_compra"] = oc
+    r["oc"] = oc
+    r["vendedor"] = vendedor
+
+    r.setdefault("fecha_emision_doc", fecha_emision_doc)
+    return r
+
+
+def _maquinaria_label(row):
+    if row["maquinaria_id"] is None:
+        return None
+    marca, modelo, serie = row["maquinaria__marca"], row["maquinaria__modelo"], row["maquinaria__serie"]
+    if serie:
+        return f"{marca} {modelo} ({serie})"
+    return f"{marca} {modelo}"
+
+
+def ot_serializer_row(v):
+    """Lo mismo que ``OrdenTrabajoSerializer(ot).data``."""
+    tipo_comercial = v["tipo_comercial"]
+    return {
+        "id": v["id"],
+        "tipo": v["tipo"],
+        "tipo_display": _display(OT_TIPO_DISPLAY, v["tipo"]),
+        "tipo_comercial": tipo_comercial,
+        "tipo_comercial_display": _display(OT_TIPO_COMERCIAL_DISPLAY, tipo_comercial),
+        "estado": v["estado"],
+        "estado_display": _display(OT_ESTADO_DISPLAY, v["estado"]),
+        "es_facturable": v["es_facturable"],
+        "fecha_creacion": _fmt("datetime", v["fecha_creacion"]),
+        "fecha_cierre": _fmt("datetime", v["fecha_cierre"]),
+        "cliente": v["cliente_id"],
+        "cliente_razon": _str_or_none(v["cliente__razon_social"]),
+        "arriendo": v["arriendo_id"],
+        "maquinaria": v["maquinaria_id"],
+        "maquinaria_label": _maquinaria_label(v),
+        "factura": _doc_relacion(v, "factura"),
+        "guia": _doc_relacion(v, "guia"),
+        "observaciones": _str_or_none(v["observaciones"]),
+        "direccion": _str_or_none(v["direccion"]),
+        "obra_nombre": _str_or_none(v["obra_nombre"]),
+        "contactos": _str_or_none(v["contactos"]),
+        "orden_compra": _str_or_none(v["orden_compra"]),
+        "vendedor": _str_or_none(v["vendedor"]),
+        "fecha_emision_doc": _fmt("date", v["fecha_emision_doc"]),
+        "detalle_lineas": v["detalle_lineas"],
+        "monto_neto": _fmt("money", v["monto_neto"]),
+        "monto_iva": _fmt("money", v["monto_iva"]),
+        "monto_total": _fmt("money", v["monto_total"]),
+    }
+
+
+def ot_list_rows(queryset):
+    """Filas de /ordenes (serializer + enriquecido) desde ``values()``."""
+    filas = []
+    for v in queryset.values(*OT_VALUES):
+        if v["cliente_rut_cache"] is not None:
+            rut, razon = v["cliente_rut_cache"], v["cliente_razon_cache"] or ""
+        else:
+            rut, razon = v["cliente__rut"] or "", v["cliente__razon_social"] or ""
+        series = v["series_cache"]
+        if series is None:
+            series = series_de_detalle(v["detalle_lineas"])
+        oc = v["orden_compra_cache"]
+        if oc is None:
+            oc = orden_compra_de(v["orden_compra"], v["observaciones"])
+        filas.append(
+            enrich_ot_row(
+                ot_serializer_row(v),
+                rut=rut,
+                razon=razon,
+                serie_principal=v["maquinaria__serie"] or "",
+                series=series,
+                oc=oc,
+                vendedor=v["vendedor"] or "",
+                fecha_emision_doc=v["fecha_emision_doc"],
+            )
+        )
+    return filas
+
+
+# -----------------------------
+# Documentos
+# -----------------------------
+DOC_VALUES = (
+    "id", "tipo", "numero", "fecha_emision", "monto_neto", "monto_iva", "monto_total",
+    "cliente_id", "cliente__razon_social", "arriendo_id",
+    *_rel_values("relacionado_con"),
+    "es_retiro", "obra_origen_id", "obra_destino_id", "archivo_url",
+)
+DOC_CHILD_VALUES = ("id", "relacionado_con_id", *DOC_REL_FIELDS)
+
+
+def documento_rows(queryset):
+    """Lo mismo que ``DocumentoDetalleSerializer(qs, many=True).data``."""
+    rows = list(queryset.values(*DOC_VALUES))
+    hijas = {}
+    if rows:
+        hijas_qs = (
+            Documento.objects.filter(relacionado_con_id__in=[v["id"] for v in rows])
+            .order_by("id")
+            .values(*DOC_CHILD_VALUES)
+        )
+        for h in hijas_qs:
+            hijas.setdefault(h["relacionado_con_id"], []).append(
+                _doc_relacion({"doc_id": h["id"], **{f"doc__{k}": h[k] for k in DOC_REL_FIELDS}}, "doc")
+            )
+
+    filas = []
+    for v in rows:
+        fila = {
+            "id": v["id"],
+            "tipo": v["tipo"],
+            "tipo_display": _display(DOC_TIPO_DISPLAY, v["tipo"]),
+            "numero": _str_or_none(v["numero"]),
+            "fecha_emision": _fmt("date", v["fecha_emision"]),
+            "monto_neto": _fmt("money", v["monto_neto"]),
+            "monto_iva": _fmt("money", v["monto_iva"]),
+            "monto_total": _fmt("money", v["monto_total"]),
+            "cliente": v["cliente_id"],
+        }
+        # Sin cliente, DRF omite la clave (atributo anidado ausente).
+        if v["cliente_id"] is not None:
+            fila["cliente_razon"] = _str_or_none(v["cliente__razon_social"])
+        fila.update({
+            "arriendo_id": v["arriendo_id"],
+            "relacionado_con": _doc_relacion(v, "relacionado_con"),
+            "relaciones_inversas": hijas.get(v["id"], []),
+            "es_retiro": v["es_retiro"],
+            "obra_origen": v["obra_origen_id"],
+            "obra_destino": v["obra_destino_id"],
+            "archivo_url": _str_or_none(v["archivo_url"]),
+        })
+        filas.append(fila)
+    return filas
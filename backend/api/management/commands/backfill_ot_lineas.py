@@ -0,0 +1,71 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from api.models import OrdenTrabajo, OrdenTrabajoLinea
+from api.ot_lineas import build_lineas, maquinas_por_serie, series_de
+
+
+class Command(BaseCommand):
+    help = (
+        "Puebla OrdenTrabajoLinea desde OrdenTrabajo.detalle_lineas por bloques. "
+        "Solo procesa OT sin líneas, así que se puede reanudar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Cuenta lo que se crearía sin escribir.",
+        )
+        parser.add_argument(
+            "--rebuild", action="store_true",
+            help="Regenera también las OT que ya tienen líneas.",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        if chunk_size < 1:
+            raise CommandError("--chunk-size debe ser positivo.")
+        dry_run = options["dry_run"]
+        rebuild = options["rebuild"]
+
+        qs = OrdenTrabajo.objects.only("id", "detalle_lineas").order_by("id")
+        if not rebuild:
+            qs = qs.filter(
+                ~Exists(OrdenTrabajoLinea.objects.filter(orden=OuterRef("pk")))
+            )
+
+        ordenes = lineas = chunks = 0
+        last_id = 0
+        while True:
+            chunk = list(qs.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+            chunks += 1
+
+            maquinas = maquinas_por_serie(series_de(chunk))
+            nuevas = [linea for ot in chunk for linea in build_lineas(ot, maquinas)]
+            ordenes += len(chunk)
+            lineas += len(nuevas)
+            if dry_run:
+                continue
+            with transaction.atomic():
+                if rebuild:
+                    OrdenTrabajoLinea.objects.filter(orden__in=chunk).delete()
+                OrdenTrabajoLinea.objects.bulk_create(nuevas, batch_size=chunk_size)
+
+        self.stdout.write(json.dumps(
+            {
+                "command": "backfill_ot_lineas",
+                "dry_run": dry_run,
+                "rebuild": rebuild,
+                "chunks": chunks,
+                "ordenes": ordenes,
+                "lineas": lineas,
+            },
+            sort_keys=True, separators=(",", ":"),
+        ))
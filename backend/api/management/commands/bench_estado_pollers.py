@@ -0,0 +1,112 @@
+import asyncio
+import json
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+
+from api.authentication import AuthzRefreshToken
+
+
+def _summary(latencies, elapsed, **extra):
+    ordered = sorted(latencies)
+    p95 = ordered[max(0, int(round(len(ordered) * 0.95)) - 1)] if ordered else 0.0
+    return {
+        **extra,
+        "requests": len(ordered),
+        "seconds": round(elapsed, 4),
+        "requests_per_second": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(statistics.median(ordered) * 1000, 2) if ordered else 0.0,
+        "p95_ms": round(p95 * 1000, 2),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga de prueba en proceso: pollers concurrentes del dashboard contra "
+        "la ruta WSGI (pool de hilos) y la ruta ASGI async (un event loop)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", required=True)
+        parser.add_argument("--path", default="/ordenes/estado-arriendos")
+        parser.add_argument("--pollers", type=int, default=50)
+        parser.add_argument("--rounds", type=int, default=5)
+        parser.add_argument(
+            "--wsgi-threads", type=int, default=4,
+            help="Hilos de un worker WSGI (p.ej. gunicorn --threads).",
+        )
+
+    def handle(self, *args, **options):
+        for key in ("pollers", "rounds", "wsgi_threads"):
+            if options[key] < 1:
+                raise CommandError(f"--{key.replace('_', '-')} debe ser positivo.")
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist as exc:
+            raise CommandError("Usuario no encontrado.") from exc
+
+        headers = {"authorization": f"Bearer {AuthzRefreshToken.for_user(user).access_token}"}
+        path = options["path"]
+        connections.close_all()
+
+        # Los clientes de prueba de Django siempre envían Host: testserver.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            wsgi = self._run_wsgi(path, headers, options)
+            asgi = asyncio.run(self._run_asgi("/async" + path, headers, options))
+        self.stdout.write(json.dumps(
+            {"command": "bench_estado_pollers", "path": path, "wsgi": wsgi, "asgi": asgi},
+            sort_keys=True, separators=(",", ":"),
+        ))
+
+    @staticmethod
+    def _run_wsgi(path, headers, options):
+        def poller(_):
+            client = Client()
+            latencies = []
+            try:
+                for _ in range(options["rounds"]):
+                    started = perf_counter()
+                    response = client.get(path, headers=headers)
+                    latencies.append(perf_counter() - started)
+                    if response.status_code != 200:
+                        raise CommandError(f"WSGI respondió {response.status_code}.")
+            finally:
+                connections.close_all()
+            return latencies
+
+        started = perf_counter()
+        with ThreadPoolExecutor(max_workers=options["wsgi_threads"]) as pool:
+            results = list(pool.map(poller, range(options["pollers"])))
+        elapsed = perf_counter() - started
+        return _summary(
+            [lat for chunk in results for lat in chunk], elapsed,
+            pollers=options["pollers"], threads=options["wsgi_threads"],
+        )
+
+    @staticmethod
+    async def _run_asgi(path, headers, options):
+        client = AsyncClient()
+
+        async def poller():
+            latencies = []
+            for _ in range(options["rounds"]):
+                started = perf_counter()
+                response = await client.get(path, headers=headers)
+                latencies.append(perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(f"ASGI respondió {response.status_code}.")
+            return latencies
+
+        started = perf_counter()
+        results = await asyncio.gather(*(poller() for _ in range(options["pollers"])))
+        elapsed = perf_counter() - started
+        return _summary(
+            [lat for chunk in results for lat in chunk], elapsed,
+            pollers=options["pollers"],
+        )
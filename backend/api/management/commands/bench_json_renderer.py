@@ -0,0 +1,62 @@
+import json
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import DocumentoDetalleSerializer
+from api.views import DocumentoViewSet, OrdenTrabajoViewSet
+
+
+def _time(renderer, data, rounds):
+    started = perf_counter()
+    for _ in range(rounds):
+        body = renderer.render(data)
+    return perf_counter() - started, body
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el tiempo de render JSON de /documentos y /ordenes (datos actuales): "
+        "JSONRenderer de DRF vs FastJSONRenderer (orjson). Verifica bytes idénticos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Filas por listado.")
+        parser.add_argument("--rounds", type=int, default=5)
+
+    def handle(self, *args, **options):
+        for key in ("rows", "rounds"):
+            if options[key] < 1:
+                raise CommandError(f"--{key} debe ser positivo.")
+        if orjson is None:
+            raise CommandError("orjson no está instalado.")
+        rows, rounds = options["rows"], options["rounds"]
+
+        ot_qs = OrdenTrabajoViewSet.queryset.order_by("-fecha_creacion")[:rows]
+        ot_data = OrdenTrabajoViewSet()._enrich_ot_rows(
+            ot_qs, list(OrdenTrabajoViewSet.serializer_class(ot_qs, many=True).data)
+        )
+        doc_data = DocumentoDetalleSerializer(
+            DocumentoViewSet.queryset.order_by("-fecha_emision", "-id")[:rows], many=True
+        ).data
+
+        result = {}
+        for endpoint, data in (("documentos", doc_data), ("ordenes", ot_data)):
+            drf_s, drf_body = _time(JSONRenderer(), data, rounds)
+            fast_s, fast_body = _time(FastJSONRenderer(), data, rounds)
+            result[endpoint] = {
+                "rows": len(data),
+                "bytes": len(drf_body),
+                "identical": drf_body == fast_body,
+                "drf_ms": round(drf_s * 1000 / rounds, 3),
+                "orjson_ms": round(fast_s * 1000 / rounds, 3),
+                "saved_ms": round((drf_s - fast_s) * 1000 / rounds, 3),
+                "speedup": round(drf_s / fast_s, 2) if fast_s else None,
+            }
+
+        self.stdout.write(json.dumps(
+            {"command": "bench_json_renderer", "rounds": rounds, **result},
+            sort_keys=True, separators=(",", ":"),
+        ))
@@ -0,0 +1,68 @@
+import json
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.lean_serializers import documento_rows, ot_list_rows
+from api.serializers import DocumentoDetalleSerializer
+from api.views import DocumentoViewSet, OrdenTrabajoViewSet
+
+
+def _rate(fn, rounds):
+    rows = 0
+    started = perf_counter()
+    for _ in range(rounds):
+        rows += len(fn())
+    elapsed = perf_counter() - started
+    return {
+        "rows": rows,
+        "seconds": round(elapsed, 4),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara filas/segundo de los listados /ordenes y /documentos: "
+        "ModelSerializer vs filas values() (lean_serializers) sobre los datos actuales."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Filas por listado.")
+        parser.add_argument("--rounds", type=int, default=3)
+
+    def handle(self, *args, **options):
+        for key in ("rows", "rounds"):
+            if options[key] < 1:
+                raise CommandError(f"--{key} debe ser positivo.")
+        rows, rounds = options["rows"], options["rounds"]
+
+        ot_view = OrdenTrabajoViewSet()
+        ot_qs = OrdenTrabajoViewSet.queryset.order_by("-fecha_creacion")[:rows]
+        doc_qs = DocumentoViewSet.queryset.order_by("-fecha_emision", "-id")[:rows]
+
+        def ot_model():
+            qs = ot_qs.all()
+            data = OrdenTrabajoViewSet.serializer_class(qs, many=True).data
+            return ot_view._enrich_ot_rows(qs, list(data))
+
+        result = {
+            "ordenes": {
+                "model": _rate(ot_model, rounds),
+                "lean": _rate(lambda: ot_list_rows(ot_qs.all()), rounds),
+            },
+            "documentos": {
+                "model": _rate(
+                    lambda: DocumentoDetalleSerializer(doc_qs.all(), many=True).data, rounds
+                ),
+                "lean": _rate(lambda: documento_rows(doc_qs.all()), rounds),
+            },
+        }
+        for endpoint in result.values():
+            model, lean = endpoint["model"]["rows_per_second"], endpoint["lean"]["rows_per_second"]
+            endpoint["speedup"] = round(lean / model, 2) if model else None
+
+        self.stdout.write(json.dumps(
+            {"command": "bench_lean_serializers", "rounds": rounds, **result},
+            sort_keys=True, separators=(",", ":"),
+        ))
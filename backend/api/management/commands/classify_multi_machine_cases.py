@@ -273,9 +273,21 @@ def classify(report):
 class Command(BaseCommand):
     help = "Clasifica en memoria los casos técnicos del preflight multi-máquina."
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="Procesos para el preflight (ver multi_machine_preflight --workers).",
+        )
+
     def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers debe ser positivo.")
+        extra = (
+            {"workers": options["workers"], "stderr": self.stderr}
+            if options["workers"] > 1 else {}
+        )
         captured = StringIO()
-        call_command("multi_machine_preflight", stdout=captured)
+        call_command("multi_machine_preflight", stdout=captured, **extra)
         try:
             decoder = json.JSONDecoder()
             raw = captured.getvalue()
@@ -0,0 +1,51 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.disponibilidad import SIN_FIN, cargar_ocupaciones, detectar_solapes
+
+
+class Command(BaseCommand):
+    help = (
+        "Reporta arriendos que ocupan la misma máquina en períodos que se cruzan "
+        "(por Arriendo.maquinaria o ArriendoItem). Solo lectura."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit", type=int, default=200,
+            help="Máximo de conflictos a detallar en la salida.",
+        )
+        parser.add_argument(
+            "--fail-on-conflict", action="store_true",
+            help="Termina con error si encuentra algún conflicto.",
+        )
+
+    def handle(self, *args, **options):
+        if options["limit"] < 0:
+            raise CommandError("--limit no puede ser negativo.")
+        ocupaciones = cargar_ocupaciones()
+        solapes = detectar_solapes(ocupaciones)
+
+        self.stdout.write(json.dumps(
+            {
+                "command": "detectar_solapes",
+                "maquinas": len(ocupaciones),
+                "intervalos": sum(len(intervalos) for intervalos in ocupaciones.values()),
+                "conflictos": len(solapes),
+                "maquinas_con_conflicto": len({solape[0] for solape in solapes}),
+                "detalle": [
+                    {
+                        "maquinaria_id": maq_id,
+                        "arriendo_a": arriendo_a,
+                        "arriendo_b": arriendo_b,
+                        "desde": desde.isoformat(),
+                        "hasta": None if hasta == SIN_FIN else hasta.isoformat(),
+                    }
+                    for maq_id, arriendo_a, arriendo_b, desde, hasta in solapes[: options["limit"]]
+                ],
+            },
+            sort_keys=True, separators=(",", ":"),
+        ))
+        if solapes and options["fail_on_conflict"]:
+            raise CommandError(f"{len(solapes)} arriendos se cruzan con otro de la misma máquina.")
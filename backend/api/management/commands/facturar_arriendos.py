@@ -0,0 +1,77 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.facturacion import ARRIENDO_VALUES, arriendos_activos, guardar, planificar
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera por bloques las OT PROL pendientes de facturar de los arriendos "
+        "activos según periodo, tarifa y lo ya cubierto. Se puede reanudar: lo "
+        "generado en una corrida anterior cuenta como cubierto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument(
+            "--fecha", default=None,
+            help="Fecha de corte (YYYY-MM-DD). Por defecto, hoy.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Calcula y reporta lo que se generaría sin escribir.",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        if chunk_size < 1:
+            raise CommandError("--chunk-size debe ser positivo.")
+        try:
+            corte = date.fromisoformat(options["fecha"]) if options["fecha"] else timezone.now().date()
+        except ValueError:
+            raise CommandError("--fecha debe tener formato YYYY-MM-DD.")
+        dry_run = options["dry_run"]
+
+        qs = arriendos_activos().values(*ARRIENDO_VALUES)
+        arriendos = ordenes = lineas = chunks = 0
+        monto_neto = Decimal("0")
+        omitidos = {}
+        last_id = 0
+        while True:
+            chunk = list(qs.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1]["id"]
+            chunks += 1
+            arriendos += len(chunk)
+
+            with transaction.atomic():
+                nuevas, saltados = planificar(chunk, corte)
+                if not dry_run and nuevas:
+                    lineas += guardar(nuevas)
+                elif dry_run:
+                    lineas += sum(len(ot.detalle_lineas) for ot in nuevas)
+            ordenes += len(nuevas)
+            monto_neto += sum((ot.monto_neto for ot in nuevas), Decimal("0"))
+            for motivo, cantidad in saltados.items():
+                omitidos[motivo] = omitidos.get(motivo, 0) + cantidad
+
+        self.stdout.write(json.dumps(
+            {
+                "command": "facturar_arriendos",
+                "dry_run": dry_run,
+                "fecha_corte": corte.isoformat(),
+                "chunks": chunks,
+                "arriendos": arriendos,
+                "ordenes": ordenes,
+                "lineas": lineas,
+                "monto_neto": str(monto_neto),
+                "omitidos": omitidos,
+            },
+            sort_keys=True, separators=(",", ":"),
+        ))
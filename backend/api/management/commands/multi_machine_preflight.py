@@ -1,164 +1,307 @@
+import hashlib
 import json
-from collections import Counter, defaultdict
+import multiprocessing
+import tempfile
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 
-from django.core.management.base import BaseCommand
-from django.db.models import Count
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Max, Min
 
+from api import preflight_workers
 from api.models import Arriendo, Maquinaria, OrdenTrabajo
 
+# Orden de las claves de primer nivel del reporte (``sort_keys``); ``summary``
+# va al final, así que el modo streaming puede hashear todo lo anterior antes
+# de conocer los totales.
+REPORT_KEYS = (
+    "active_duplicate_machine_groups", "deterministic_pairs", "manual_review",
+    "protected_document_links", "read_only", "schema_version", "summary",
+)
+# Hallazgos por código que caben en memoria antes de pasar a disco.
+SPOOL_MAX_BYTES = 1 << 20
+# Con --workers N las OT se reparten en N * SHARDS_PER_WORKER rangos de id.
+SHARDS_PER_WORKER = 4
+ORDER_VALUES = ("id", "arriendo_id", "maquinaria_id", "detalle_lineas", "arriendo__maquinaria_id")
+
+
+def dumps(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+def finding(code, entity, entity_id, *, arriendo_id=None, orden_id=None,
+            line_index=None, related_ids=()):
+    return {
+        "code": code,
+        "entity": entity,
+        "entity_id": entity_id,
+        "arriendo_id": arriendo_id,
+        "orden_trabajo_id": orden_id,
+        "line_index": line_index,
+        "related_ids": sorted(set(related_ids)),
+    }
+
+
+def finding_sort_key(item):
+    return (
+        item["code"], item["entity"], item["entity_id"],
+        -1 if item["orden_trabajo_id"] is None else item["orden_trabajo_id"],
+        -1 if item["line_index"] is None else item["line_index"],
+        item["related_ids"],
+    )
+
+
+def machines_by_series():
+    index = defaultdict(list)
+    for machine_id, serie in Maquinaria.objects.order_by("id").values_list("id", "serie").iterator():
+        if isinstance(serie, str):
+            index[serie.casefold()].append(machine_id)
+    return index
+
+
+def rental_findings(rental, order_ids):
+    rental_id = rental["id"]
+    if rental["maquinaria_id"] is None:
+        yield finding("LEGACY_FK_NULL", "arriendo", rental_id, arriendo_id=rental_id)
+    if not order_ids:
+        yield finding("RENTAL_WITHOUT_WORK_ORDER", "arriendo", rental_id,
+                      arriendo_id=rental_id)
+    elif len(order_ids) > 1:
+        yield finding("MULTIPLE_WORK_ORDERS_FOR_RENTAL", "arriendo", rental_id,
+                      arriendo_id=rental_id, related_ids=order_ids)
+
+
+def order_findings(order, rental_machine_id, series_index):
+    order_id = order["id"]
+    rental_id = order["arriendo_id"]
+    order_machine_id = order["maquinaria_id"]
+    if rental_id is None:
+        yield finding("WORK_ORDER_WITHOUT_RENTAL", "orden_trabajo", order_id,
+                      orden_id=order_id)
+    if order_machine_id is None:
+        yield finding("WORK_ORDER_MACHINE_FK_NULL", "orden_trabajo", order_id,
+                      arriendo_id=rental_id, orden_id=order_id)
+    elif rental_id is not None and order_machine_id != rental_machine_id:
+        related = [order_machine_id]
+        if rental_machine_id is not None:
+            related.append(rental_machine_id)
+        yield finding("WORK_ORDER_MACHINE_DIFFERS_FROM_RENTAL_FK", "orden_trabajo",
+                      order_id, arriendo_id=rental_id, orden_id=order_id,
+                      related_ids=related)
+
+    lines = order["detalle_lineas"]
+    if not isinstance(lines, list):
+        yield finding("DETAIL_LINES_NOT_LIST", "orden_trabajo", order_id,
+                      arriendo_id=rental_id, orden_id=order_id)
+        return
+
+    valid_series = [
+        line.get("serie") for line in lines
+        if isinstance(line, dict) and isinstance(line.get("serie"), str)
+        and line.get("serie").strip()
+    ]
+    duplicate_keys = {
+        key for key, count in Counter(value.casefold() for value in valid_series).items()
+        if count > 1
+    }
+    for index, line in enumerate(lines):
+        common = {"arriendo_id": rental_id, "orden_id": order_id,
+                  "line_index": index}
+        if not isinstance(line, dict):
+            yield finding("DETAIL_LINE_NOT_OBJECT", "orden_trabajo", order_id, **common)
+            continue
+        if "serie" not in line:
+            yield finding("DETAIL_SERIES_MISSING", "orden_trabajo", order_id, **common)
+            continue
+        serie = line["serie"]
+        if not isinstance(serie, str):
+            yield finding("DETAIL_SERIES_NOT_STRING", "orden_trabajo", order_id, **common)
+            continue
+        if not serie.strip():
+            yield finding("DETAIL_SERIES_BLANK", "orden_trabajo", order_id, **common)
+            continue
+        key = serie.casefold()
+        if key in duplicate_keys:
+            yield finding("DETAIL_SERIES_DUPLICATE", "orden_trabajo", order_id, **common)
+        matching_ids = series_index.get(key, [])
+        if not matching_ids:
+            yield finding("DETAIL_SERIES_NOT_FOUND", "orden_trabajo", order_id, **common)
+        elif len(matching_ids) > 1:
+            yield finding("DETAIL_SERIES_AMBIGUOUS", "orden_trabajo", order_id,
+                          related_ids=matching_ids, **common)
+        elif rental_id is not None and matching_ids[0] != rental_machine_id:
+            related = [matching_ids[0]]
+            if rental_machine_id is not None:
+                related.append(rental_machine_id)
+            yield finding("DETAIL_SERIES_MATCHES_DIFFERENT_MACHINE", "orden_trabajo",
+                          order_id, related_ids=related, **common)
+
+
+def id_shards(first_id, last_id, count):
+    """Parte ``[first_id, last_id]`` en a lo más ``count`` rangos contiguos del mismo ancho."""
+    width = max(1, -(-(last_id - first_id + 1) // count))
+    return [
+        (start, min(start + width - 1, last_id))
+        for start in range(first_id, last_id + 1, width)
+    ]
+
+
+def iter_order_findings(first_id, last_id, chunk_size, series_index):
+    """Hallazgos de las OT con id en ``[first_id, last_id]`` (None: todas), OT por OT en orden de id."""
+    rows = OrdenTrabajo.objects.order_by("id").values(*ORDER_VALUES)
+    if first_id is not None:
+        rows = rows.filter(id__range=(first_id, last_id))
+    for order in rows.iterator(chunk_size=chunk_size):
+        yield from order_findings(order, order["arriendo__maquinaria_id"], series_index)
+
+
+def order_shard(first_id, last_id, chunk_size, series_index):
+    """Lista de hallazgos de un rango (lo que devuelve cada proceso del pool)."""
+    return list(iter_order_findings(first_id, last_id, chunk_size, series_index))
+
+
+def parallel_safe():
+    """Los procesos no ven una base SQLite en memoria ni lo no confirmado por el llamador."""
+    if connection.vendor == "sqlite" and connection.is_in_memory_db():
+        return False
+    return not connection.in_atomic_block
+
+
+def order_shard_results(workers, chunk_size, series_index, on_fallback=None):
+    """
+    Iterables de hallazgos de OT por rango de id, en orden de id.
+
+    En serie es un solo generador que avanza OT por OT. Con ``workers > 1``
+    los rangos tienen a lo más ``chunk_size`` ids y corren en un pool de
+    procesos; los resultados se leen en el orden de los rangos (la mezcla es
+    determinista) con a lo más ``2 * workers`` rangos en vuelo, así que la
+    memoria no crece con la tabla.
+    """
+    if workers == 1:
+        yield iter_order_findings(None, None, chunk_size, series_index)
+        return
+    bounds = OrdenTrabajo.objects.aggregate(first=Min("id"), last=Max("id"))
+    if bounds["first"] is None:
+        return
+    span = bounds["last"] - bounds["first"] + 1
+    count = max(workers * SHARDS_PER_WORKER, -(-span // chunk_size))
+    shards = id_shards(bounds["first"], bounds["last"], count)
+    if not parallel_safe():
+        if on_fallback is not None:
+            on_fallback()
+        for first_id, last_id in shards:
+            yield iter_order_findings(first_id, last_id, chunk_size, series_index)
+        return
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=preflight_workers.init,
+        initargs=(connection.settings_dict["NAME"],),
+    ) as pool:
+        in_flight = deque()
+        for first_id, last_id in shards:
+            in_flight.append(pool.submit(preflight_workers.shard, (first_id, last_id, chunk_size)))
+            if len(in_flight) >= 2 * workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def active_duplicate_groups():
+    active_rows = (
+        Arriendo.objects.filter(estado__iexact="Activo", maquinaria_id__isnull=False)
+        .order_by("maquinaria_id", "id")
+        .values_list("maquinaria_id", "id")
+    )
+    active_by_machine = defaultdict(list)
+    for machine_id, rental_id in active_rows.iterator():
+        active_by_machine[machine_id].append(rental_id)
+    return [
+        {"maquinaria_id": machine_id, "arriendo_ids": rental_ids}
+        for machine_id, rental_ids in active_by_machine.items()
+        if len(rental_ids) > 1
+    ]
+
+
+def protected_document_links():
+    rows = (
+        Arriendo.objects.annotate(document_count=Count("documentos"))
+        .filter(document_count__gt=0).order_by("id")
+        .values_list("id", "document_count")
+    )
+    for rental_id, document_count in rows.iterator():
+        yield {"arriendo_id": rental_id, "document_count": document_count}
+
 
 class Command(BaseCommand):
     help = "Inventario de solo lectura para el preflight de la migración multi-máquina."
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stream", action="store_true",
+            help=(
+                "Recorre las tablas por bloques y escribe NDJSON (un registro por "
+                "línea, el resumen al final) con memoria acotada. El "
+                "canonical_sha256 del resumen es el sha256 del JSON del modo normal."
+            ),
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help=(
+                "Procesos para revisar las OT, repartidas por rangos de id. "
+                "La salida es idéntica a la de un solo proceso."
+            ),
+        )
+
     def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size debe ser positivo.")
+        if options["workers"] < 1:
+            raise CommandError("--workers debe ser positivo.")
+        self.workers = options["workers"]
+        if options["stream"]:
+            self.handle_stream(options["chunk_size"])
+            return
+
         arriendos = list(
             Arriendo.objects.order_by("id").values("id", "maquinaria_id", "estado")
         )
-        ordenes = list(
-            OrdenTrabajo.objects.order_by("id").values(
-                "id", "arriendo_id", "maquinaria_id", "detalle_lineas"
-            )
+        # En serie basta una lectura de OT; con --workers cada proceso lee su rango.
+        order_values = ("id", "arriendo_id") if self.workers > 1 else (
+            "id", "arriendo_id", "maquinaria_id", "detalle_lineas"
         )
-
-        machines_by_series = defaultdict(list)
-        for machine_id, serie in Maquinaria.objects.order_by("id").values_list("id", "serie"):
-            if isinstance(serie, str):
-                machines_by_series[serie.casefold()].append(machine_id)
-
-        findings = []
-
-        def add(code, entity, entity_id, *, arriendo_id=None, orden_id=None,
-                line_index=None, related_ids=()):
-            findings.append({
-                "code": code,
-                "entity": entity,
-                "entity_id": entity_id,
-                "arriendo_id": arriendo_id,
-                "orden_trabajo_id": orden_id,
-                "line_index": line_index,
-                "related_ids": sorted(set(related_ids)),
-            })
+        ordenes = list(OrdenTrabajo.objects.order_by("id").values(*order_values))
+        series_index = machines_by_series()
 
         orders_by_rental = defaultdict(list)
         for order in ordenes:
             if order["arriendo_id"] is not None:
                 orders_by_rental[order["arriendo_id"]].append(order["id"])
 
+        findings = []
         deterministic_pairs = []
         for rental in arriendos:
-            rental_id = rental["id"]
-            machine_id = rental["maquinaria_id"]
-            order_ids = orders_by_rental[rental_id]
-            if machine_id is None:
-                add("LEGACY_FK_NULL", "arriendo", rental_id, arriendo_id=rental_id)
-            else:
+            if rental["maquinaria_id"] is not None:
                 deterministic_pairs.append({
-                    "arriendo_id": rental_id, "maquinaria_id": machine_id
+                    "arriendo_id": rental["id"], "maquinaria_id": rental["maquinaria_id"]
                 })
-            if not order_ids:
-                add("RENTAL_WITHOUT_WORK_ORDER", "arriendo", rental_id,
-                    arriendo_id=rental_id)
-            elif len(order_ids) > 1:
-                add("MULTIPLE_WORK_ORDERS_FOR_RENTAL", "arriendo", rental_id,
-                    arriendo_id=rental_id, related_ids=order_ids)
-
-        rental_machine = {row["id"]: row["maquinaria_id"] for row in arriendos}
-        for order in ordenes:
-            order_id = order["id"]
-            rental_id = order["arriendo_id"]
-            order_machine_id = order["maquinaria_id"]
-            rental_machine_id = rental_machine.get(rental_id)
-            if rental_id is None:
-                add("WORK_ORDER_WITHOUT_RENTAL", "orden_trabajo", order_id,
-                    orden_id=order_id)
-            if order_machine_id is None:
-                add("WORK_ORDER_MACHINE_FK_NULL", "orden_trabajo", order_id,
-                    arriendo_id=rental_id, orden_id=order_id)
-            elif rental_id is not None and order_machine_id != rental_machine_id:
-                related = [order_machine_id]
-                if rental_machine_id is not None:
-                    related.append(rental_machine_id)
-                add("WORK_ORDER_MACHINE_DIFFERS_FROM_RENTAL_FK", "orden_trabajo",
-                    order_id, arriendo_id=rental_id, orden_id=order_id,
-                    related_ids=related)
-
-            lines = order["detalle_lineas"]
-            if not isinstance(lines, list):
-                add("DETAIL_LINES_NOT_LIST", "orden_trabajo", order_id,
-                    arriendo_id=rental_id, orden_id=order_id)
-                continue
-
-            valid_series = [
-                line.get("serie") for line in lines
-                if isinstance(line, dict) and isinstance(line.get("serie"), str)
-                and line.get("serie").strip()
-            ]
-            duplicate_keys = {
-                key for key, count in Counter(value.casefold() for value in valid_series).items()
-                if count > 1
-            }
-            for index, line in enumerate(lines):
-                common = {"arriendo_id": rental_id, "orden_id": order_id,
-                          "line_index": index}
-                if not isinstance(line, dict):
-                    add("DETAIL_LINE_NOT_OBJECT", "orden_trabajo", order_id, **common)
-                    continue
-                if "serie" not in line:
-                    add("DETAIL_SERIES_MISSING", "orden_trabajo", order_id, **common)
-                    continue
-                serie = line["serie"]
-                if not isinstance(serie, str):
-                    add("DETAIL_SERIES_NOT_STRING", "orden_trabajo", order_id, **common)
-                    continue
-                if not serie.strip():
-                    add("DETAIL_SERIES_BLANK", "orden_trabajo", order_id, **common)
-                    continue
-                key = serie.casefold()
-                if key in duplicate_keys:
-                    add("DETAIL_SERIES_DUPLICATE", "orden_trabajo", order_id, **common)
-                matching_ids = machines_by_series.get(key, [])
-                if not matching_ids:
-                    add("DETAIL_SERIES_NOT_FOUND", "orden_trabajo", order_id, **common)
-                elif len(matching_ids) > 1:
-                    add("DETAIL_SERIES_AMBIGUOUS", "orden_trabajo", order_id,
-                        related_ids=matching_ids, **common)
-                elif rental_id is not None and matching_ids[0] != rental_machine_id:
-                    related = [matching_ids[0]]
-                    if rental_machine_id is not None:
-                        related.append(rental_machine_id)
-                    add("DETAIL_SERIES_MATCHES_DIFFERENT_MACHINE", "orden_trabajo",
-                        order_id, related_ids=related, **common)
-
-        findings.sort(key=lambda item: (
-            item["code"], item["entity"], item["entity_id"],
-            -1 if item["orden_trabajo_id"] is None else item["orden_trabajo_id"],
-            -1 if item["line_index"] is None else item["line_index"],
-            item["related_ids"],
-        ))
-
-        active_rows = (
-            Arriendo.objects.filter(estado__iexact="Activo", maquinaria_id__isnull=False)
-            .order_by("maquinaria_id", "id")
-            .values_list("maquinaria_id", "id")
-        )
-        active_by_machine = defaultdict(list)
-        for machine_id, rental_id in active_rows:
-            active_by_machine[machine_id].append(rental_id)
-        duplicate_groups = [
-            {"maquinaria_id": machine_id, "arriendo_ids": rental_ids}
-            for machine_id, rental_ids in active_by_machine.items()
-            if len(rental_ids) > 1
-        ]
-
-        document_links = list(
-            Arriendo.objects.annotate(document_count=Count("documentos"))
-            .filter(document_count__gt=0).order_by("id")
-            .values("id", "document_count")
-        )
-        protected_document_links = [
-            {"arriendo_id": row["id"], "document_count": row["document_count"]}
-            for row in document_links
-        ]
+            findings.extend(rental_findings(rental, orders_by_rental[rental["id"]]))
+
+        if self.workers > 1:
+            for shard in self.order_shards(options["chunk_size"], series_index):
+                findings.extend(shard)
+        else:
+            rental_machine = {row["id"]: row["maquinaria_id"] for row in arriendos}
+            for order in ordenes:
+                findings.extend(order_findings(
+                    order, rental_machine.get(order["arriendo_id"]), series_index
+                ))
+        findings.sort(key=finding_sort_key)
+
+        duplicate_groups = active_duplicate_groups()
+        document_links = list(protected_document_links())
 
         report = {
             "schema_version": 1,
@@ -175,11 +318,128 @@ class Command(BaseCommand):
                 ),
                 "manual_review_findings": len(findings),
                 "active_duplicate_machine_groups": len(duplicate_groups),
-                "arriendos_with_documents": len(protected_document_links),
+                "arriendos_with_documents": len(document_links),
             },
             "deterministic_pairs": deterministic_pairs,
             "manual_review": findings,
             "active_duplicate_machine_groups": duplicate_groups,
-            "protected_document_links": protected_document_links,
+            "protected_document_links": document_links,
+        }
+        self.stdout.write(dumps(report))
+
+    def order_shards(self, chunk_size, series_index):
+        def fallback():
+            self.stderr.write(
+                "--workers: la base no es visible desde otros procesos (SQLite en "
+                "memoria o transacción abierta); se revisa por rangos en este proceso."
+            )
+
+        return order_shard_results(self.workers, chunk_size, series_index, on_fallback=fallback)
+
+    def handle_stream(self, chunk_size):
+        """
+        Misma lógica que el modo normal, sin listas completas en memoria:
+
+        - Índices compactos: serie -> máquinas y arriendo -> OT (solo ids);
+          la máquina del arriendo de cada OT sale del JOIN de la consulta.
+        - Cada registro se escribe al generarse como una línea NDJSON.
+        - El hash se calcula sobre los mismos bytes que produciría
+          ``json.dumps(report, sort_keys=True)``. Los hallazgos de un mismo
+          código ya salen en el orden de ``finding_sort_key`` (por id y
+          línea), así que basta con guardarlos por código en archivos
+          temporales y concatenarlos en orden de código al final.
+        """
+        digest = hashlib.sha256()
+        summary = Counter()
+
+        def emit(kind, record):
+            self.stdout.write(dumps({"kind": kind, **record}))
+
+        def hash_list(key, items, first=False, encoded=False):
+            digest.update(f'{"{" if first else ","}"{key}":['.encode())
+            count = 0
+            for item in items:
+                digest.update((b"," if count else b"") + (item if encoded else dumps(item)).encode())
+                count += 1
+            digest.update(b"]")
+            return count
+
+        def emitted(kind, items):
+            for item in items:
+                emit(kind, item)
+                yield item
+
+        summary["active_duplicate_machine_groups"] = hash_list(
+            REPORT_KEYS[0],
+            emitted("active_duplicate_machine_group", active_duplicate_groups()),
+            first=True,
+        )
+
+        series_index = machines_by_series()
+        orders_by_rental = defaultdict(list)
+        order_keys = OrdenTrabajo.objects.order_by("id").values_list("id", "arriendo_id")
+        for order_id, rental_id in order_keys.iterator(chunk_size=chunk_size):
+            summary["ordenes_trabajo_total"] += 1
+            if rental_id is None:
+                summary["ordenes_trabajo_without_arriendo"] += 1
+            else:
+                orders_by_rental[rental_id].append(order_id)
+
+        spools = {}
+
+        def spool(found):
+            for item in found:
+                emit("finding", item)
+                if item["code"] not in spools:
+                    spools[item["code"]] = tempfile.SpooledTemporaryFile(
+                        max_size=SPOOL_MAX_BYTES, mode="w+", encoding="utf-8"
+                    )
+                spools[item["code"]].write(dumps(item) + "\n")
+                summary["manual_review_findings"] += 1
+
+        def pairs():
+            rentals = Arriendo.objects.order_by("id").values("id", "maquinaria_id", "estado")
+            for rental in rentals.iterator(chunk_size=chunk_size):
+                summary["arriendos_total"] += 1
+                spool(rental_findings(rental, orders_by_rental.pop(rental["id"], [])))
+                if rental["maquinaria_id"] is None:
+                    summary["arriendos_without_legacy_fk"] += 1
+                else:
+                    yield {"arriendo_id": rental["id"], "maquinaria_id": rental["maquinaria_id"]}
+
+        summary["deterministic_legacy_fk_pairs"] = hash_list(
+            REPORT_KEYS[1], emitted("deterministic_pair", pairs())
+        )
+
+        for shard in self.order_shards(chunk_size, series_index):
+            spool(shard)
+
+        def spooled_findings():
+            for code in sorted(spools):
+                with spools[code] as handle:
+                    handle.seek(0)
+                    for line in handle:
+                        yield line.rstrip("\n")
+
+        hash_list(REPORT_KEYS[2], spooled_findings(), encoded=True)
+        summary["arriendos_with_documents"] = hash_list(
+            REPORT_KEYS[3], emitted("protected_document_link", protected_document_links())
+        )
+
+        summary_block = {
+            key: summary[key] for key in (
+                "active_duplicate_machine_groups", "arriendos_total",
+                "arriendos_with_documents", "arriendos_without_legacy_fk",
+                "deterministic_legacy_fk_pairs", "manual_review_findings",
+                "ordenes_trabajo_total", "ordenes_trabajo_without_arriendo",
+            )
         }
-        self.stdout.write(json.dumps(report, sort_keys=True, separators=(",", ":")))
+        digest.update(
+            f',"read_only":true,"schema_version":1,"summary":{dumps(summary_block)}}}'.encode()
+        )
+        emit("summary", {
+            "schema_version": 1,
+            "read_only": True,
+            "summary": summary_block,
+            "canonical_sha256": digest.hexdigest(),
+        })
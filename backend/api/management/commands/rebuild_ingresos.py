@@ -0,0 +1,57 @@
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.ingresos import MONTOS, filas_resumen
+from api.models import IngresoMensual
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula IngresoMensual (FACT/NC/ND por mes, cliente, categoría y tipo) "
+        "desde Documento. Sin --desde rehace todo el resumen."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--desde", default=None,
+            help="Primer mes a recalcular (YYYY-MM). Por defecto, todos.",
+        )
+
+    def handle(self, *args, **options):
+        desde = None
+        if options["desde"]:
+            try:
+                desde = date.fromisoformat(f"{options['desde'][:7]}-01")
+            except ValueError:
+                raise CommandError("--desde debe tener formato YYYY-MM.")
+
+        nuevas = [
+            IngresoMensual(
+                mes=fila["mes"],
+                cliente_id=fila["cliente_id"],
+                categoria=fila["categoria"],
+                tipo=fila["tipo"],
+                documentos=fila["suma_documentos"],
+                **{campo: fila[f"suma_{campo}"] for campo in MONTOS},
+            )
+            for fila in filas_resumen(desde)
+        ]
+        with transaction.atomic():
+            viejas = IngresoMensual.objects.all()
+            if desde is not None:
+                viejas = viejas.filter(mes__gte=desde)
+            borradas, _ = viejas.delete()
+            IngresoMensual.objects.bulk_create(nuevas, batch_size=1000)
+
+        self.stdout.write(json.dumps(
+            {
+                "command": "rebuild_ingresos",
+                "desde": desde.isoformat() if desde else None,
+                "borradas": borradas,
+                "filas": len(nuevas),
+            },
+            sort_keys=True, separators=(",", ":"),
+        ))
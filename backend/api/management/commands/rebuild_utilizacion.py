@@ -0,0 +1,73 @@
+import json
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import UtilizacionDiaria
+from api.utilizacion import conteos_diarios
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula UtilizacionDiaria (máquinas arrendadas / en tránsito por día y "
+        "categoría) para días cerrados. Sin --desde rehace los últimos --dias; "
+        "pensado para correr cada noche."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", default=None, help="Primer día (YYYY-MM-DD).")
+        parser.add_argument(
+            "--hasta", default=None,
+            help="Último día (YYYY-MM-DD). Por defecto y como máximo, ayer.",
+        )
+        parser.add_argument("--dias", type=int, default=60)
+        parser.add_argument("--chunk-days", type=int, default=366)
+
+    def handle(self, *args, **options):
+        if options["chunk_days"] < 1 or options["dias"] < 1:
+            raise CommandError("--chunk-days y --dias deben ser positivos.")
+        ayer = timezone.now().date() - timedelta(days=1)
+        try:
+            hasta = date.fromisoformat(options["hasta"]) if options["hasta"] else ayer
+            desde = (
+                date.fromisoformat(options["desde"]) if options["desde"]
+                else ayer - timedelta(days=options["dias"] - 1)
+            )
+        except ValueError:
+            raise CommandError("Las fechas deben tener formato YYYY-MM-DD.")
+        hasta = min(hasta, ayer)
+        if hasta < desde:
+            raise CommandError("--hasta debe ser posterior o igual a --desde.")
+
+        chunks = filas = 0
+        inicio = desde
+        while inicio <= hasta:
+            fin = min(inicio + timedelta(days=options["chunk_days"] - 1), hasta)
+            conteos = conteos_diarios(inicio, fin)
+            nuevas = [
+                UtilizacionDiaria(
+                    fecha=fecha, categoria=categoria,
+                    maquinas=maquinas, arrendadas=arrendadas, en_transito=en_transito,
+                )
+                for (fecha, categoria), (maquinas, arrendadas, en_transito) in sorted(conteos.items())
+            ]
+            with transaction.atomic():
+                UtilizacionDiaria.objects.filter(fecha__range=(inicio, fin)).delete()
+                UtilizacionDiaria.objects.bulk_create(nuevas, batch_size=1000)
+            filas += len(nuevas)
+            chunks += 1
+            inicio = fin + timedelta(days=1)
+
+        self.stdout.write(json.dumps(
+            {
+                "command": "rebuild_utilizacion",
+                "desde": desde.isoformat(),
+                "hasta": hasta.isoformat(),
+                "chunks": chunks,
+                "dias": (hasta - desde).days + 1,
+                "filas": filas,
+            },
+            sort_keys=True, separators=(",", ":"),
+        ))
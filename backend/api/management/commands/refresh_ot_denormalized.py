@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from api.models import OrdenTrabajo
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula por bloques los campos derivados de OrdenTrabajo (series, OC "
+        "efectiva, RUT y razón social del cliente) usados por el listado de OT."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument(
+            "--all", action="store_true",
+            help="Recalcula todas las OT, no solo las que tienen derivados vacíos.",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        if chunk_size < 1:
+            raise CommandError("--chunk-size debe ser positivo.")
+
+        qs = OrdenTrabajo.objects.select_related("cliente").order_by("id")
+        if not options["all"]:
+            pendientes = Q()
+            for field in OrdenTrabajo.DENORM_FIELDS:
+                pendientes |= Q(**{f"{field}__isnull": True})
+            qs = qs.filter(pendientes)
+
+        ordenes = chunks = 0
+        last_id = 0
+        while True:
+            chunk = list(qs.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+            for ot in chunk:
+                ot.refresh_denormalized()
+            with transaction.atomic():
+                OrdenTrabajo.objects.bulk_update(chunk, OrdenTrabajo.DENORM_FIELDS)
+            ordenes += len(chunk)
+            chunks += 1
+
+        self.stdout.write(json.dumps(
+            {"command": "refresh_ot_denormalized", "chunks": chunks, "ordenes": ordenes},
+            sort_keys=True, separators=(",", ":"),
+        ))
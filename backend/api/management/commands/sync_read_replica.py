@@ -0,0 +1,50 @@
+import json
+import sqlite3
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.db_routers import PRIMARY_ALIAS, REPLICA_ALIAS
+
+
+class Command(BaseCommand):
+    help = "Copia la base SQLite primaria a la réplica de lectura usando la API de backup."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            help="Archivo destino; por defecto el NAME del alias 'replica'.",
+        )
+        parser.add_argument("--pages", type=int, default=256)
+
+    def handle(self, *args, **options):
+        source = connections[PRIMARY_ALIAS]
+        if source.vendor != "sqlite":
+            raise CommandError("La sincronización por backup solo aplica a SQLite.")
+
+        target = options.get("target")
+        if not target:
+            replica = connections.settings.get(REPLICA_ALIAS)
+            if not replica:
+                raise CommandError("No hay alias 'replica' configurado ni --target.")
+            target = replica["NAME"]
+        target = Path(target)
+        if not target.parent.is_dir():
+            raise CommandError("El directorio de la réplica no existe.")
+        if options["pages"] < 1:
+            raise CommandError("--pages debe ser positivo.")
+
+        source.ensure_connection()
+        destination = sqlite3.connect(str(target))
+        try:
+            # backup() copia por bloques de páginas y cede el lock entre pasos,
+            # de modo que las escrituras del primario no quedan bloqueadas.
+            source.connection.backup(destination, pages=options["pages"])
+        finally:
+            destination.close()
+
+        self.stdout.write(json.dumps(
+            {"command": "sync_read_replica", "target": str(target)},
+            sort_keys=True, separators=(",", ":"),
+        ))
@@ -0,0 +1,28 @@
+# backend/api/metrics.py
+"""
+Contadores simples en memoria del proceso (login, throttling, etc.).
+
+No reemplazan a un sistema de métricas: sirven para inspeccionar un worker
+desde ``GET /metricas`` (solo superusuarios) o desde pruebas.
+"""
+
+import threading
+from collections import Counter
+
+_counters = Counter()
+_lock = threading.Lock()
+
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def snapshot():
+    with _lock:
+        return dict(sorted(_counters.items()))
+
+
+def reset():
+    with _lock:
+        _counters.clear()
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_add_arriendo_item_schema'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoFlota',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=40)),
+                ('payload', models.TextField(help_text='JSON ya serializado del evento')),
+                ('creado', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'db_table': 'EventoFlota',
+            },
+        ),
+    ]
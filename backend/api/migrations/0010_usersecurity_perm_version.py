@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_eventoflota'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersecurity',
+            name='perm_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Índice funcional para el login sin distinguir mayúsculas (LOWER(username)).
+# auth_user pertenece a django.contrib.auth, por eso se crea con SQL directo.
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_usersecurity_perm_version'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS auth_user_username_lower_idx ON auth_user (LOWER(username));',
+            reverse_sql='DROP INDEX IF EXISTS auth_user_username_lower_idx;',
+        ),
+    ]
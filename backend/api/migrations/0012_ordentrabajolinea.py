@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:44
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_auth_user_username_lower_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrdenTrabajoLinea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicion', models.PositiveSmallIntegerField(help_text='Índice de la línea dentro de detalle_lineas')),
+                ('serie', models.CharField(blank=True, default='', max_length=120)),
+                ('unidad', models.CharField(blank=True, default='Dia', max_length=10)),
+                ('cantidad_periodo', models.PositiveIntegerField(default=0)),
+                ('desde', models.DateField(blank=True, null=True)),
+                ('hasta', models.DateField(blank=True, null=True)),
+                ('tipo_flete', models.CharField(blank=True, default='', max_length=50)),
+                ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('flete', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('neto', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('iva', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('maquinaria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='lineas_ot', to='api.maquinaria')),
+                ('orden', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='api.ordentrabajo')),
+            ],
+            options={
+                'db_table': 'OrdenTrabajoLinea',
+                'ordering': ['orden', 'posicion'],
+                'indexes': [models.Index(django.db.models.functions.text.Lower('serie'), name='ot_linea_serie_lower_idx'), models.Index(fields=['maquinaria', 'desde'], name='ot_linea_maq_desde_idx'), models.Index(fields=['desde'], name='ot_linea_desde_idx')],
+                'constraints': [models.UniqueConstraint(fields=('orden', 'posicion'), name='ot_linea_orden_pos_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Índice GIN para buscar series dentro de detalle_lineas en Postgres
+# (api.views.detalle_serie_sql). En SQLite la búsqueda usa json_each y no
+# requiere índice, así que la migración no hace nada.
+
+from django.db import migrations
+
+INDEX_NAME = "ot_detalle_lineas_lower_gin"
+
+
+def crear_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON "OrdenTrabajo" '
+        "USING GIN ((lower(detalle_lineas::text)::jsonb) jsonb_path_ops);"
+    )
+
+
+def borrar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME};")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_ordentrabajolinea'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
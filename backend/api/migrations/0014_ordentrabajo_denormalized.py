@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_ot_detalle_lineas_serie_gin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordentrabajo',
+            name='cliente_razon_cache',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='ordentrabajo',
+            name='cliente_rut_cache',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='ordentrabajo',
+            name='orden_compra_cache',
+            field=models.CharField(blank=True, editable=False, max_length=200, null=True),
+        ),
+        migrations.AddField(
+            model_name='ordentrabajo',
+            name='series_cache',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
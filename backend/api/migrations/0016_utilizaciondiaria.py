@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UtilizacionDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('categoria', models.CharField(max_length=32)),
+                ('maquinas', models.PositiveIntegerField(default=0)),
+                ('arrendadas', models.PositiveIntegerField(default=0)),
+                ('en_transito', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'UtilizacionDiaria',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'categoria'), name='utilizacion_fecha_categoria_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_utilizaciondiaria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngresoMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes')),
+                ('categoria', models.CharField(max_length=32)),
+                ('tipo', models.CharField(choices=[('FACT', 'Factura'), ('GD', 'Guía de despacho'), ('NC', 'Nota de crédito'), ('ND', 'Nota de débito')], max_length=4)),
+                ('documentos', models.IntegerField(default=0)),
+                ('monto_neto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('monto_iva', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('monto_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cliente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ingresos_mensuales', to='api.cliente')),
+            ],
+            options={
+                'db_table': 'IngresoMensual',
+                'constraints': [models.UniqueConstraint(condition=models.Q(('cliente__isnull', False)), fields=('mes', 'cliente', 'categoria', 'tipo'), name='ingreso_mes_cliente_uniq'), models.UniqueConstraint(condition=models.Q(('cliente__isnull', True)), fields=('mes', 'categoria', 'tipo'), name='ingreso_mes_sin_cliente_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_ingresomensual'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='arriendo',
+            index=models.Index(fields=['maquinaria', 'fecha_inicio', 'fecha_termino'], name='arriendo_maq_fechas_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maquinaria',
+            index=models.Index(fields=['categoria', 'altura'], name='maq_categoria_altura_idx'),
+        ),
+    ]
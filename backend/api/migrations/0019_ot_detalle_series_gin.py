@@ -0,0 +1,50 @@
+# Reemplaza el índice GIN de 0013 por uno sobre las series de detalle_lineas
+# ya recortadas y en minúsculas (api.views.detalle_serie_sql), para que la
+# búsqueda exacta en Postgres recorte espacios igual que la de SQLite. En
+# SQLite la migración no hace nada.
+
+from django.db import migrations
+
+ANTERIOR = "ot_detalle_lineas_lower_gin"
+INDEX_NAME = "ot_detalle_series_gin"
+FUNCION = "ot_detalle_series"
+
+
+def crear_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"CREATE OR REPLACE FUNCTION {FUNCION}(detalle jsonb) RETURNS text[] "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$ "
+        "SELECT coalesce(array_agg(lower(btrim(l.value ->> 'serie'))), '{}') "
+        "FROM jsonb_array_elements("
+        "CASE WHEN jsonb_typeof(detalle) = 'array' THEN detalle ELSE '[]'::jsonb END"
+        ") AS l WHERE jsonb_typeof(l.value) = 'object' AND l.value ->> 'serie' IS NOT NULL $$;"
+    )
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON "OrdenTrabajo" '
+        f"USING GIN ({FUNCION}(detalle_lineas));"
+    )
+    schema_editor.execute(f"DROP INDEX IF EXISTS {ANTERIOR};")
+
+
+def borrar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {ANTERIOR} ON "OrdenTrabajo" '
+        "USING GIN ((lower(detalle_lineas::text)::jsonb) jsonb_path_ops);"
+    )
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME};")
+    schema_editor.execute(f"DROP FUNCTION IF EXISTS {FUNCION}(jsonb);")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_disponibilidad_indices'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
@@ -0,0 +1,65 @@
+# Llena IngresoMensual con los documentos emitidos antes de que existiera el
+# resumen (0017 solo creó la tabla). Recalcula todo, igual que
+# `manage.py rebuild_ingresos`, así que es seguro aunque la tabla ya tenga filas.
+
+from django.db import migrations
+from django.db.models import Count, DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+TIPOS = ("FACT", "NC", "ND")
+MONTOS = ("monto_neto", "monto_iva", "monto_total")
+
+
+def llenar_resumen(apps, schema_editor):
+    Documento = apps.get_model("api", "Documento")
+    ArriendoItem = apps.get_model("api", "ArriendoItem")
+    IngresoMensual = apps.get_model("api", "IngresoMensual")
+
+    primer_item = (
+        ArriendoItem.objects.filter(arriendo_id=OuterRef("arriendo_id"))
+        .order_by("id")
+        .values("maquinaria__categoria")[:1]
+    )
+    decimal = DecimalField(max_digits=14, decimal_places=2)
+    filas = (
+        Documento.objects.filter(tipo__in=TIPOS)
+        .annotate(
+            mes=TruncMonth("fecha_emision"),
+            categoria=Coalesce("arriendo__maquinaria__categoria", Subquery(primer_item), Value("otro")),
+        )
+        .values("mes", "cliente_id", "categoria", "tipo")
+        .annotate(
+            documentos=Count("id"),
+            **{
+                f"suma_{campo}": Coalesce(Sum(campo), Value(0), output_field=decimal)
+                for campo in MONTOS
+            },
+        )
+        .order_by()
+    )
+    IngresoMensual.objects.all().delete()
+    IngresoMensual.objects.bulk_create(
+        [
+            IngresoMensual(
+                mes=fila["mes"],
+                cliente_id=fila["cliente_id"],
+                categoria=fila["categoria"],
+                tipo=fila["tipo"],
+                documentos=fila["documentos"],
+                **{campo: fila[f"suma_{campo}"] for campo in MONTOS},
+            )
+            for fila in filas
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_ot_detalle_series_gin'),
+    ]
+
+    operations = [
+        migrations.RunPython(llenar_resumen, migrations.RunPython.noop),
+    ]
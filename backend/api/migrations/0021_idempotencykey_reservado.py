@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_backfill_ingresomensual'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='reservado',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
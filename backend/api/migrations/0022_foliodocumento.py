@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_idempotencykey_reservado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FolioDocumento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('FACT', 'Factura'), ('GD', 'Guía de despacho'), ('NC', 'Nota de crédito'), ('ND', 'Nota de débito')], max_length=4, unique=True)),
+                ('ultimo', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'FolioDocumento',
+            },
+        ),
+    ]
@@ -1,5 +1,9 @@
 # backend/api/models.py
+import re
+
 from django.db import models
+from django.db.models.functions import Lower
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 
@@ -45,6 +49,12 @@ class Maquinaria(models.Model):
 
     estado = models.CharField(max_length=20, choices=ESTADO, default="Disponible")
 
+    class Meta:
+        indexes = [
+            # Búsqueda de disponibilidad por categoría y rango de altura.
+            models.Index(fields=["categoria", "altura"], name="maq_categoria_altura_idx"),
+        ]
+
     def __str__(self):
         return f"{self.marca} {self.modelo or ''} ({self.serie or 's/serie'})".strip()
 
@@ -69,6 +79,22 @@ class Cliente(models.Model):
     def __str__(self):
         return self.razon_social
 
+    def save(self, *args, **kwargs):
+        previo = None
+        if not self._state.adding and self.pk:
+            previo = (
+                Cliente.objects.filter(pk=self.pk)
+                .values_list("rut", "razon_social")
+                .first()
+            )
+        super().save(*args, **kwargs)
+        if previo and previo != (self.rut, self.razon_social):
+            # Mantiene al día las copias usadas por el listado de OT.
+            OrdenTrabajo.objects.filter(cliente=self).update(
+                cliente_rut_cache=self.rut,
+                cliente_razon_cache=self.razon_social,
+            )
+
 
 class Obra(models.Model):
     nombre = models.CharField(max_length=100)
@@ -101,6 +127,13 @@ class Arriendo(models.Model):
 
     class Meta:
         db_table = "Arriendo"
+        indexes = [
+            # Cruce de fechas por máquina (``disponibilidad.cruce_arriendos``).
+            models.Index(
+                fields=["maquinaria", "fecha_inicio", "fecha_termino"],
+                name="arriendo_maq_fechas_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Arriendo #{self.id}"
@@ -136,6 +169,9 @@ class UserSecurity(models.Model):
     failed_attempts = models.PositiveIntegerField(default=0)
     is_locked = models.BooleanField(default=False)
     locked_at = models.DateTimeField(null=True, blank=True)
+    # Se incrementa cuando cambian los flags de autorización o la clave;
+    # invalida los claims embebidos en los JWT emitidos antes (api.authentication).
+    perm_version = models.PositiveIntegerField(default=0)
 
     class Meta:
         db_table = "UserSecurity"
@@ -201,6 +237,23 @@ class Documento(models.Model):
         return f"{self.get_tipo_display()} {self.numero}"
 
 
+class FolioDocumento(models.Model):
+    """
+    Último folio asignado por tipo de documento. La emisión bloquea la fila
+    de su tipo hasta el commit (``api.views._next_doc_numbers``), así que dos
+    emisiones concurrentes, aunque sean de OTs distintas, no repiten número.
+    """
+
+    tipo = models.CharField(max_length=4, choices=DOC_TIPO, unique=True)
+    ultimo = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "FolioDocumento"
+
+    def __str__(self):
+        return f"{self.tipo} {self.ultimo:04d}"
+
+
 # --------------------------------------------
 # Órdenes de trabajo (motor “pendiente de facturar”)
 # --------------------------------------------
@@ -219,6 +272,27 @@ OT_ESTADO = (
 )
 
 
+def series_de_detalle(detalle):
+    """Series únicas de detalle_lineas, en orden de aparición."""
+    series = []
+    try:
+        for linea in detalle or []:
+            serie = (linea.get("serie") or "").strip()
+            if serie and serie not in series:
+                series.append(serie)
+    except Exception:
+        pass
+    return series
+
+
+def orden_compra_de(orden_compra, observaciones):
+    """OC del campo o, en OT antiguas, la escrita como "OC: ..." en observaciones."""
+    if orden_compra:
+        return str(orden_compra)
+    m = re.search(r"OC:\s*(.+)", observaciones or "")
+    return m.group(1).strip() if m else ""
+
+
 class OrdenTrabajo(models.Model):
     # Relaciones clásicas
     arriendo = models.ForeignKey(
@@ -317,6 +391,18 @@ class OrdenTrabajo(models.Model):
 
     observaciones = models.TextField(blank=True, null=True)
 
+    # Derivados para el listado, calculados al guardar (NULL = aún sin calcular;
+    # ver refresh_ot_denormalized).
+    series_cache = models.JSONField(null=True, blank=True, editable=False)
+    orden_compra_cache = models.CharField(max_length=200, null=True, blank=True, editable=False)
+    cliente_rut_cache = models.CharField(max_length=20, null=True, blank=True, editable=False)
+    cliente_razon_cache = models.CharField(max_length=100, null=True, blank=True, editable=False)
+
+    DENORM_FIELDS = (
+        "series_cache", "orden_compra_cache", "cliente_rut_cache", "cliente_razon_cache",
+    )
+    DENORM_SOURCES = {"cliente", "cliente_id", "detalle_lineas", "orden_compra", "observaciones"}
+
     class Meta:
         db_table = "OrdenTrabajo"
         ordering = ["-fecha_creacion"]
@@ -324,9 +410,190 @@ class OrdenTrabajo(models.Model):
     def __str__(self):
         return f"OT #{self.id} [{self.get_tipo_display()}] – {self.get_estado_display()}"
 
+    def series_lineas(self):
+        return series_de_detalle(self.detalle_lineas)
+
+    def orden_compra_efectiva(self):
+        return orden_compra_de(self.orden_compra, self.observaciones)
+
+    def refresh_denormalized(self):
+        cliente = self.cliente if self.cliente_id else None
+        self.series_cache = self.series_lineas()
+        self.orden_compra_cache = self.orden_compra_efectiva()[:200]
+        self.cliente_rut_cache = cliente.rut if cliente else ""
+        self.cliente_razon_cache = cliente.razon_social if cliente else ""
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or self.DENORM_SOURCES & set(update_fields):
+            self.refresh_denormalized()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *self.DENORM_FIELDS}
+        super().save(*args, **kwargs)
+
+
+# --------------------------------------------
+# Líneas de OT normalizadas (espejo de detalle_lineas)
+# --------------------------------------------
+class OrdenTrabajoLinea(models.Model):
+    orden = models.ForeignKey(
+        "OrdenTrabajo",
+        on_delete=models.CASCADE,
+        related_name="lineas",
+    )
+    posicion = models.PositiveSmallIntegerField(
+        help_text="Índice de la línea dentro de detalle_lineas",
+    )
+    maquinaria = models.ForeignKey(
+        "Maquinaria",
+        on_delete=models.PROTECT,
+        related_name="lineas_ot",
+        null=True,
+        blank=True,
+    )
+    serie = models.CharField(max_length=120, blank=True, default="")
+    unidad = models.CharField(max_length=10, blank=True, default="Dia")
+    cantidad_periodo = models.PositiveIntegerField(default=0)
+    desde = models.DateField(null=True, blank=True)
+    hasta = models.DateField(null=True, blank=True)
+    tipo_flete = models.CharField(max_length=50, blank=True, default="")
+    valor = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    flete = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    neto = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    iva = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = "OrdenTrabajoLinea"
+        ordering = ["orden", "posicion"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["orden", "posicion"],
+                name="ot_linea_orden_pos_uniq",
+            ),
+        ]
+        indexes = [
+            models.Index(Lower("serie"), name="ot_linea_serie_lower_idx"),
+            models.Index(fields=["maquinaria", "desde"], name="ot_linea_maq_desde_idx"),
+            models.Index(fields=["desde"], name="ot_linea_desde_idx"),
+        ]
+
+    def __str__(self):
+        return f"Línea {self.posicion} OT #{self.orden_id} – {self.serie}"
 
 
+# --------------------------------------------
+# Eventos de flota (stream SSE entre workers)
+# --------------------------------------------
+class EventoFlota(models.Model):
+    tipo = models.CharField(max_length=40)
+    payload = models.TextField(help_text="JSON ya serializado del evento")
+    creado = models.DateTimeField(auto_now_add=True, db_index=True)
 
+    class Meta:
+        db_table = "EventoFlota"
 
+    def __str__(self):
+        return f"Evento #{self.id} {self.tipo}"
 
 
+# --------------------------------------------
+# Idempotency-Key de POST reintentables
+# --------------------------------------------
+class IdempotencyKey(models.Model):
+    """
+    Respuesta guardada de un POST con ``Idempotency-Key`` (ver
+    ``api/idempotency.py``). ``status_code`` NULL = la primera solicitud aún
+    se está procesando; ``reservado`` marca cuándo la tomó, y pasado
+    ``IDEMPOTENCY_LEASE_SECONDS`` un reintento puede retomarla.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="idempotency_keys")
+    scope = models.CharField(max_length=40)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+    reservado = models.DateTimeField(default=timezone.now)
+    expira = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = "IdempotencyKey"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "scope", "key"], name="idempotency_user_scope_key_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key} ({self.status_code or 'en curso'})"
+
+
+# --------------------------------------------
+# Resumen diario de utilización de la flota
+# --------------------------------------------
+class UtilizacionDiaria(models.Model):
+    """
+    Máquinas arrendadas / en tránsito por día y categoría (ver
+    ``api/utilizacion.py``). Lo llena ``rebuild_utilizacion``; solo días
+    cerrados, así que ``/maquinarias/utilizacion`` lo suma para rangos largos.
+    """
+
+    fecha = models.DateField()
+    categoria = models.CharField(max_length=32)
+    maquinas = models.PositiveIntegerField(default=0)
+    arrendadas = models.PositiveIntegerField(default=0)
+    en_transito = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "UtilizacionDiaria"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["fecha", "categoria"], name="utilizacion_fecha_categoria_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.categoria}: {self.arrendadas}/{self.maquinas}"
+
+
+# --------------------------------------------
+# Ingresos mensuales (resumen de FACT/NC/ND)
+# --------------------------------------------
+class IngresoMensual(models.Model):
+    """
+    Totales de documentos tributarios por mes × cliente × categoría × tipo
+    (ver ``api/ingresos.py``). Se actualiza al emitir/editar/borrar
+    documentos y se regenera con ``rebuild_ingresos``. Los montos se guardan
+    sin signo: la NC resta al consultar.
+    """
+
+    mes = models.DateField(help_text="Primer día del mes")
+    cliente = models.ForeignKey(
+        "Cliente", on_delete=models.CASCADE, related_name="ingresos_mensuales", null=True, blank=True
+    )
+    categoria = models.CharField(max_length=32)
+    tipo = models.CharField(max_length=4, choices=DOC_TIPO)
+    documentos = models.IntegerField(default=0)
+    monto_neto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    monto_iva = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    monto_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = "IngresoMensual"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["mes", "cliente", "categoria", "tipo"],
+                condition=models.Q(cliente__isnull=False),
+                name="ingreso_mes_cliente_uniq",
+            ),
+            models.UniqueConstraint(
+                fields=["mes", "categoria", "tipo"],
+                condition=models.Q(cliente__isnull=True),
+                name="ingreso_mes_sin_cliente_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m} {self.tipo} {self.categoria}: {self.monto_total}"
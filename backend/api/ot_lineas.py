@@ -0,0 +1,110 @@
+# backend/api/ot_lineas.py
+"""
+Conversión de ``OrdenTrabajo.detalle_lineas`` (JSON) a filas de
+``OrdenTrabajoLinea``.
+
+El JSON sigue siendo la fuente que ve el frontend; la tabla es su espejo
+indexado para consultas por serie, máquina o fecha sin recorrer cada OT.
+La usan ``OrdenTrabajoViewSet.create`` y el comando ``backfill_ot_lineas``.
+"""
+
+from datetime import date as _date
+from decimal import Decimal, InvalidOperation
+
+from django.db.models.functions import Lower
+
+from .models import Maquinaria, OrdenTrabajoLinea
+
+CENT = Decimal("0.01")
+
+
+def _decimal(value):
+    try:
+        return Decimal(str(value if value not in (None, "") else "0")).quantize(CENT)
+    except (InvalidOperation, ValueError):
+        return Decimal("0.00")
+
+
+def _int(value):
+    try:
+        return max(int(value or 0), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _date_or_none(value):
+    if not value:
+        return None
+    try:
+        return _date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        return None
+
+
+def _series(detalle):
+    return {
+        str(linea.get("serie") or "").strip().lower()
+        for linea in detalle or []
+        if isinstance(linea, dict) and str(linea.get("serie") or "").strip()
+    }
+
+
+def maquinas_por_serie(series):
+    """``{serie en minúsculas: maquinaria_id}`` en una sola consulta."""
+    if not series:
+        return {}
+    resultado = {}
+    rows = (
+        Maquinaria.objects.annotate(serie_lower=Lower("serie"))
+        .filter(serie_lower__in=series)
+        .order_by("pk")
+        .values_list("serie_lower", "id")
+    )
+    for serie, maq_id in rows:
+        resultado.setdefault(serie, maq_id)
+    return resultado
+
+
+def build_lineas(ot, maquinas=None):
+    """Filas (sin guardar) para ``ot`` a partir de su ``detalle_lineas``."""
+    detalle = ot.detalle_lineas if isinstance(ot.detalle_lineas, list) else []
+    if maquinas is None:
+        maquinas = maquinas_por_serie(_series(detalle))
+
+    lineas = []
+    for posicion, linea in enumerate(detalle):
+        if not isinstance(linea, dict):
+            continue
+        serie = str(linea.get("serie") or "").strip()
+        lineas.append(
+            OrdenTrabajoLinea(
+                orden=ot,
+                posicion=posicion,
+                maquinaria_id=maquinas.get(serie.lower()) if serie else None,
+                serie=serie[:120],
+                unidad=str(linea.get("unidad") or "Dia")[:10],
+                cantidad_periodo=_int(linea.get("cantidadPeriodo")),
+                desde=_date_or_none(linea.get("desde")),
+                hasta=_date_or_none(linea.get("hasta")),
+                tipo_flete=str(linea.get("tipoFlete") or "")[:50],
+                valor=_decimal(linea.get("valor")),
+                flete=_decimal(linea.get("flete")),
+                neto=_decimal(linea.get("neto")),
+                iva=_decimal(linea.get("iva")),
+                total=_decimal(linea.get("total")),
+            )
+        )
+    return lineas
+
+
+def sync_lineas(ot, maquinas=None):
+    """Reemplaza las líneas normalizadas de ``ot`` por las de su JSON actual."""
+    OrdenTrabajoLinea.objects.filter(orden=ot).delete()
+    return OrdenTrabajoLinea.objects.bulk_create(build_lineas(ot, maquinas))
+
+
+def series_de(ordenes):
+    series = set()
+    for ot in ordenes:
+        series |= _series(ot.detalle_lineas if isinstance(ot.detalle_lineas, list) else [])
+    return series
@@ -0,0 +1,35 @@
+# backend/api/preflight_workers.py
+"""
+Puntos de entrada de los procesos de ``multi_machine_preflight --workers``.
+
+Con ``spawn`` cada proceso importa este módulo antes de tener Django
+configurado, así que aquí no se importan modelos a nivel de módulo: se
+importan recién en ``init`` después de ``django.setup()``.
+"""
+
+_series_index = None
+
+
+def init(db_name):
+    """
+    Arma Django en el proceso (con su propia conexión) y el índice de series.
+    ``db_name`` es la base del proceso padre, que puede no ser la de
+    ``settings`` (p. ej. la base de pruebas).
+    """
+    import django
+
+    django.setup()
+    from django.db import connection
+
+    connection.settings_dict["NAME"] = db_name
+    from api.management.commands.multi_machine_preflight import machines_by_series
+
+    global _series_index
+    _series_index = machines_by_series()
+
+
+def shard(bounds):
+    from api.management.commands.multi_machine_preflight import order_shard
+
+    first_id, last_id, chunk_size = bounds
+    return order_shard(first_id, last_id, chunk_size, _series_index)
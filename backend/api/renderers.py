@@ -0,0 +1,141 @@
+# backend/api/renderers.py
+"""
+Renderer/parser JSON con orjson y la misma salida que los de DRF.
+
+- Bytes idénticos a ``JSONRenderer`` compacto: separadores ``,``/``:``,
+  UTF-8 sin escapar y ``\\u2028``/``\\u2029`` escapados.
+- ``datetime``/``date``/``time``, ``Decimal``, textos lazy, ``QuerySet`` y
+  demás tipos no nativos pasan por ``encoders.JSONEncoder.default`` de DRF, así
+  que se formatean igual (``...Z`` para UTC, etc.).
+- Con ``indent`` (API navegable, ``Accept: ...; indent=4``), ``UNICODE_JSON``
+  o ``STRICT_JSON`` desactivados, o sin orjson instalado, se usa DRF tal cual.
+
+Únicas diferencias conocidas: floats con exponente (``1e16`` en vez de
+``1e+16``, mismo valor) y NaN, que sale como ``null`` en vez de error. Los
+floats de la API (montos de ``detalle_lineas``) no llegan a esos casos.
+"""
+
+import io
+import re
+
+from rest_framework.utils import encoders
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:  # Dependencia opcional.
+    import orjson
+except ImportError:
+    orjson = None
+
+_LS, _PS = "\u2028".encode(), "\u2029".encode()
+_drf_default = encoders.JSONEncoder().default
+# orjson lee como float los enteros de más de 64 bits; con 19+ dígitos seguidos
+# decide el parser de DRF.
+_LONG_DIGITS = re.compile(rb"\d{19,}")
+
+
+def orjson_dumps(data):
+    """``data`` en JSON compacto, igual a ``JSONRenderer`` (requiere orjson)."""
+    ret = orjson.dumps(
+        data,
+        default=_drf_default,
+        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+    )
+    if _LS in ret or _PS in ret:
+        ret = ret.replace(_LS, b"\\u2028").replace(_PS, b"\\u2029")
+    return ret
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or not self.strict
+            or self.encoder_class is not encoders.JSONEncoder
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson_dumps(data)
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", "utf-8")
+        if orjson is None or encoding.lower().replace("_", "-") not in ("utf-8", "utf8"):
+            return super().parse(stream, media_type, parser_context)
+
+        raw = stream.read()
+        if not _LONG_DIGITS.search(raw):
+            try:
+                return orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                pass
+        # BOM, NaN, JSON inválido, enteros grandes: DRF decide y arma el error.
+        return super().parse(io.BytesIO(raw), media_type, parser_context)
+
+
+# -----------------------------
+# Formato columnar (?format=columns)
+# -----------------------------
+def to_columns(rows, orient="rows"):
+    """
+    Lista de dicts -> forma columnar compacta::
+
+        {"format": "columns", "orient": "rows", "count": 2,
+         "columns": ["id", "cliente"],
+         "dicts": {"cliente": ["ACME"]},
+         "rows": [[1, 0], [2, 0]]}
+
+    Con ``orient="columns"`` va ``"data"`` (una lista por columna, mismo orden
+    que ``columns``) en vez de ``"rows"``. Las columnas de texto con valores
+    repetidos van codificadas como índice en ``dicts[columna]`` (``null`` se
+    mantiene). Cualquier otra cosa que no sea lista de dicts se devuelve igual.
+    """
+    if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+        return rows
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    data = [[row.get(col) for row in rows] for col in columns]
+
+    dicts = {}
+    for position, col in enumerate(columns):
+        values = data[position]
+        present = [v for v in values if v is not None]
+        if not present or not all(isinstance(v, str) for v in present):
+            continue
+        uniques = list(dict.fromkeys(present))
+        if len(uniques) == len(present):
+            continue
+        index = {value: i for i, value in enumerate(uniques)}
+        data[position] = [None if v is None else index[v] for v in values]
+        dicts[col] = uniques
+
+    payload = {
+        "format": "columns",
+        "orient": "columns" if orient == "columns" else "rows",
+        "count": len(rows),
+        "columns": columns,
+        "dicts": dicts,
+    }
+    if payload["orient"] == "columns":
+        payload["data"] = data
+    else:
+        payload["rows"] = [list(row) for row in zip(*data)] if columns else [[] for _ in rows]
+    return payload
+
+
+class ColumnarJSONRenderer(FastJSONRenderer):
+    """``?format=columns[&orient=columns]`` en endpoints tabulares."""
+
+    format = "columns"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        request = (renderer_context or {}).get("request")
+        orient = request.GET.get("orient") if request is not None else None
+        return super().render(to_columns(data, orient), accepted_media_type, renderer_context)
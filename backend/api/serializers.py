@@ -2,6 +2,8 @@
 from rest_framework import serializers
 from rest_framework.exceptions import PermissionDenied
 from django.db import IntegrityError
+from django.utils import timezone
+from .disponibilidad import conflictos_maquinas, fin_ocupacion
 from .models import Cliente, Maquinaria, Obra, Arriendo, Documento, OrdenTrabajo, DOC_TIPO
 from django.contrib.auth.models import User
 
@@ -109,7 +111,12 @@ class MaquinariaSerializer(serializers.ModelSerializer):
 
     # ---------- fields calculados ----------
     def get_obra(self, obj):
-        arriendo_activo = obj.arriendos.filter(estado="Activo").select_related("obra").order_by('-fecha_inicio').first()
+        # Los listados precargan los arriendos activos (ver search_maquinarias).
+        activos = getattr(obj, "arriendos_activos", None)
+        if activos is not None:
+            arriendo_activo = activos[0] if activos else None
+        else:
+            arriendo_activo = obj.arriendos.filter(estado="Activo").select_related("obra").order_by('-fecha_inicio').first()
         if arriendo_activo and arriendo_activo.obra:
             return arriendo_activo.obra.nombre
         return "Bodega"
@@ -191,6 +198,43 @@ class ArriendoSerializer(serializers.ModelSerializer):
         model = Arriendo
         fields = ['id','maquinaria','cliente','obra','fecha_inicio','fecha_termino','periodo','tarifa','estado']
 
+    OCUPACION_FIELDS = ("maquinaria", "fecha_inicio", "fecha_termino", "estado")
+
+    def validate(self, attrs):
+        """
+        Rechaza arriendos que reservan una máquina ya ocupada en esas fechas.
+        Al editar solo se valida si cambia la máquina, las fechas o el estado:
+        un cambio de tarifa no choca con solapes que ya existían. Cuentan la
+        máquina legada y las de ``ArriendoItem``.
+        """
+        def valor(campo):
+            if campo in attrs:
+                return attrs[campo]
+            return getattr(self.instance, campo, None)
+
+        if self.instance is not None and all(
+            attrs.get(campo, getattr(self.instance, campo)) == getattr(self.instance, campo)
+            for campo in self.OCUPACION_FIELDS
+        ):
+            return attrs
+        maquinas = {getattr(valor("maquinaria"), "pk", None)}
+        if self.instance is not None:
+            maquinas.update(self.instance.items.values_list("maquinaria_id", flat=True))
+        inicio = valor("fecha_inicio")
+        if maquinas == {None} or inicio is None:
+            return attrs
+        hoy = timezone.now().date()
+        fin = fin_ocupacion(valor("estado") or "Activo", inicio, valor("fecha_termino"), hoy)
+        conflictos = conflictos_maquinas(
+            maquinas, inicio, fin, excluir=getattr(self.instance, "pk", None), hoy=hoy
+        )
+        if conflictos:
+            ids = ", ".join(f"#{c['arriendo_id']}" for c in conflictos)
+            raise serializers.ValidationError(
+                {"maquinaria": [f"La máquina ya está arrendada en esas fechas (arriendo {ids})."]}
+            )
+        return attrs
+
 
 class DocumentoSerializer(serializers.ModelSerializer):
     arriendo = serializers.PrimaryKeyRelatedField(queryset=Arriendo.objects.all())
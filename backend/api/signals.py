@@ -0,0 +1,95 @@
+# backend/api/signals.py
+"""
+Invalidación de los claims de autorización embebidos en los JWT y del estado
+corto de login (usuario inexistente / bloqueado), y mantención del resumen
+mensual de ingresos al crear, editar o borrar documentos.
+
+Las señales solo ven ``save()``/``delete()`` por instancia: ``bulk_create``
+pasa por ``ingresos.registrar_documentos``, y un ``QuerySet.update()`` o
+``bulk_update`` sobre montos, fecha, tipo o arriendo de ``Documento`` deja el
+resumen desfasado hasta correr ``rebuild_ingresos``.
+"""
+
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .authentication import AUTHZ_FLAGS, clear_login_state, forget_perm_version
+from .ingresos import TIPOS as TIPOS_INGRESO, aplicar_cambio, fila_actual
+from .models import Documento, UserSecurity
+
+_TRACKED = (*AUTHZ_FLAGS, "password")
+
+
+def bump_perm_version(user):
+    """Sube la versión de permisos: los tokens emitidos antes vuelven a la base."""
+    sec, _ = UserSecurity.objects.get_or_create(user=user)
+    UserSecurity.objects.filter(pk=sec.pk).update(perm_version=F("perm_version") + 1)
+    forget_perm_version(user.pk)
+
+
+@receiver(pre_save, sender=User)
+def _track_authz_changes(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._authz_changed = False
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(_TRACKED):
+        return
+    previous = User.objects.filter(pk=instance.pk).values(*_TRACKED).first()
+    instance._authz_changed = previous is not None and any(
+        previous[field] != getattr(instance, field) for field in _TRACKED
+    )
+
+
+@receiver(post_save, sender=User)
+def _bump_on_authz_change(sender, instance, raw=False, **kwargs):
+    if not raw and getattr(instance, "_authz_changed", False):
+        bump_perm_version(instance)
+    # Un usuario nuevo (o reactivado) deja de figurar como inexistente.
+    clear_login_state(instance.username)
+
+
+@receiver(post_save, sender=UserSecurity)
+def _clear_login_state_on_security_change(sender, instance, raw=False, **kwargs):
+    # Desbloqueos hechos desde el admin se ven en el siguiente login.
+    if not raw:
+        clear_login_state(instance.user.username)
+
+
+@receiver(post_delete, sender=User)
+def _forget_deleted_user(sender, instance, **kwargs):
+    forget_perm_version(instance.pk)
+
+
+@receiver(pre_save, sender=Documento)
+def _ingreso_previo(sender, instance, raw=False, **kwargs):
+    instance._ingreso_previo = None
+    if raw or instance.pk is None:
+        return
+    # Las GD no son ingreso: si ni el tipo nuevo ni el guardado cuentan, no
+    # hace falta la fila anotada (subconsulta de categoría).
+    if instance.tipo not in TIPOS_INGRESO:
+        previo = Documento.objects.filter(pk=instance.pk).values_list("tipo", flat=True).first()
+        if previo not in TIPOS_INGRESO:
+            return
+    instance._ingreso_previo = fila_actual(instance.pk)
+
+
+@receiver(post_save, sender=Documento)
+def _actualizar_ingresos(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previo = getattr(instance, "_ingreso_previo", None)
+    if previo is None and instance.tipo not in TIPOS_INGRESO:
+        return
+    aplicar_cambio(previo, fila_actual(instance.pk))
+
+
+@receiver(pre_delete, sender=Documento)
+def _descontar_ingresos(sender, instance, **kwargs):
+    # Antes del borrado: la categoría sale del arriendo, que en un borrado en
+    # cascada desaparece junto con el documento.
+    previo = fila_actual(instance.pk)
+    if previo is not None:
+        aplicar_cambio(previo, None)
@@ -0,0 +1,207 @@
+# backend/api/sparse.py
+"""
+``?fields=`` / ``?expand=`` para los listados y el detalle de los viewsets.
+
+- Sin parámetros la respuesta no cambia.
+- ``fields=id,estado,cliente_razon`` devuelve solo esas claves y la consulta
+  trae solo las columnas que necesitan (``only()``), con los JOIN justos.
+- Las relaciones expandibles (p. ej. ``factura``/``guia`` en OT) salen como su
+  id, salvo que vengan en ``expand``; recién ahí se hace el JOIN/prefetch y se
+  anida el objeto. ``expand`` implica pedir la clave.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+SPARSE_ACTIONS = frozenset({"list", "retrieve"})
+_DISPLAY_RE = re.compile(r"^get_(\w+)_display$")
+
+
+@dataclass(frozen=True)
+class Expansion:
+    """Relación anidable: JOIN (FK) o prefetch (inversa, ``many=True``)."""
+
+    many: bool = False
+    select_related: tuple = ()
+
+
+@dataclass
+class SparsePlan:
+    fields: frozenset
+    expand: frozenset
+    columns: set | None = None  # None: fila completa (sin only())
+    select_related: set = field(default_factory=set)
+    prefetch: list = field(default_factory=list)
+
+    def wants(self, name):
+        return name in self.fields
+
+    def wants_any(self, names):
+        return not self.fields.isdisjoint(names)
+
+
+def _split(value):
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def _field_path(model, serializer_field):
+    """Ruta ORM que lee un campo del serializer, o None si no se puede saber."""
+    if isinstance(serializer_field, serializers.SerializerMethodField):
+        return None
+    if serializer_field.source == "*":
+        return None
+    attrs = list(serializer_field.source_attrs)
+    match = _DISPLAY_RE.match(attrs[-1])
+    if match:
+        attrs[-1] = match.group(1)
+
+    current = model
+    for position, attr in enumerate(attrs):
+        try:
+            model_field = current._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+        if position < len(attrs) - 1:
+            if not model_field.is_relation:
+                return None
+            current = model_field.related_model
+    return "__".join(attrs)
+
+
+class SparseFieldsMixin:
+    """
+    Mezclar antes de ``ReplicaReadMixin``. Cada viewset puede declarar:
+
+    - ``sparse_expandable``: ``{clave: Expansion(...)}``.
+    - ``sparse_sources``: columnas de las claves que el serializer no deja
+      deducir (``SerializerMethodField``); ``None`` = fila completa.
+    - ``sparse_extra``: claves que la vista agrega fuera del serializer
+      (solo en ``list``) y las columnas que necesitan.
+    """
+
+    sparse_expandable = {}
+    sparse_sources = {}
+    sparse_extra = {}
+    sparse = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.sparse = self._sparse_plan(request)
+
+    # ---------- plan ----------
+    def _sparse_extra(self):
+        return self.sparse_extra if self.action == "list" else {}
+
+    def _sparse_plan(self, request):
+        if request.method not in SAFE_METHODS or self.action not in SPARSE_ACTIONS:
+            return None
+        fields = _split(request.query_params.get("fields"))
+        expand = _split(request.query_params.get("expand"))
+        if not fields and not expand:
+            return None
+
+        serializer_fields = {
+            name: f
+            for name, f in self.get_serializer_class()().fields.items()
+            if not f.write_only
+        }
+        extra = self._sparse_extra()
+
+        errors = {}
+        bad_expand = [name for name in expand if name not in self.sparse_expandable]
+        if bad_expand:
+            errors["expand"] = [f"No se puede expandir: {', '.join(bad_expand)}."]
+        bad_fields = [name for name in fields if name not in serializer_fields and name not in extra]
+        if bad_fields:
+            errors["fields"] = [f"Campos desconocidos: {', '.join(bad_fields)}."]
+        if errors:
+            raise ValidationError(errors)
+
+        if not fields:
+            # Solo ``expand``: la respuesta por defecto ya anida todo.
+            return None
+
+        plan = SparsePlan(fields=frozenset(fields) | frozenset(expand), expand=frozenset(expand))
+        model = self.get_serializer_class().Meta.model
+        columns = {model._meta.pk.name}
+        for name in plan.fields:
+            expansion = self.sparse_expandable.get(name)
+            if expansion is not None:
+                self._plan_relation(plan, model, name, expansion, columns)
+                continue
+            if name in extra:
+                paths = extra[name]
+            elif name in self.sparse_sources:
+                paths = self.sparse_sources[name]
+            else:
+                path = _field_path(model, serializer_fields[name])
+                paths = None if path is None else (path,)
+            if paths is None:
+                columns = None
+                break
+            for path in paths:
+                parts = path.split("__")
+                for depth in range(1, len(parts)):
+                    plan.select_related.add("__".join(parts[:depth]))
+                columns.add(path)
+                if len(parts) > 1:
+                    columns.add(parts[0])
+        plan.columns = columns
+        return plan
+
+    def _plan_relation(self, plan, model, name, expansion, columns):
+        if expansion.many:
+            if name in plan.expand:
+                plan.prefetch.append(name)
+            else:
+                remote = model._meta.get_field(name)
+                related = remote.related_model
+                ids = related.objects.only(related._meta.pk.name, remote.field.name)
+                plan.prefetch.append(Prefetch(name, queryset=ids))
+            return
+        columns.add(name)
+        if name in plan.expand:
+            plan.select_related.update(expansion.select_related or (name,))
+
+    # ---------- aplicación ----------
+    def get_queryset(self):
+        qs = super().get_queryset()
+        plan = self.sparse
+        if plan is None or plan.columns is None:
+            return qs
+        qs = qs.select_related(None).prefetch_related(None).only(*plan.columns)
+        if plan.select_related:
+            qs = qs.select_related(*sorted(plan.select_related))
+        if plan.prefetch:
+            qs = qs.prefetch_related(*plan.prefetch)
+        return qs
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        plan = self.sparse
+        if plan is None:
+            return serializer
+        fields = getattr(serializer, "child", serializer).fields
+        for name in list(fields):
+            if name not in plan.fields:
+                fields.pop(name)
+            elif name in self.sparse_expandable and name not in plan.expand:
+                fields[name] = serializers.PrimaryKeyRelatedField(
+                    read_only=True, many=self.sparse_expandable[name].many
+                )
+        return serializer
+
+    def sparse_rows(self, rows):
+        """Recorta las claves que la vista agregó fuera del serializer."""
+        plan = self.sparse
+        if plan is None:
+            return rows
+        return [{k: v for k, v in row.items() if k in plan.fields} for row in rows]
@@ -179,7 +179,10 @@ class ArriendoItemMigrationTests(TransactionTestCase):
             self.assertNotIn("ArriendoItem", connection.introspection.table_names())
             self.assertEqual(set(connection.introspection.table_names()), tables_before)
         finally:
-            MigrationExecutor(connection).migrate([self.current])
+            # Vuelve al esquema completo: los TransactionTestCase que corren
+            # después usan las tablas con todas las migraciones.
+            executor = MigrationExecutor(connection)
+            executor.migrate(executor.loader.graph.leaf_nodes())
 
     def test_migration_contains_only_create_model_schema_operation(self):
         migration = MigrationExecutor(connection).loader.get_migration(*self.current)
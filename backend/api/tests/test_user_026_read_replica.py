@@ -0,0 +1,108 @@
+import json
+import sqlite3
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.checks import Error
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.checks import replica_sticky_cache_check
+from api.db_routers import ReadReplicaRouter, replica_reads
+from api.models import Cliente, Maquinaria
+
+
+class ReadReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.router = ReadReplicaRouter()
+
+    def test_reads_stay_on_primary_without_replica_alias(self):
+        with replica_reads():
+            self.assertIsNone(self.router.db_for_read(Maquinaria))
+        self.assertEqual(self.router.db_for_write(Maquinaria), "default")
+
+    def test_reads_go_to_replica_only_inside_enabled_context(self):
+        with mock.patch("api.db_routers.replica_configured", return_value=True):
+            self.assertIsNone(self.router.db_for_read(Maquinaria))
+            with replica_reads():
+                self.assertEqual(self.router.db_for_read(Maquinaria), "replica")
+                self.assertEqual(self.router.db_for_write(Maquinaria), "default")
+            self.assertIsNone(self.router.db_for_read(Maquinaria))
+
+    def test_migrations_only_run_on_primary(self):
+        self.assertTrue(self.router.allow_migrate("default", "api"))
+        self.assertFalse(self.router.allow_migrate("replica", "api"))
+
+
+@override_settings(REPLICA_STICKY_SECONDS=30)
+class ReplicaReadViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.staff = User.objects.create_user("replica-staff", password="test-only", is_staff=True)
+        self.client.force_authenticate(self.staff)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_safe_read_actions_enable_replica(self):
+        with mock.patch("api.views.enable_replica_reads") as enable:
+            self.assertEqual(self.client.get("/maquinarias").status_code, 200)
+            self.assertEqual(self.client.get("/ordenes/estado-bodega").status_code, 200)
+        self.assertEqual(enable.call_count, 2)
+
+    def test_write_pins_user_to_primary(self):
+        with mock.patch("api.views.enable_replica_reads") as enable:
+            response = self.client.post("/maquinarias", {"marca": "Genie", "categoria": "equipos_altura", "estado": "Disponible"}, format="json")
+            self.assertEqual(response.status_code, 201, response.content)
+            self.assertEqual(self.client.get("/maquinarias").status_code, 200)
+        enable.assert_not_called()
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user("replica-other", password="x", is_staff=True))
+        with mock.patch("api.views.enable_replica_reads") as enable:
+            other.get("/maquinarias")
+        enable.assert_called_once()
+
+    def test_failed_write_does_not_pin_user(self):
+        with mock.patch("api.views.enable_replica_reads") as enable:
+            response = self.client.post("/maquinarias", {}, format="json")
+            self.assertEqual(response.status_code, 400)
+            self.client.get("/maquinarias")
+        enable.assert_called_once()
+
+
+class ReplicaStickyCacheCheckTests(TestCase):
+    LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    SHARED = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://127.0.0.1:6379/1"}}
+
+    def test_replica_with_local_cache_is_an_error(self):
+        with override_settings(REPLICA_DB_NAME="replica.sqlite3", CACHES=self.LOCMEM):
+            errors = replica_sticky_cache_check(None)
+        self.assertEqual([e.id for e in errors], ["api.E001"])
+        self.assertIsInstance(errors[0], Error)
+
+    def test_shared_cache_or_no_replica_passes(self):
+        with override_settings(REPLICA_DB_NAME="replica.sqlite3", CACHES=self.SHARED):
+            self.assertEqual(replica_sticky_cache_check(None), [])
+        with override_settings(REPLICA_DB_NAME=None, CACHES=self.LOCMEM):
+            self.assertEqual(replica_sticky_cache_check(None), [])
+
+
+class SyncReadReplicaCommandTests(TransactionTestCase):
+    def test_backup_copies_primary_rows(self):
+        Cliente.objects.create(razon_social="Cliente réplica", rut="26.026.026-6")
+        with tempfile.TemporaryDirectory() as tmp:
+            target = Path(tmp) / "replica.sqlite3"
+            out = StringIO()
+            call_command("sync_read_replica", target=str(target), stdout=out)
+            self.assertEqual(json.loads(out.getvalue())["target"], str(target))
+            with sqlite3.connect(str(target)) as replica:
+                rows = replica.execute('SELECT razon_social FROM "Cliente"').fetchall()
+            replica.close()
+        self.assertEqual(rows, [("Cliente réplica",)])
@@ -0,0 +1,122 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import AsyncClient, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.models import Arriendo, Cliente, Documento, Maquinaria, Obra, OrdenTrabajo
+
+
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user("async-staff", password="test-only", is_staff=True)
+        self.normal = User.objects.create_user("async-normal", password="test-only")
+        self.sync_client = APIClient()
+        self.sync_client.force_authenticate(self.staff)
+        self.customer = Cliente.objects.create(razon_social="Cliente Async", rut="76.027.000-1")
+        self.obra = Obra.objects.create(nombre="Obra Async")
+        self.today = timezone.now().date()
+
+        rented = Maquinaria.objects.create(marca="Genie", modelo="GS", serie="A-RENT", altura=Decimal("8.50"))
+        rental = Arriendo.objects.create(
+            maquinaria=rented, cliente=self.customer, obra=self.obra,
+            fecha_inicio=self.today - timedelta(days=3), periodo="Dia",
+            tarifa=Decimal("100"), estado="Activo",
+        )
+        gd = Documento.objects.create(
+            tipo="GD", numero="0027", fecha_emision=self.today,
+            arriendo=rental, cliente=self.customer,
+        )
+        OrdenTrabajo.objects.create(
+            arriendo=rental, cliente=self.customer, maquinaria=rented,
+            tipo="ALTA", tipo_comercial="A", guia=gd, orden_compra="OC-27",
+        )
+
+        returned = Maquinaria.objects.create(marca="JLG", modelo="E", serie="A-BODEGA")
+        old_rental = Arriendo.objects.create(
+            maquinaria=returned, cliente=self.customer, obra=self.obra,
+            fecha_inicio=self.today - timedelta(days=30), periodo="Mes",
+            tarifa=Decimal("900"), estado="Terminado",
+        )
+        retiro = Documento.objects.create(
+            tipo="GD", numero="0028", fecha_emision=self.today, es_retiro=True,
+            arriendo=old_rental, cliente=self.customer,
+        )
+        OrdenTrabajo.objects.create(
+            arriendo=old_rental, cliente=self.customer, maquinaria=returned,
+            tipo="RETI", tipo_comercial="T", guia=retiro,
+        )
+
+    def headers(self, user):
+        return {"authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+    async def test_async_views_match_sync_payloads(self):
+        client = AsyncClient()
+        for path in (
+            "/ordenes/estado-arriendos",
+            "/ordenes/estado-bodega",
+            "/maquinarias",
+            "/maquinarias?query=a-rent",
+            "/clientes?query=76027",
+        ):
+            with self.subTest(path=path):
+                expected = await self._sync_get(path)
+                response = await client.get("/async" + path, headers=self.headers(self.staff))
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertEqual(json.loads(response.content), expected)
+
+    async def _sync_get(self, path):
+        from asgiref.sync import sync_to_async
+
+        response = await sync_to_async(self.sync_client.get)(path)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    async def test_async_views_enforce_authentication_and_permissions(self):
+        client = AsyncClient()
+        response = await client.get("/async/ordenes/estado-bodega")
+        self.assertEqual(response.status_code, 401)
+
+        response = await client.get(
+            "/async/ordenes/estado-bodega", headers={"authorization": "Bearer not-a-token"}
+        )
+        self.assertEqual(response.status_code, 401)
+
+        response = await client.get("/async/ordenes/estado-arriendos", headers=self.headers(self.normal))
+        self.assertEqual(response.status_code, 403)
+
+        response = await client.get("/async/maquinarias", headers=self.headers(self.normal))
+        self.assertEqual(response.status_code, 200)
+
+        response = await client.post("/async/maquinarias", headers=self.headers(self.staff))
+        self.assertEqual(response.status_code, 405)
+
+    def test_estado_query_count_does_not_grow_with_rows(self):
+        def count(path):
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.sync_client.get(path).status_code, 200)
+            return len(ctx)
+
+        baseline = {path: count(path) for path in (
+            "/ordenes/estado-arriendos", "/ordenes/estado-bodega", "/maquinarias",
+        )}
+        for index in range(5):
+            machine = Maquinaria.objects.create(marca="Extra", serie=f"A-EXTRA-{index}")
+            rental = Arriendo.objects.create(
+                maquinaria=machine, cliente=self.customer, obra=self.obra,
+                fecha_inicio=self.today, periodo="Dia", tarifa=Decimal("1"),
+                estado="Activo" if index % 2 else "Terminado",
+            )
+            Documento.objects.create(
+                tipo="GD", numero=f"9{index}", fecha_emision=self.today,
+                arriendo=rental, cliente=self.customer, es_retiro=not index % 2,
+            )
+        for path, queries in baseline.items():
+            with self.subTest(path=path):
+                self.assertEqual(count(path), queries)
@@ -0,0 +1,169 @@
+import json
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.events import DatabaseBroker, LocalBroker, build_fleet_change
+from api.models import Arriendo, Cliente, EventoFlota, Maquinaria, Obra, OrdenTrabajo
+from estado_maquinas.settings import env_float
+
+
+class FleetEventTests(TestCase):
+    def setUp(self):
+        self.broker = LocalBroker()
+        patcher = patch("api.events._local_broker", self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.staff = User.objects.create_user("u028-staff", password="test", is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+        self.cliente = Cliente.objects.create(razon_social="Cliente U028", rut="28-0")
+        self.obra = Obra.objects.create(nombre="Obra U028")
+        self.maquinaria = Maquinaria.objects.create(
+            marca="Genie", modelo="GS", serie="U028-1", estado="Arrendada"
+        )
+        self.arriendo = Arriendo.objects.create(
+            cliente=self.cliente, obra=self.obra, maquinaria=self.maquinaria,
+            fecha_inicio=date(2026, 8, 1), periodo="Dia",
+            tarifa=Decimal("100"), estado="Activo",
+        )
+
+    def _events(self):
+        return [(ev.tipo, json.loads(ev.data)) for ev in self.broker.since(0)]
+
+    def test_emitir_publishes_new_estado_row_after_commit(self):
+        ot = OrdenTrabajo.objects.create(
+            cliente=self.cliente, maquinaria=self.maquinaria, arriendo=self.arriendo,
+            tipo="ALTA", estado="PEND", detalle_lineas=[],
+        )
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.post(
+                f"/ordenes/{ot.pk}/emitir", {"tipo_documento": "GD"}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._events(), [])  # nada antes del commit
+
+        for callback in callbacks:
+            callback()
+        [(tipo, payload)] = self._events()
+        self.assertEqual(tipo, "ot.emitida")
+        self.assertEqual(payload["ot_ids"], [ot.id])
+        self.assertEqual(payload["arriendo_ids"], [self.arriendo.id])
+        self.assertEqual(payload["maquinaria_ids"], [self.maquinaria.id])
+        expected = self.client.get("/ordenes/estado-arriendos").json()
+        self.assertEqual(payload["estado_arriendos"]["rows"], expected)
+        self.assertEqual(payload["estado_arriendos"]["removed"], [])
+        self.assertEqual(payload["estado_bodega"], {"rows": [], "removed": [self.maquinaria.id]})
+
+    def test_arriendo_termination_moves_machine_to_bodega(self):
+        self.maquinaria.estado = "Disponible"
+        self.maquinaria.save(update_fields=["estado"])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f"/arriendos/{self.arriendo.pk}", {"estado": "Terminado"}, format="json"
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+
+        [(tipo, payload)] = self._events()
+        self.assertEqual(tipo, "arriendo.estado")
+        self.assertEqual(payload["estado_arriendos"], {"rows": [], "removed": [self.arriendo.id]})
+        [row] = payload["estado_bodega"]["rows"]
+        self.assertEqual(row["id"], self.maquinaria.id)
+        self.assertEqual(row["obra"], "Obra U028")
+
+    def test_publish_error_does_not_fail_committed_write(self):
+        ot = OrdenTrabajo.objects.create(
+            cliente=self.cliente, maquinaria=self.maquinaria, arriendo=self.arriendo,
+            tipo="ALTA", estado="PEND", detalle_lineas=[],
+        )
+        with patch("api.events.build_fleet_change", side_effect=RuntimeError("broker caído")), \
+                self.assertLogs("django.test", level="ERROR") as logs, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f"/ordenes/{ot.pk}/emitir", {"tipo_documento": "GD"}, format="json"
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertIn("broker caído", logs.output[0])
+        self.assertEqual(self._events(), [])
+
+    def test_maquinaria_publishes_only_when_estado_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f"/maquinarias/{self.maquinaria.pk}", {"modelo": "GS-1930"}, format="json"
+            )
+            self.client.patch(
+                f"/maquinarias/{self.maquinaria.pk}", {"estado": "Para venta"}, format="json"
+            )
+        self.assertEqual([tipo for tipo, _ in self._events()], ["maquinaria.estado"])
+
+    def test_database_broker_shares_events_and_prunes_old_ones(self):
+        broker = DatabaseBroker()
+        old_id = broker.publish("viejo", "{}")
+        EventoFlota.objects.filter(id=old_id).update(creado=date(2020, 1, 1))
+        payload = json.dumps(build_fleet_change("maquinaria.estado", maquinaria_ids=[self.maquinaria.id]))
+        new_id = broker.publish("maquinaria.estado", payload)
+
+        self.assertFalse(EventoFlota.objects.filter(id=old_id).exists())
+        self.assertEqual(broker.latest_id(), new_id)
+        [event] = DatabaseBroker().since(old_id)
+        self.assertEqual((event.id, event.tipo, event.data), (new_id, "maquinaria.estado", payload))
+
+
+@override_settings(FLEET_EVENTS_MAX_STREAM_SECONDS=0, FLEET_EVENTS_POLL_SECONDS=0)
+class FleetEventStreamTests(TestCase):
+    def setUp(self):
+        self.broker = LocalBroker()
+        patcher = patch("api.events._local_broker", self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.staff = User.objects.create_user("u028-sse", password="test", is_staff=True)
+        self.normal = User.objects.create_user("u028-normal", password="test")
+
+    def headers(self, user, **extra):
+        return {"authorization": f"Bearer {RefreshToken.for_user(user).access_token}", **extra}
+
+    async def _read(self, response):
+        return b"".join([chunk async for chunk in response.streaming_content]).decode()
+
+    async def test_stream_resumes_from_last_event_id(self):
+        for index in range(3):
+            self.broker.publish("ot.creada", json.dumps({"n": index}))
+
+        response = await AsyncClient().get(
+            "/eventos/flota", headers=self.headers(self.staff, **{"last-event-id": "1"})
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = await self._read(response)
+        self.assertTrue(body.startswith("retry: "))
+        self.assertNotIn('{"n": 0}', body)
+        self.assertIn('id: 2\nevent: ot.creada\ndata: {"n": 1}\n\n', body)
+        self.assertIn('id: 3\nevent: ot.creada\ndata: {"n": 2}\n\n', body)
+
+    async def test_new_subscriber_starts_at_latest_event(self):
+        self.broker.publish("ot.creada", "{}")
+        response = await AsyncClient().get("/eventos/flota", headers=self.headers(self.staff))
+        self.assertNotIn("event:", await self._read(response))
+
+        response = await AsyncClient().get("/eventos/flota?desde=0", headers=self.headers(self.staff))
+        self.assertIn("id: 1\n", await self._read(response))
+
+    async def test_stream_requires_staff(self):
+        response = await AsyncClient().get("/eventos/flota")
+        self.assertEqual(response.status_code, 401)
+        response = await AsyncClient().get("/eventos/flota", headers=self.headers(self.normal))
+        self.assertEqual(response.status_code, 403)
+
+
+class PollSettingTests(SimpleTestCase):
+    def test_poll_interval_accepts_fractions(self):
+        with patch.dict("os.environ", {"DJANGO_FLEET_EVENTS_POLL_SECONDS": "0.5"}):
+            self.assertEqual(env_float("DJANGO_FLEET_EVENTS_POLL_SECONDS", default=1.0), 0.5)
+        with patch.dict("os.environ", {"DJANGO_FLEET_EVENTS_POLL_SECONDS": " "}):
+            self.assertEqual(env_float("DJANGO_FLEET_EVENTS_POLL_SECONDS", default=1.0), 1.0)
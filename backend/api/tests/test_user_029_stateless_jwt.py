@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.authentication import (
+    AuthzRefreshToken,
+    ClaimsUser,
+    StatelessJWTAuthentication,
+    clear_perm_versions,
+)
+from api.models import UserSecurity
+
+STATELESS = {
+    "DEFAULT_AUTHENTICATION_CLASSES": ["api.authentication.StatelessJWTAuthentication"],
+    "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated"],
+}
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        clear_perm_versions()
+        self.addCleanup(clear_perm_versions)
+        self.user = User.objects.create_user("u029-staff", password="clave-029", is_staff=True)
+        self.factory = APIRequestFactory()
+
+    def authenticate(self, token):
+        request = self.factory.get("/maquinarias", HTTP_AUTHORIZATION=f"Bearer {token}")
+        user, _ = StatelessJWTAuthentication().authenticate(request)
+        return user
+
+    def access(self):
+        return AuthzRefreshToken.for_user(self.user).access_token
+
+    def test_login_token_carries_authz_claims(self):
+        response = APIClient().post(
+            "/auth/login", {"username": "u029-staff", "password": "clave-029"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        user = self.authenticate(response.data["access"])
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual(user.id, self.user.id)
+        self.assertTrue(user.is_active and user.is_staff)
+        self.assertFalse(user.is_superuser)
+
+    def test_trusted_claims_skip_the_user_query(self):
+        token = self.access()
+        self.authenticate(token)  # llena el caché de versiones
+        with self.assertNumQueries(0):
+            user = self.authenticate(token)
+        self.assertIsInstance(user, ClaimsUser)
+
+    def test_permission_change_falls_back_to_database(self):
+        token = self.access()
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(UserSecurity.objects.get(user=self.user).perm_version, 1)
+
+        user = self.authenticate(token)
+        self.assertIsInstance(user, User)
+        self.assertFalse(user.is_staff)
+
+    def test_unrelated_save_keeps_version(self):
+        self.user.first_name = "Ana"
+        self.user.save()
+        self.user.set_password("otra-clave")
+        self.user.save(update_fields=["last_login"])
+        self.assertFalse(UserSecurity.objects.filter(user=self.user, perm_version__gt=0).exists())
+
+    def test_legacy_tokens_load_the_user(self):
+        self.assertIsInstance(self.authenticate(RefreshToken.for_user(self.user).access_token), User)
+
+    def test_old_token_stays_stateless(self):
+        # Un access emitido horas atrás (vigente, ACCESS_TOKEN_LIFETIME=8h)
+        # sigue sin consultar User mientras la versión no cambie.
+        emitido = datetime.now(timezone.utc) - timedelta(hours=3)
+        with mock.patch("rest_framework_simplejwt.tokens.aware_utcnow", return_value=emitido):
+            token = self.access()
+        self.authenticate(token)
+        with self.assertNumQueries(0):
+            self.assertIsInstance(self.authenticate(token), ClaimsUser)
+
+    def test_refresh_restamps_current_claims(self):
+        refresh = AuthzRefreshToken.for_user(self.user)
+        self.user.is_superuser = True
+        self.user.save()
+        self.assertIsInstance(self.authenticate(refresh.access_token), User)
+
+        response = APIClient().post("/auth/refresh", {"refresh": str(refresh)}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        access = response.data["access"]
+        self.authenticate(access)
+        with self.assertNumQueries(0):
+            user = self.authenticate(access)
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertTrue(user.is_superuser)
+
+        self.user.is_active = False
+        self.user.save()
+        response = APIClient().post("/auth/refresh", {"refresh": str(refresh)}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_deleted_user_is_rejected(self):
+        token = self.access()
+        self.authenticate(token)
+        self.user.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    @override_settings(REST_FRAMEWORK=STATELESS)
+    def test_demoted_user_loses_staff_endpoints(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access()}")
+        self.assertEqual(client.get("/ordenes/estado-bodega").status_code, 200)
+
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(client.get("/ordenes/estado-bodega").status_code, 403)
+        self.assertEqual(client.get("/maquinarias").status_code, 200)
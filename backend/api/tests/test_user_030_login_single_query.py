@@ -0,0 +1,113 @@
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Value
+from django.db.models.functions import Lower
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.authentication import pending_failures
+from api.models import UserSecurity
+from api.views import MAX_FAILED
+
+
+class LoginSingleQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.user = User.objects.create_user("u030-user", password="clave-030")
+        UserSecurity.objects.create(user=self.user)
+
+    def login(self, username, password):
+        return self.client.post(
+            "/auth/login", {"username": username, "password": password}, format="json"
+        )
+
+    def test_successful_login_queries(self):
+        # Búsqueda del bloqueo + la del backend de authenticate().
+        with self.assertNumQueries(2):
+            response = self.login("u030-user", "clave-030")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["user"]["id"], self.user.id)
+
+    def test_unknown_user_is_cached(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.login("nadie", "x").status_code, 400)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.login("NADIE", "x").status_code, 400)
+
+        User.objects.create_user("nadie", password="clave")
+        self.assertEqual(self.login("nadie", "clave").status_code, 200)
+
+    def test_lockout_semantics_are_kept(self):
+        for _ in range(MAX_FAILED - 1):
+            self.assertEqual(self.login("U030-USER", "clave-030").status_code, 400)
+        sec = UserSecurity.objects.get(user=self.user)
+        self.assertEqual(
+            (sec.failed_attempts + pending_failures(self.user.pk), sec.is_locked),
+            (MAX_FAILED - 1, False),
+        )
+
+        self.assertEqual(self.login("u030-user", "mala").status_code, 400)
+        sec.refresh_from_db()
+        self.assertTrue(sec.is_locked)
+        self.assertIsNotNone(sec.locked_at)
+
+        # Bloqueada: se rechaza desde el caché, antes del hash.
+        with self.assertNumQueries(0):
+            self.assertEqual(self.login("u030-user", "clave-030").status_code, 403)
+
+        sec.is_locked = False
+        sec.failed_attempts = 0
+        sec.save()
+        self.assertEqual(self.login("u030-user", "clave-030").status_code, 200)
+
+    def test_success_resets_failures_and_inactive_counts_as_failure(self):
+        self.login("u030-user", "mala")
+        self.assertEqual(self.login("u030-user", "clave-030").status_code, 200)
+        self.assertEqual(UserSecurity.objects.get(user=self.user).failed_attempts, 0)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.login("u030-user", "clave-030").status_code, 400)
+        sec = UserSecurity.objects.get(user=self.user)
+        self.assertEqual(sec.failed_attempts + pending_failures(self.user.pk), 1)
+
+    def test_credentials_go_through_authenticate(self):
+        failed = []
+
+        def on_failed(sender, credentials, request, **kwargs):
+            failed.append(credentials["username"])
+
+        user_login_failed.connect(on_failed)
+        self.addCleanup(user_login_failed.disconnect, on_failed)
+        # Usuario inexistente o con otras mayúsculas: se calcula el hash de
+        # relleno igual que para una clave mala.
+        with mock.patch(
+            "django.contrib.auth.base_user.make_password", wraps=make_password
+        ) as hasher:
+            self.assertEqual(self.login("nadie-030", "x").status_code, 400)
+            self.assertEqual(self.login("U030-USER", "clave-030").status_code, 400)
+        self.assertEqual(hasher.call_count, 2)
+        self.assertEqual(failed, ["nadie-030", "U030-USER"])
+
+        # Solo valen los backends configurados.
+        with self.settings(AUTHENTICATION_BACKENDS=["django.contrib.auth.backends.RemoteUserBackend"]):
+            self.assertEqual(self.login("u030-user", "clave-030").status_code, 400)
+
+    def test_lookup_uses_lower_username_index(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("plan de consulta específico de SQLite")
+        qs = User.objects.alias(username_lower=Lower("username")).filter(
+            username_lower=Lower(Value("U030-User"))
+        )
+        sql, params = qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = " ".join(str(row) for row in cursor.fetchall())
+        self.assertIn("auth_user_username_lower_idx", plan)
@@ -0,0 +1,120 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import F
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import authentication, metrics
+from api.models import UserSecurity
+from api.throttling import LoginBruteForceThrottle
+from api.views import MAX_FAILED
+
+
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.user = User.objects.create_user("u031-user", password="clave-031")
+        UserSecurity.objects.create(user=self.user)
+
+    def login(self, username, password="mala", ip="10.0.0.1"):
+        return self.client.post(
+            "/auth/login", {"username": username, "password": password},
+            format="json", REMOTE_ADDR=ip,
+        )
+
+    @override_settings(LOGIN_THROTTLE_USER_BURST=3, LOGIN_THROTTLE_USER_PER_MINUTE=1)
+    def test_user_bucket_rejects_before_hashing(self):
+        for _ in range(3):
+            self.assertEqual(self.login("u031-user").status_code, 400)
+        with self.assertNumQueries(0):
+            response = self.login("u031-user", "clave-031")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+        self.assertEqual(metrics.snapshot()["login.throttled.user"], 1)
+
+        # Otra IP tiene su propia cubeta.
+        self.assertEqual(self.login("u031-user", "clave-031", ip="10.0.0.2").status_code, 200)
+
+    @override_settings(LOGIN_THROTTLE_IP_BURST=2, LOGIN_THROTTLE_IP_PER_MINUTE=0)
+    def test_ip_bucket_limits_username_spraying(self):
+        self.assertEqual(self.login("uno").status_code, 400)
+        self.assertEqual(self.login("dos").status_code, 400)
+        self.assertEqual(self.login("tres").status_code, 429)
+        self.assertEqual(metrics.snapshot()["login.throttled.ip"], 1)
+
+    @override_settings(LOGIN_FAILED_FLUSH_EVERY=3)
+    def test_failed_attempts_are_flushed_in_batches(self):
+        def persisted():
+            return UserSecurity.objects.get(user=self.user).failed_attempts
+
+        self.login("u031-user")
+        self.login("u031-user")
+        self.assertEqual(persisted(), 0)
+        self.login("u031-user")
+        self.assertEqual(persisted(), 3)
+
+        # El bloqueo no espera al lote: se aplica al llegar a MAX_FAILED.
+        for _ in range(MAX_FAILED - 3):
+            self.login("u031-user")
+        sec = UserSecurity.objects.get(user=self.user)
+        self.assertEqual((sec.failed_attempts, sec.is_locked), (MAX_FAILED, True))
+        self.assertEqual(self.login("u031-user", "clave-031").status_code, 403)
+        self.assertEqual(metrics.snapshot()["login.failed_flush"], 2)
+
+    def test_busy_bucket_lock_rejects(self):
+        # Otra solicitud de la misma IP está descontando fichas.
+        cache.add(f"{LoginBruteForceThrottle.cache_prefix}:lock:10.0.0.1", 1)
+        with mock.patch("api.throttling.LOCK_ATTEMPTS", 2), self.assertNumQueries(0):
+            response = self.login("u031-user", "clave-031")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(metrics.snapshot()["login.throttled.lock"], 1)
+        self.assertEqual(self.login("u031-user", "clave-031", ip="10.0.0.2").status_code, 200)
+
+    @override_settings(LOGIN_FAILED_FLUSH_EVERY=3)
+    def test_concurrent_flush_is_not_lost(self):
+        real_take = authentication.take_pending_failures
+
+        def other_worker_flushes_first(user_id):
+            # Otro worker persistió 2 fallos después de que esta solicitud leyó UserSecurity.
+            UserSecurity.objects.filter(user=self.user).update(failed_attempts=F("failed_attempts") + 2)
+            return real_take(user_id)
+
+        self.login("u031-user")
+        self.login("u031-user")
+        with mock.patch("api.views.take_pending_failures", side_effect=other_worker_flushes_first):
+            self.login("u031-user")
+        sec = UserSecurity.objects.get(user=self.user)
+        self.assertEqual((sec.failed_attempts, sec.is_locked), (5, True))
+        self.assertEqual(authentication.pending_failures(self.user.pk), 0)
+
+    def test_take_pending_failures_keeps_concurrent_increments(self):
+        for _ in range(3):
+            authentication.add_pending_failure(self.user.pk)
+        self.assertEqual(authentication.take_pending_failures(self.user.pk), 3)
+        self.assertEqual(authentication.take_pending_failures(self.user.pk), 0)
+        authentication.add_pending_failure(self.user.pk)
+        self.assertEqual(authentication.pending_failures(self.user.pk), 1)
+
+    def test_success_discards_pending_failures(self):
+        self.login("u031-user")
+        self.assertEqual(self.login("u031-user", "clave-031").status_code, 200)
+        for _ in range(MAX_FAILED - 1):
+            self.login("u031-user")
+        self.assertFalse(UserSecurity.objects.get(user=self.user).is_locked)
+
+    def test_metrics_endpoint_is_superuser_only(self):
+        self.login("u031-user", "clave-031")
+        admin = User.objects.create_user("u031-admin", password="x", is_superuser=True)
+        staff = User.objects.create_user("u031-staff", password="x", is_staff=True)
+
+        self.client.force_authenticate(staff)
+        self.assertEqual(self.client.get("/metricas").status_code, 403)
+        self.client.force_authenticate(admin)
+        response = self.client.get("/metricas")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["login.success"], 1)
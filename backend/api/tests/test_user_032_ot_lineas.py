@@ -0,0 +1,124 @@
+import json
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.models import Cliente, Maquinaria, OrdenTrabajo, OrdenTrabajoLinea
+
+
+class OrdenTrabajoLineaTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user("u032-staff", password="test", is_staff=True)
+        self.client.force_authenticate(self.staff)
+        self.cliente = Cliente.objects.create(razon_social="Cliente U032", rut="32-0")
+        self.genie = Maquinaria.objects.create(marca="Genie", serie="GEN-032")
+        self.jlg = Maquinaria.objects.create(marca="JLG", serie="JLG-032")
+
+    def _legacy_ot(self, detalle, **extra):
+        return OrdenTrabajo.objects.create(
+            cliente=self.cliente, tipo="SERV", detalle_lineas=detalle, **extra
+        )
+
+    def _linea(self, serie, desde="2026-03-01", valor=1000, flete=500):
+        neto = valor + flete
+        return {
+            "serie": serie, "unidad": "Dia", "cantidadPeriodo": 2,
+            "desde": desde, "hasta": desde, "valor": valor, "flete": flete,
+            "tipoFlete": "Ida", "neto": neto, "iva": round(neto * 0.19, 2),
+            "total": round(neto * 1.19, 2),
+        }
+
+    def test_create_writes_normalized_lines(self):
+        response = self.client.post(
+            "/ordenes",
+            {
+                "tipo": "SERV",
+                "meta_cliente": "Cliente U032",
+                "lineas": [
+                    {"serie": "gen-032", "valor": "10000.50", "flete": "2000",
+                     "desde": "2026-04-01", "hasta": "2026-04-03", "cantidadPeriodo": 3},
+                    {"serie": "SIN-MAQUINA", "valor": "100"},
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        primera, segunda = OrdenTrabajoLinea.objects.filter(orden_id=response.data["id"])
+        self.assertEqual(primera.posicion, 0)
+        self.assertEqual(primera.maquinaria_id, self.genie.id)
+        self.assertEqual((primera.valor, primera.flete), (Decimal("10000.50"), Decimal("2000.00")))
+        self.assertEqual(primera.neto, Decimal("12000.50"))
+        self.assertEqual((primera.desde, primera.hasta), (date(2026, 4, 1), date(2026, 4, 3)))
+        self.assertEqual(primera.cantidad_periodo, 3)
+        self.assertIsNone(segunda.maquinaria_id)
+        self.assertEqual(segunda.serie, "SIN-MAQUINA")
+
+    def test_create_picks_lowest_id_for_case_duplicate_series(self):
+        Maquinaria.objects.create(marca="Genie", serie="gen-032")
+        response = self.client.post(
+            "/ordenes",
+            {"tipo": "SERV", "meta_cliente": "Cliente U032", "lineas": [{"serie": "Gen-032", "valor": "100"}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(OrdenTrabajo.objects.get(pk=response.data["id"]).maquinaria_id, self.genie.id)
+        self.assertEqual(OrdenTrabajoLinea.objects.get(orden_id=response.data["id"]).maquinaria_id, self.genie.id)
+
+    def test_backfill_is_chunked_and_resumable(self):
+        ots = [self._legacy_ot([self._linea("GEN-032"), self._linea("jlg-032")]) for _ in range(3)]
+        ots.append(self._legacy_ot(["basura", {"serie": "X", "valor": "no-num", "desde": "mal"}]))
+
+        def run(*args):
+            out = StringIO()
+            call_command("backfill_ot_lineas", "--chunk-size", "2", *args, stdout=out)
+            return json.loads(out.getvalue())
+
+        self.assertEqual(run("--dry-run")["lineas"], 7)
+        self.assertEqual(OrdenTrabajoLinea.objects.count(), 0)
+
+        result = run()
+        self.assertEqual((result["chunks"], result["ordenes"], result["lineas"]), (2, 4, 7))
+        self.assertEqual(run()["lineas"], 0)
+
+        rara = OrdenTrabajoLinea.objects.get(orden=ots[-1])
+        self.assertEqual((rara.posicion, rara.valor, rara.desde), (1, Decimal("0.00"), None))
+        self.assertEqual(
+            OrdenTrabajoLinea.objects.filter(maquinaria=self.jlg).count(), 3
+        )
+
+    def test_line_filters_on_ordenes(self):
+        marzo = self._legacy_ot([self._linea("GEN-032"), self._linea("GEN-032", "2026-03-20")])
+        abril = self._legacy_ot([self._linea("JLG-032", "2026-04-10")])
+        call_command("backfill_ot_lineas", stdout=StringIO())
+
+        def ids(query):
+            response = self.client.get(f"/ordenes?{query}")
+            self.assertEqual(response.status_code, 200)
+            return [row["id"] for row in response.data]
+
+        self.assertEqual(ids("linea_serie=gen-032"), [marzo.id])
+        self.assertEqual(ids(f"linea_maquinaria={self.jlg.id}"), [abril.id])
+        self.assertEqual(ids("linea_desde=2026-04-01"), [abril.id])
+        self.assertEqual(ids("linea_hasta=2026-03-31&linea_serie=GEN-032"), [marzo.id])
+        self.assertEqual(ids("linea_maquinaria=abc"), [])
+        self.assertEqual(len(ids("")), 2)
+
+    def test_update_of_detalle_resyncs_lines(self):
+        ot = self._legacy_ot([self._linea("GEN-032")])
+        call_command("backfill_ot_lineas", stdout=StringIO())
+        response = self.client.patch(
+            f"/ordenes/{ot.id}",
+            {"detalle_lineas": [self._linea("JLG-032"), self._linea("GEN-032")]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            list(ot.lineas.values_list("maquinaria_id", flat=True)),
+            [self.jlg.id, self.genie.id],
+        )
@@ -0,0 +1,74 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.models import Cliente, Maquinaria, OrdenTrabajo
+from api.views import detalle_serie_sql
+
+
+class OrdenSerieSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        staff = User.objects.create_user("u033-staff", password="test", is_staff=True)
+        self.client.force_authenticate(staff)
+        self.cliente = Cliente.objects.create(razon_social="Constructora Norte", rut="33-3")
+        otro = Cliente.objects.create(razon_social="Otro Cliente", rut="44-4")
+        self.maq = Maquinaria.objects.create(marca="JLG", serie="PRINC-01")
+
+        self.multi = OrdenTrabajo.objects.create(
+            cliente=otro, tipo="ALTA",
+            detalle_lineas=[{"serie": "ABC-100"}, {"serie": " xyz_200 "}],
+        )
+        self.sola = OrdenTrabajo.objects.create(
+            cliente=otro, tipo="ALTA", detalle_lineas=[{"serie": "ABC-1000"}],
+        )
+        self.rara = OrdenTrabajo.objects.create(
+            cliente=self.cliente, tipo="SERV", maquinaria=self.maq,
+            detalle_lineas=["texto", 5, None, {"valor": 1}],
+            orden_compra="OC-777",
+        )
+
+    def ids(self, query):
+        response = self.client.get(f"/ordenes?{query}")
+        self.assertEqual(response.status_code, 200)
+        return sorted(row["id"] for row in response.data)
+
+    def test_serie_matches_whole_line_serie_casefolded(self):
+        self.assertEqual(self.ids("serie=abc-100"), [self.multi.id])
+        self.assertEqual(self.ids("serie=XYZ_200"), [self.multi.id])
+        self.assertEqual(self.ids("serie=ABC"), [])
+
+    def test_global_query_searches_lines_and_ot_fields(self):
+        self.assertEqual(self.ids("query=abc-10"), sorted([self.multi.id, self.sola.id]))
+        # "_" es literal, no comodín de LIKE.
+        self.assertEqual(self.ids("query=z_2"), [self.multi.id])
+        self.assertEqual(self.ids("query=zz2"), [])
+        self.assertEqual(self.ids("query=norte"), [self.rara.id])
+        self.assertEqual(self.ids("query=princ"), [self.rara.id])
+        self.assertEqual(self.ids("query=oc-777"), [self.rara.id])
+        self.assertEqual(self.ids(f"query={self.rara.id}"), [self.rara.id])
+
+    def test_search_trims_both_sides(self):
+        self.assertEqual(self.ids("serie=%20ABC-100%20"), [self.multi.id])
+        self.assertEqual(self.ids("serie=%20xyz_200"), [self.multi.id])
+        self.assertEqual(self.ids("query=%20XYZ_2"), [self.multi.id])
+
+    def test_only_spaces_are_trimmed_like_sql(self):
+        # trim()/btrim() no quitan tabs ni saltos de línea: el término tampoco.
+        tab = OrdenTrabajo.objects.create(
+            cliente=self.cliente, tipo="ALTA", detalle_lineas=[{"serie": "TAB-1\t"}],
+        )
+        self.assertEqual(self.ids("serie=TAB-1"), [])
+        self.assertEqual(self.ids("serie=TAB-1%09"), [tab.id])
+        self.assertEqual(self.ids("serie=%20TAB-1%09%20"), [tab.id])
+        _sql, param = detalle_serie_sql("postgresql")
+        self.assertEqual(param(" TAB-1\t "), "tab-1\t")
+
+    def test_postgres_exact_search_uses_gin_expression(self):
+        sql, param = detalle_serie_sql("postgresql")
+        self.assertIn("ot_detalle_series(", sql)
+        self.assertIn("@> ARRAY[%s]::text[]", sql)
+        self.assertEqual(param(" ABC-100 "), "abc-100")
+        sql, param = detalle_serie_sql("postgresql", contiene=True)
+        self.assertIn("lower(btrim(l.value ->> 'serie'))", sql)
+        self.assertEqual(param(" ABC "), "%ABC%")
@@ -0,0 +1,75 @@
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.models import Cliente, OrdenTrabajo
+
+
+class OrdenTrabajoDenormalizedTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        staff = User.objects.create_user("u034-staff", password="test", is_staff=True)
+        self.client.force_authenticate(staff)
+        self.cliente = Cliente.objects.create(razon_social="Cliente U034", rut="34.034.034-4")
+
+    def _ot(self, **extra):
+        return OrdenTrabajo.objects.create(cliente=self.cliente, tipo="SERV", **extra)
+
+    def _row(self, ot):
+        [row] = [r for r in self.client.get("/ordenes").data if r["id"] == ot.id]
+        return row
+
+    def test_derived_fields_are_stored_on_save(self):
+        ot = self._ot(
+            detalle_lineas=[{"serie": "A-1"}, {"serie": " A-1 "}, {"serie": "B-2"}],
+            observaciones="Despacho urgente\nOC: 4500-77",
+        )
+        ot.refresh_from_db()
+        self.assertEqual(ot.series_cache, ["A-1", "B-2"])
+        self.assertEqual(ot.orden_compra_cache, "4500-77")
+        self.assertEqual(
+            (ot.cliente_rut_cache, ot.cliente_razon_cache), ("34.034.034-4", "Cliente U034")
+        )
+
+        ot.orden_compra = "OC-DIRECTA"
+        ot.save(update_fields=["orden_compra"])
+        ot.refresh_from_db()
+        self.assertEqual(ot.orden_compra_cache, "OC-DIRECTA")
+
+        row = self._row(ot)
+        self.assertEqual(row["series"], ["A-1", "B-2"])
+        self.assertEqual((row["oc"], row["orden_compra"]), ("OC-DIRECTA", "OC-DIRECTA"))
+        self.assertEqual((row["rut"], row["cliente_rut"], row["rut_cliente"]), ("34.034.034-4",) * 3)
+
+    def test_cliente_changes_propagate(self):
+        ot = self._ot()
+        self.cliente.razon_social = "Cliente Renombrado"
+        self.cliente.save()
+        ot.refresh_from_db()
+        self.assertEqual(ot.cliente_razon_cache, "Cliente Renombrado")
+        self.assertEqual(self._row(ot)["cliente_nombre"], "Cliente Renombrado")
+
+    def test_legacy_rows_are_filled_in_chunks_with_same_output(self):
+        ots = [
+            self._ot(detalle_lineas=[{"serie": f"S-{i}"}], observaciones=f"OC: {i}")
+            for i in range(5)
+        ]
+        expected = {ot.id: self._row(ot) for ot in ots}
+        OrdenTrabajo.objects.update(
+            series_cache=None, orden_compra_cache=None,
+            cliente_rut_cache=None, cliente_razon_cache=None,
+        )
+        # Sin derivados el listado calcula al vuelo lo mismo.
+        for ot in ots:
+            self.assertEqual(self._row(ot), expected[ot.id])
+
+        out = StringIO()
+        call_command("refresh_ot_denormalized", "--chunk-size", "2", stdout=out)
+        self.assertEqual(json.loads(out.getvalue())["chunks"], 3)
+        self.assertFalse(OrdenTrabajo.objects.filter(series_cache__isnull=True).exists())
+        for ot in ots:
+            self.assertEqual(self._row(ot), expected[ot.id])
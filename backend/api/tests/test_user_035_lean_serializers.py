@@ -0,0 +1,97 @@
+import json
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.models import Arriendo, Cliente, Documento, Maquinaria, Obra, OrdenTrabajo
+
+LEAN = override_settings(LEAN_READ_ENDPOINTS=["ordenes", "documentos"])
+
+
+class LeanSerializerParityTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        staff = User.objects.create_user("u035-staff", password="test", is_staff=True)
+        self.client.force_authenticate(staff)
+
+        self.cliente = Cliente.objects.create(razon_social="Cliente U035", rut="35.035.035-5")
+        maq = Maquinaria.objects.create(marca="Genie", modelo="GS-1930", serie="GEN-035")
+        sin_serie = Maquinaria.objects.create(marca="JLG", serie="")
+        obra = Obra.objects.create(nombre="Obra U035")
+        arriendo = Arriendo.objects.create(
+            maquinaria=maq, cliente=self.cliente, obra=obra,
+            fecha_inicio=date(2026, 5, 1), periodo="Dia", tarifa=Decimal("1000"),
+        )
+
+        gd = Documento.objects.create(
+            tipo="GD", numero="35", fecha_emision=date(2026, 5, 1), arriendo=arriendo,
+            cliente=self.cliente, obra_origen=obra, obra_destino=obra,
+        )
+        fact = Documento.objects.create(
+            tipo="FACT", numero="3501", fecha_emision=date(2026, 5, 2), arriendo=arriendo,
+            cliente=self.cliente, relacionado_con=gd, monto_neto=Decimal("1000"),
+            monto_iva=Decimal("190"), monto_total=Decimal("1190.5"),
+        )
+        Documento.objects.create(
+            tipo="NC", numero="3502", fecha_emision=date(2026, 5, 3), arriendo=arriendo,
+            relacionado_con=fact, monto_total=Decimal("-10"), archivo_url="/nc.pdf",
+        )
+
+        OrdenTrabajo.objects.create(
+            cliente=self.cliente, tipo="ALQ", maquinaria=maq, arriendo=arriendo,
+            factura=fact, guia=gd, detalle_lineas=[{"serie": "GEN-035", "valor": 1}],
+            monto_neto=Decimal("1000"), fecha_emision_doc=date(2026, 5, 2),
+            observaciones="OC: 4500-35", vendedor="Ana",
+        )
+        OrdenTrabajo.objects.create(
+            cliente=self.cliente, tipo="SERV", maquinaria=sin_serie, observaciones=None
+        )
+        legacy = OrdenTrabajo.objects.create(
+            cliente=self.cliente, tipo="SERV", detalle_lineas=[{"serie": "X-1"}],
+            observaciones="Orden de compra: 99",
+        )
+        # Filas antiguas sin derivados guardados: se calculan al vuelo.
+        OrdenTrabajo.objects.filter(pk=legacy.pk).update(
+            series_cache=None, orden_compra_cache=None,
+            cliente_rut_cache=None, cliente_razon_cache=None,
+        )
+
+    def _both(self, path):
+        model = self.client.get(path)
+        with LEAN:
+            lean = self.client.get(path)
+        self.assertEqual((model.status_code, lean.status_code), (200, 200))
+        return json.loads(model.content), json.loads(lean.content)
+
+    def assertParity(self, path, rows):
+        model, lean = self._both(path)
+        self.assertEqual(len(model), rows)
+        self.assertEqual(lean, model)
+        self.assertEqual([list(r) for r in lean], [list(r) for r in model])
+
+    def test_ordenes_parity(self):
+        self.assertParity("/ordenes", 3)
+        self.assertParity("/ordenes?solo_pendientes=1", 3)
+
+    def test_documentos_parity(self):
+        self.assertParity("/documentos", 3)
+        self.assertParity("/documentos?tipo=FACT", 1)
+
+    def test_lean_queries(self):
+        with LEAN:
+            with self.assertNumQueries(1):
+                self.client.get("/ordenes")
+            with self.assertNumQueries(2):
+                self.client.get("/documentos")
+
+    def test_bench_command(self):
+        out = StringIO()
+        call_command("bench_lean_serializers", "--rounds", "1", stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertEqual(result["ordenes"]["lean"]["rows"], 3)
+        self.assertEqual(result["documentos"]["model"]["rows"], 3)
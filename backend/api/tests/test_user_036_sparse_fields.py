@@ -0,0 +1,96 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.models import Arriendo, Cliente, Documento, Maquinaria, Obra, OrdenTrabajo
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        staff = User.objects.create_user("u036-staff", password="test", is_staff=True)
+        self.client.force_authenticate(staff)
+
+        self.cliente = Cliente.objects.create(razon_social="Cliente U036", rut="36.036.036-6")
+        self.maq = Maquinaria.objects.create(marca="Genie", modelo="GS", serie="GEN-036")
+        obra = Obra.objects.create(nombre="Obra U036")
+        self.arriendo = Arriendo.objects.create(
+            maquinaria=self.maq, cliente=self.cliente, obra=obra,
+            fecha_inicio=date(2026, 6, 1), periodo="Dia", tarifa=Decimal("1000"),
+        )
+        self.gd = Documento.objects.create(
+            tipo="GD", numero="36", fecha_emision=date(2026, 6, 1), arriendo=self.arriendo,
+            cliente=self.cliente,
+        )
+        self.fact = Documento.objects.create(
+            tipo="FACT", numero="3601", fecha_emision=date(2026, 6, 2), arriendo=self.arriendo,
+            cliente=self.cliente, relacionado_con=self.gd, monto_total=Decimal("1190"),
+        )
+        self.ot = OrdenTrabajo.objects.create(
+            cliente=self.cliente, tipo="ALQ", maquinaria=self.maq, factura=self.fact,
+            guia=self.gd, observaciones="OC: 36", vendedor="Ana",
+        )
+
+    def get(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def test_defaults_unchanged(self):
+        [row] = self.get("/ordenes")
+        self.assertEqual(row["factura"]["numero"], "3601")
+        self.assertEqual(row["rut"], "36.036.036-6")
+        self.assertEqual(self.get("/ordenes?expand=factura"), [row])
+
+    def test_ot_fields_single_table_query(self):
+        with self.assertNumQueries(1) as ctx:
+            rows = self.get("/ordenes?fields=id,estado,factura")
+        self.assertEqual(rows, [{"id": self.ot.id, "estado": "PEND", "factura": self.fact.id}])
+        sql = ctx.captured_queries[0]["sql"]
+        self.assertNotIn("JOIN", sql)
+        self.assertNotIn("detalle_lineas", sql)
+
+    def test_ot_expand_and_aliases(self):
+        with self.assertNumQueries(1):
+            [row] = self.get("/ordenes?fields=id,rut,oc,maquinaria_label&expand=guia")
+        self.assertEqual(list(row), ["id", "maquinaria_label", "guia", "rut", "oc"])
+        self.assertEqual(row["guia"]["numero"], "36")
+        self.assertEqual((row["rut"], row["oc"]), ("36.036.036-6", "36"))
+        self.assertEqual(row["maquinaria_label"], "Genie GS (GEN-036)")
+
+        detail = self.get(f"/ordenes/{self.ot.id}?fields=id,cliente_razon")
+        self.assertEqual(detail, {"id": self.ot.id, "cliente_razon": "Cliente U036"})
+
+    def test_documentos_relations(self):
+        with self.assertNumQueries(2):
+            rows = self.get("/documentos?fields=id,relaciones_inversas,relacionado_con")
+        self.assertEqual(
+            rows,
+            [
+                {"id": self.fact.id, "relacionado_con": self.gd.id, "relaciones_inversas": []},
+                {"id": self.gd.id, "relacionado_con": None, "relaciones_inversas": [self.fact.id]},
+            ],
+        )
+        rows = self.get("/documentos?fields=id&expand=relaciones_inversas")
+        self.assertEqual(rows[1]["relaciones_inversas"][0]["numero"], "3601")
+
+    def test_other_viewsets(self):
+        with self.assertNumQueries(1):
+            rows = self.get("/maquinarias?fields=id,serie")
+        self.assertEqual(rows, [{"id": self.maq.id, "serie": "GEN-036"}])
+        self.assertEqual(self.get("/maquinarias?fields=obra"), [{"obra": "Obra U036"}])
+        self.assertEqual(self.get("/clientes?fields=rut"), [{"rut": "36.036.036-6"}])
+        self.assertEqual(
+            self.get(f"/arriendos/{self.arriendo.id}?fields=id,tarifa"),
+            {"id": self.arriendo.id, "tarifa": "1000.00"},
+        )
+
+    def test_unknown_names_are_rejected(self):
+        response = self.client.get("/ordenes?fields=id,nada&expand=cliente")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {"fields", "expand"})
+        # Los alias del listado no existen en el detalle.
+        self.assertEqual(self.client.get(f"/ordenes/{self.ot.id}?fields=rut").status_code, 400)
@@ -0,0 +1,96 @@
+import io
+import json
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.models import Arriendo, Cliente, Documento, Maquinaria, OrdenTrabajo
+from api.renderers import FastJSONParser, FastJSONRenderer
+
+
+class FastJSONTests(TestCase):
+    def assertSameJSON(self, data, media_type=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type),
+        )
+
+    def test_renderer_matches_drf(self):
+        self.assertSameJSON({
+            "decimal": Decimal("1190.50"),
+            "entero": Decimal("10"),
+            "fecha": date(2026, 7, 1),
+            "utc": datetime(2026, 7, 1, 12, 30, tzinfo=dt_timezone.utc),
+            "local": datetime(2026, 7, 1, 12, 30, 5, 123456, tzinfo=dt_timezone(timedelta(hours=-4))),
+            "naive": datetime(2026, 7, 1, 8, 0),
+            "hora": time(9, 15),
+            "duracion": timedelta(hours=1),
+            "lazy": gettext_lazy("Factura"),
+            "texto": "Grúa ñandú   fin  ",
+            1: [None, True, 2, "x", ("a", "b")],
+        })
+        self.assertSameJSON([{"indent": 1}], "application/json; indent=4")
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+
+    def test_parser(self):
+        parser = FastJSONParser()
+        self.assertEqual(
+            parser.parse(io.BytesIO('{"a": [1, 2.5, "ñ"]}'.encode())),
+            {"a": [1, 2.5, "ñ"]},
+        )
+        big = b'{"n": 123456789012345678901234567890}'
+        self.assertEqual(parser.parse(io.BytesIO(big)), JSONParser().parse(io.BytesIO(big)))
+        for body in (b'{"a": NaN}', b"{roto"):
+            with self.assertRaises(ParseError):
+                parser.parse(io.BytesIO(body))
+
+
+class FastJSONEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        staff = User.objects.create_user("u037-staff", password="test", is_staff=True)
+        self.client.force_authenticate(staff)
+        cliente = Cliente.objects.create(razon_social="Cliente Ñuñoa U037", rut="37-7")
+        maq = Maquinaria.objects.create(marca="Genie", serie="GEN-037")
+        arriendo = Arriendo.objects.create(
+            maquinaria=maq, cliente=cliente, fecha_inicio=date(2026, 7, 1),
+            periodo="Dia", tarifa=Decimal("1000"),
+        )
+        fact = Documento.objects.create(
+            tipo="FACT", numero="3701", fecha_emision=date(2026, 7, 1), arriendo=arriendo,
+            cliente=cliente, monto_neto=Decimal("1000.5"),
+        )
+        OrdenTrabajo.objects.create(
+            cliente=cliente, tipo="ALQ", maquinaria=maq, factura=fact,
+            detalle_lineas=[{"serie": "GEN-037", "valor": 1000.5}],
+        )
+
+    def test_endpoints_render_identically(self):
+        for path in ("/ordenes", "/documentos"):
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+            self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+        response = self.client.post(
+            "/clientes", data=json.dumps({"razon_social": "Nuevo", "rut": "37-8"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def test_bench_command(self):
+        out = StringIO()
+        call_command("bench_json_renderer", "--rounds", "1", stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertTrue(result["ordenes"]["identical"])
+        self.assertTrue(result["documentos"]["identical"])
+        self.assertEqual(result["documentos"]["rows"], 1)
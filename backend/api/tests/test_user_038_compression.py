@@ -0,0 +1,98 @@
+import asyncio
+import gzip
+import zlib
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import metrics
+from api.compression import CompressionMiddleware, negotiate
+from api.models import Cliente, UserSecurity
+
+BODY = b'{"rows":[' + b",".join(b'{"estado":"Disponible","obra":"Bodega"}' for _ in range(200)) + b"]}"
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+        self.factory = RequestFactory()
+
+    def run_middleware(self, response, path="/ordenes", encoding="gzip, deflate, br"):
+        request = self.factory.get(path, HTTP_ACCEPT_ENCODING=encoding)
+        return CompressionMiddleware(lambda r: response)(request)
+
+    def test_negotiation(self):
+        self.assertEqual(negotiate("gzip;q=0.5, identity").name, "gzip")
+        self.assertEqual(negotiate("*").name, negotiate("gzip").name)
+        self.assertIsNone(negotiate("gzip;q=0, identity"))
+        self.assertIsNone(negotiate(""))
+
+    def test_large_json_is_compressed_and_counted(self):
+        response = self.run_middleware(HttpResponse(BODY, content_type="application/json"))
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(gzip.decompress(response.content), BODY)
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        snap = metrics.snapshot()
+        self.assertEqual(snap["compression.gzip.responses"], 1)
+        self.assertEqual(snap["compression.bytes_saved"], len(BODY) - len(response.content))
+
+    def test_skips(self):
+        small = self.run_middleware(HttpResponse(b"{}", content_type="application/json"))
+        excluded = self.run_middleware(
+            HttpResponse(BODY, content_type="application/json"), path="/auth/login"
+        )
+        binary = self.run_middleware(HttpResponse(BODY, content_type="application/pdf"))
+        for response in (small, excluded, binary):
+            self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(excluded.content, BODY)
+        with override_settings(COMPRESSION_ENABLED=False):
+            off = self.run_middleware(HttpResponse(BODY, content_type="application/json"))
+        self.assertFalse(off.has_header("Content-Encoding"))
+
+    def test_streaming_flushes_each_chunk(self):
+        chunks = [b"data: uno\n\n", b"data: dos\n\n"]
+        response = self.run_middleware(
+            StreamingHttpResponse(iter(chunks), content_type="text/event-stream")
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        decoder = zlib.decompressobj(31)
+        received = [decoder.decompress(part) for part in response.streaming_content]
+        # Cada evento se puede decodificar apenas llega.
+        self.assertEqual(received[:2], chunks)
+        self.assertEqual(metrics.snapshot()["compression.bytes_in"], sum(map(len, chunks)))
+
+    def test_async_streaming(self):
+        async def events():
+            yield b"data: uno\n\n"
+            yield b"data: dos\n\n"
+
+        response = self.run_middleware(StreamingHttpResponse(events(), content_type="text/event-stream"))
+
+        async def collect():
+            return b"".join([part async for part in response.streaming_content])
+
+        self.assertEqual(gzip.decompress(asyncio.run(collect())), b"data: uno\n\ndata: dos\n\n")
+
+
+class CompressionEndpointTests(TestCase):
+    def test_list_compressed_login_not(self):
+        user = User.objects.create_user("u038-user", password="clave-038", is_staff=True)
+        UserSecurity.objects.create(user=user)
+        Cliente.objects.bulk_create(
+            Cliente(razon_social=f"Cliente U038 {i}", rut=f"38.{i:03d}-8") for i in range(40)
+        )
+        client = APIClient()
+        login = client.post(
+            "/auth/login", {"username": "u038-user", "password": "clave-038"},
+            format="json", HTTP_ACCEPT_ENCODING="gzip",
+        )
+        self.assertEqual(login.status_code, 200)
+        self.assertFalse(login.has_header("Content-Encoding"))
+
+        client.force_authenticate(user)
+        response = client.get("/clientes", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn(b"Cliente U038 39", gzip.decompress(response.content))
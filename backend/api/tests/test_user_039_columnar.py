@@ -0,0 +1,104 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import AsyncClient, SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.models import Arriendo, Cliente, Documento, Maquinaria, Obra, OrdenTrabajo
+from api.renderers import to_columns
+
+
+def decode(payload):
+    """Igual que frontend/src/lib/columns.js."""
+    columns, dicts = payload["columns"], payload["dicts"]
+    if payload["orient"] == "columns":
+        rows = list(zip(*payload["data"])) if columns else [[] for _ in range(payload["count"])]
+    else:
+        rows = payload["rows"]
+    out = []
+    for row in rows:
+        item = {}
+        for col, raw in zip(columns, row):
+            item[col] = dicts[col][raw] if col in dicts and raw is not None else raw
+        out.append(item)
+    return out
+
+
+class ToColumnsTests(SimpleTestCase):
+    def test_dictionary_encoding(self):
+        rows = [
+            {"id": 1, "cliente": "ACME", "obra": None, "serie": "A"},
+            {"id": 2, "cliente": "ACME", "obra": "Norte", "serie": "B"},
+            {"id": 3, "cliente": "Beta", "obra": "Norte", "serie": "C"},
+        ]
+        payload = to_columns(rows)
+        self.assertEqual(payload["dicts"], {"cliente": ["ACME", "Beta"], "obra": ["Norte"]})
+        self.assertEqual(payload["rows"][0], [1, 0, None, "A"])
+        self.assertEqual(decode(payload), rows)
+        self.assertEqual(decode(to_columns(rows, "columns")), rows)
+        self.assertEqual(to_columns({"detail": "x"}), {"detail": "x"})
+        self.assertEqual(decode(to_columns([])), [])
+
+
+class ColumnarEndpointTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user("u039-staff", password="test", is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+        cliente = Cliente.objects.create(razon_social="Cliente U039", rut="39-9")
+        obra = Obra.objects.create(nombre="Obra U039")
+        today = timezone.now().date()
+        for i in range(30):
+            maq = Maquinaria.objects.create(marca="Genie", modelo="GS", serie=f"U039-{i}")
+            arriendo = Arriendo.objects.create(
+                maquinaria=maq, cliente=cliente, obra=obra,
+                fecha_inicio=today - timedelta(days=3), periodo="Dia",
+                tarifa=Decimal("100"), estado="Activo",
+            )
+            gd = Documento.objects.create(
+                tipo="GD", numero=f"39{i:02d}", fecha_emision=today,
+                arriendo=arriendo, cliente=cliente,
+            )
+            OrdenTrabajo.objects.create(
+                arriendo=arriendo, cliente=cliente, maquinaria=maq,
+                tipo="ALTA", tipo_comercial="A", guia=gd, orden_compra="OC-39",
+            )
+        Maquinaria.objects.create(marca="JLG", modelo="E", serie="U039-BODEGA")
+
+    def test_sync_and_async_match_plain_json(self):
+        async_client = AsyncClient()
+        headers = {"authorization": f"Bearer {RefreshToken.for_user(self.staff).access_token}"}
+        for path in ("/ordenes/estado-arriendos", "/ordenes/estado-bodega"):
+            plain = self.client.get(path)
+            expected = json.loads(plain.content)
+            self.assertTrue(expected)
+            for suffix in ("?format=columns", "?format=columns&orient=columns"):
+                with self.subTest(path=path, suffix=suffix):
+                    response = self.client.get(path + suffix)
+                    self.assertEqual(response.status_code, 200)
+                    payload = json.loads(response.content)
+                    self.assertEqual(decode(payload), expected)
+
+                    response = self.async_get(async_client, "/async" + path + suffix, headers)
+                    self.assertEqual(decode(json.loads(response.content)), expected)
+
+        payload = json.loads(self.client.get("/ordenes/estado-arriendos?format=columns").content)
+        self.assertEqual(payload["dicts"]["cliente"], ["Cliente U039"])
+        self.assertLess(
+            len(json.dumps(payload)) * 2,
+            len(self.client.get("/ordenes/estado-arriendos").content),
+        )
+
+    def async_get(self, client, path, headers):
+        from asgiref.sync import async_to_sync
+
+        response = async_to_sync(client.get)(path, headers=headers)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def test_other_endpoints_unchanged(self):
+        self.assertEqual(self.client.get("/ordenes?format=columns").status_code, 404)
@@ -0,0 +1,153 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.authentication import AuthzRefreshToken, StatelessJWTAuthentication, clear_perm_versions
+from api.idempotency import _finish, _reserve, _retomar
+from api.models import (
+    Arriendo, Cliente, Documento, IdempotencyKey, Maquinaria, Obra, OrdenTrabajo,
+)
+from api.views import OrdenTrabajoViewSet
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user("u040-staff", password="test", is_staff=True)
+        self.client.force_authenticate(self.staff)
+        self.cliente = Cliente.objects.create(razon_social="Cliente U040", rut="40-0")
+        self.maq = Maquinaria.objects.create(marca="Genie", serie="GEN-040")
+        self.obra = Obra.objects.create(nombre="Obra U040")
+
+    def create(self, key, serie="GEN-040"):
+        return self.client.post(
+            "/ordenes",
+            {"tipo": "SERV", "meta_cliente": "Cliente U040", "lineas": [{"serie": serie, "valor": "100"}]},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def emit(self, ot, key=None, **payload):
+        extra = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        return self.client.post(f"/ordenes/{ot.pk}/emitir", payload, format="json", **extra)
+
+    def _ot(self):
+        arriendo = Arriendo.objects.create(
+            cliente=self.cliente, obra=self.obra, maquinaria=self.maq,
+            fecha_inicio=date(2026, 8, 1), periodo="Dia", tarifa=Decimal("100"), estado="Activo",
+        )
+        return OrdenTrabajo.objects.create(
+            cliente=self.cliente, maquinaria=self.maq, arriendo=arriendo, tipo="ALTA",
+            monto_neto=Decimal("100"), monto_iva=Decimal("19"), monto_total=Decimal("119"),
+        )
+
+    def test_create_replays_stored_response(self):
+        first = self.create("crear-1")
+        self.assertEqual(first.status_code, 201, first.content)
+        second = self.create("crear-1")
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(OrdenTrabajo.objects.count(), 1)
+
+        self.assertEqual(self.create("crear-1", serie="OTRA").status_code, 422)
+        # Las claves son por usuario.
+        other = User.objects.create_user("u040-otro", password="test", is_staff=True)
+        self.client.force_authenticate(other)
+        self.assertEqual(self.create("crear-1").status_code, 201)
+        self.assertEqual(OrdenTrabajo.objects.count(), 2)
+
+    def test_in_progress_and_expired_keys(self):
+        record = IdempotencyKey.objects.create(
+            user=self.staff, scope="ordenes.create", key="crear-2", fingerprint="x",
+            expira=timezone.now() + timedelta(minutes=5),
+        )
+        response = self.create("crear-2")
+        self.assertEqual(response.status_code, 422)
+        record.fingerprint = ""
+        record.save()
+        IdempotencyKey.objects.filter(pk=record.pk).update(expira=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.create("crear-2").status_code, 201)
+
+        pending = IdempotencyKey.objects.get(key="crear-2")
+        pending.status_code = None
+        pending.save()
+        response = self.create("crear-2")
+        self.assertEqual((response.status_code, response["Retry-After"]), (409, "1"))
+
+    @mock.patch("api.idempotency.request_fingerprint", return_value="h")
+    def test_stale_in_progress_key_is_reclaimed(self, _fingerprint):
+        record = IdempotencyKey.objects.create(
+            user=self.staff, scope="ordenes.create", key="crear-3", fingerprint="h",
+            expira=timezone.now() + timedelta(hours=1),
+        )
+        # La primera solicitud sigue dentro de su plazo: 409.
+        self.assertEqual(self.create("crear-3").status_code, 409)
+
+        # El worker murió: pasado el plazo, el reintento retoma la clave.
+        stale = timezone.now() - timedelta(minutes=10)
+        IdempotencyKey.objects.filter(pk=record.pk).update(reservado=stale)
+        response = self.create("crear-3")
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.create("crear-3")["Idempotent-Replayed"], "true")
+        self.assertEqual(OrdenTrabajo.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.get(pk=record.pk).status_code, 201)
+
+    def test_only_one_retry_reclaims_a_stale_key(self):
+        stale = timezone.now() - timedelta(minutes=10)
+        record = IdempotencyKey.objects.create(
+            user=self.staff, scope="s", key="k", fingerprint="h",
+            reservado=stale, expira=timezone.now() + timedelta(hours=1),
+        )
+        visto = IdempotencyKey.objects.get(pk=record.pk)  # lo que leyó el segundo reintento
+        first, replay = _reserve(self.staff.pk, "s", "k", "h")
+        self.assertEqual((first.pk, replay), (record.pk, None))
+        self.assertFalse(_retomar(visto, timezone.now(), 60))
+        second, replay = _reserve(self.staff.pk, "s", "k", "h")
+        self.assertEqual((second, replay.status_code), (None, 409))
+
+        # El dueño original ya no puede borrar ni completar la reserva retomada.
+        _finish(visto, mock.Mock(status_code=500, data={}))
+        self.assertTrue(IdempotencyKey.objects.filter(pk=record.pk).exists())
+
+    def test_emitir_replay_and_duplicate_guard(self):
+        ot = self._ot()
+        invalid = self.emit(ot, "emitir-1", tipo_documento="XX")
+        self.assertEqual(invalid.status_code, 400)
+        # Un error no deja la clave tomada.
+        first = self.emit(ot, "emitir-1", tipo_documento="GD", facturable=True)
+        self.assertEqual(first.status_code, 200, first.content)
+        again = self.emit(ot, "emitir-1", tipo_documento="GD", facturable=True)
+        self.assertEqual((again.status_code, again["Idempotent-Replayed"]), (200, "true"))
+        self.assertEqual(again.json(), first.json())
+        self.assertEqual(Documento.objects.filter(tipo="GD").count(), 1)
+
+        self.assertEqual(self.emit(ot, tipo_documento="FACT").status_code, 200)
+        duplicate = self.emit(ot, tipo_documento="FACT")
+        self.assertEqual(duplicate.status_code, 400)
+        self.assertEqual(Documento.objects.filter(tipo="FACT").count(), 1)
+
+    def test_stateless_token_user(self):
+        # Como con DJANGO_JWT_STATELESS_AUTHZ=True: request.user es un ClaimsUser.
+        # authentication_classes se fija al definir la vista, por eso se parcha ahí.
+        patcher = mock.patch.object(
+            OrdenTrabajoViewSet, "authentication_classes", [StatelessJWTAuthentication]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        clear_perm_versions()
+        self.addCleanup(clear_perm_versions)
+        self.client.force_authenticate(None)
+        token = AuthzRefreshToken.for_user(self.staff).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        first = self.create("crear-jwt")
+        self.assertEqual(first.status_code, 201, first.content)
+        again = self.create("crear-jwt")
+        self.assertEqual((again.status_code, again["Idempotent-Replayed"]), (201, "true"))
+        self.assertEqual(IdempotencyKey.objects.get(key="crear-jwt").user_id, self.staff.id)
+        self.assertEqual(OrdenTrabajo.objects.count(), 1)
@@ -0,0 +1,168 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.models import Arriendo, Cliente, Documento, FolioDocumento, Maquinaria, Obra, OrdenTrabajo
+from api.views import _next_doc_numbers
+
+
+class EmisionLoteTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user("u041-staff", password="test", is_staff=True)
+        self.client.force_authenticate(self.staff)
+        self.cliente = Cliente.objects.create(razon_social="Cliente U041", rut="41-1")
+        self.obra = Obra.objects.create(nombre="Obra U041")
+        self.n = 0
+        previo = self.pendiente(estado="PROC", es_facturable=False).arriendo
+        Documento.objects.create(
+            tipo="FACT", numero="0007", fecha_emision=date(2026, 9, 1), arriendo=previo,
+        )
+
+    def pendiente(self, tipo="ALTA", con_arriendo=True, **extra):
+        self.n += 1
+        maq = Maquinaria.objects.create(marca="Genie", serie=f"U041-{self.n}", estado="Para venta")
+        arriendo = None
+        if con_arriendo:
+            arriendo = Arriendo.objects.create(
+                cliente=self.cliente, obra=self.obra, maquinaria=maq,
+                fecha_inicio=date(2026, 9, 1), periodo="Dia", tarifa=Decimal("100"), estado="Activo",
+            )
+        fields = dict(
+            cliente=self.cliente, maquinaria=maq, arriendo=arriendo, tipo=tipo,
+            estado="PEND", es_facturable=True,
+            monto_neto=Decimal("100"), monto_iva=Decimal("19"), monto_total=Decimal("119"),
+        )
+        fields.update(extra)
+        return OrdenTrabajo.objects.create(**fields)
+
+    def lote(self, **payload):
+        return self.client.post("/ordenes/emitir-lote", payload, format="json")
+
+    @override_settings(EMISION_LOTE_CHUNK_SIZE=2)
+    def test_factura_pendientes_en_bloques(self):
+        ots = [self.pendiente() for _ in range(3)]
+        serv = self.pendiente(tipo="SERV", con_arriendo=False)
+        otra = self.pendiente(estado="PROC", es_facturable=False)
+
+        response = self.lote(tipo_documento="FACT", solo_facturacion_pendiente=True)
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        self.assertEqual((body["emitidas"], body["fallidas"]), (4, 0))
+        self.assertEqual([r["id"] for r in body["resultados"]], [ot.id for ot in [*ots, serv]])
+        self.assertEqual([r["numero"] for r in body["resultados"]], ["0008", "0009", "0010", "0011"])
+
+        for ot in [*ots, serv]:
+            ot.refresh_from_db()
+            self.assertEqual((ot.estado, ot.es_facturable), ("PROC", False))
+            self.assertEqual(ot.factura.monto_total, Decimal("119"))
+            self.assertEqual(ot.factura.arriendo_id, ot.arriendo_id)
+        self.assertEqual(serv.arriendo.estado, "Terminado")
+        otra.refresh_from_db()
+        self.assertIsNone(otra.factura_id)
+
+        again = self.lote(tipo_documento="FACT", ids=[ots[0].id, 999999])
+        self.assertEqual(
+            [(r["ok"], r["detail"]) for r in again.json()["resultados"]],
+            [(False, "La orden ya tiene una factura asociada."), (False, "No encontrada.")],
+        )
+        self.assertEqual(Documento.objects.filter(tipo="FACT").count(), 5)
+
+    def test_queries_no_crecen_con_el_lote(self):
+        def run(cantidad):
+            ids = [self.pendiente().id for _ in range(cantidad)]
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.lote(tipo_documento="FACT", ids=ids)
+            self.assertEqual(response.json()["emitidas"], cantidad)
+            return len(ctx.captured_queries)
+
+        run(1)  # Crea la fila de IngresoMensual del mes; después solo se actualiza.
+        self.assertEqual(run(3), run(12))
+
+    def test_arriendos_creados_en_bloque(self):
+        def run(cantidad):
+            ids = [self.pendiente(tipo="SERV", con_arriendo=False).id for _ in range(cantidad)]
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.lote(tipo_documento="FACT", ids=ids)
+            self.assertEqual(response.json()["emitidas"], cantidad)
+            return len(ctx.captured_queries)
+
+        run(1)
+        self.assertEqual(run(3), run(12))
+        self.assertFalse(OrdenTrabajo.objects.filter(tipo="SERV", arriendo__isnull=True).exists())
+
+    def test_altas_del_mismo_bloque_no_reservan_la_misma_maquina(self):
+        maq = Maquinaria.objects.create(marca="JLG", serie="U041-X", estado="Disponible")
+        linea = {"serie": "U041-X", "desde": "2026-11-02", "hasta": "2026-11-06"}
+        primera, choca, otra_fecha = (
+            self.pendiente(con_arriendo=False, maquinaria=maq, detalle_lineas=[dict(linea, **fechas)])
+            for fechas in ({}, {"desde": "2026-11-05"}, {"desde": "2026-11-09", "hasta": "2026-11-10"})
+        )
+        response = self.lote(
+            tipo_documento="GD", ids=[primera.id, choca.id, otra_fecha.id], facturable=False
+        )
+        self.assertEqual(
+            [(r["ok"], r.get("detail")) for r in response.json()["resultados"]],
+            [
+                (True, None),
+                (False, f"Hay máquinas reservadas en esas fechas por otra orden del lote (OT #{primera.id})."),
+                (True, None),
+            ],
+        )
+        self.assertEqual(Arriendo.objects.filter(maquinaria=maq).count(), 2)
+        primera.refresh_from_db()
+        self.assertEqual(
+            (primera.arriendo.fecha_inicio, primera.arriendo.fecha_termino, primera.guia.arriendo_id),
+            (date(2026, 11, 2), date(2026, 11, 6), primera.arriendo_id),
+        )
+
+    def test_folios_no_dependen_de_documentos_ya_insertados(self):
+        # Dos lotes concurrentes: el segundo reserva antes de que el primero
+        # inserte sus documentos y aun así sigue desde el bloque reservado.
+        with transaction.atomic():
+            primero = _next_doc_numbers("FACT", 3)
+            segundo = _next_doc_numbers("FACT", 2)
+        self.assertEqual(primero, ["0008", "0009", "0010"])
+        self.assertEqual(segundo, ["0011", "0012"])
+        self.assertEqual(FolioDocumento.objects.get(tipo="FACT").ultimo, 12)
+
+        # Un documento creado por fuera del contador también se respeta.
+        Documento.objects.create(
+            tipo="FACT", numero="0040", fecha_emision=date(2026, 9, 2),
+            arriendo=Arriendo.objects.first(),
+        )
+        ot = self.pendiente()
+        body = self.lote(tipo_documento="FACT", ids=[ot.id]).json()
+        self.assertEqual(body["resultados"][0]["numero"], "0041")
+
+    def test_guias_de_retiro(self):
+        reti = self.pendiente(tipo="RETI", estado="PEND", es_facturable=False)
+        alta = self.pendiente()
+        response = self.lote(tipo_documento="GD", ids=[reti.id, alta.id], facturable=True)
+        self.assertEqual(response.json()["emitidas"], 2)
+
+        reti.refresh_from_db()
+        self.assertTrue(reti.guia.es_retiro)
+        self.assertEqual(reti.guia.obra_origen_id, self.obra.id)
+        self.assertEqual(reti.arriendo.estado, "Terminado")
+        self.assertEqual(reti.maquinaria.estado, "Disponible")
+        alta.refresh_from_db()
+        self.assertEqual((alta.estado, alta.es_facturable), ("PEND", True))
+        self.assertEqual(alta.guia.monto_total, Decimal("119"))
+        self.assertEqual(alta.guia.obra_destino_id, self.obra.id)
+
+    def test_validaciones(self):
+        self.assertEqual(self.lote(tipo_documento="XX", ids=[1]).status_code, 400)
+        self.assertEqual(self.lote(tipo_documento="FACT").status_code, 400)
+        self.assertEqual(self.lote(tipo_documento="FACT", ids=["1"]).status_code, 400)
+        self.assertEqual(self.lote(tipo_documento="GD", ids=[1], facturable="si").status_code, 400)
+        with override_settings(EMISION_LOTE_MAX_ORDENES=1):
+            self.assertEqual(self.lote(tipo_documento="FACT", ids=[1, 2]).status_code, 400)
+
+        self.client.force_authenticate(User.objects.create_user("u041-user", password="test"))
+        self.assertEqual(self.lote(tipo_documento="FACT", ids=[1]).status_code, 403)
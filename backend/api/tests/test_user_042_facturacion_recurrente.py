@@ -0,0 +1,141 @@
+import json
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from api.facturacion import periodo_facturable, sumar_meses
+from api.models import (
+    Arriendo, ArriendoItem, Cliente, Documento, Maquinaria, Obra, OrdenTrabajo, OrdenTrabajoLinea,
+)
+from api.ot_lineas import build_lineas
+
+
+class PeriodoFacturableTests(SimpleTestCase):
+    def test_unidades_iniciadas_se_cobran_completas(self):
+        self.assertEqual(sumar_meses(date(2026, 1, 31), 1), date(2026, 2, 28))
+        self.assertEqual(periodo_facturable(date(2026, 10, 1), "Mes", date(2026, 10, 1)), (1, date(2026, 10, 31)))
+        self.assertEqual(periodo_facturable(date(2026, 9, 1), "Mes", date(2026, 10, 5)), (2, date(2026, 10, 31)))
+        self.assertEqual(periodo_facturable(date(2026, 10, 1), "Semana", date(2026, 10, 8)), (2, date(2026, 10, 14)))
+        self.assertEqual(periodo_facturable(date(2026, 10, 1), "Dia", date(2026, 10, 5)), (5, date(2026, 10, 5)))
+        self.assertIsNone(periodo_facturable(date(2026, 10, 6), "Dia", date(2026, 10, 5)))
+
+
+class FacturarArriendosCommandTests(TestCase):
+    def setUp(self):
+        self.cliente = Cliente.objects.create(razon_social="Cliente U042", rut="42-2")
+        self.obra = Obra.objects.create(nombre="Obra U042", direccion="Calle 42")
+
+    def arriendo(self, serie, periodo, inicio, tarifa="1000", **extra):
+        fields = dict(
+            cliente=self.cliente, obra=self.obra,
+            maquinaria=Maquinaria.objects.create(marca="Genie", serie=serie),
+            fecha_inicio=inicio, periodo=periodo, tarifa=Decimal(tarifa), estado="Activo",
+        )
+        fields.update(extra)
+        return Arriendo.objects.create(**fields)
+
+    def facturar(self, *args, fecha="2026-10-05"):
+        out = StringIO()
+        call_command("facturar_arriendos", "--fecha", fecha, *args, stdout=out)
+        return json.loads(out.getvalue())
+
+    def test_genera_prol_una_vez(self):
+        mensual = self.arriendo("U042-M", "Mes", date(2026, 9, 1), fecha_termino=date(2026, 9, 30))
+        alta = OrdenTrabajo.objects.create(
+            tipo="ALTA", cliente=self.cliente, arriendo=mensual, maquinaria=mensual.maquinaria,
+            detalle_lineas=[{"serie": "U042-M", "desde": "2026-09-01", "hasta": "2026-09-30"}],
+        )
+        OrdenTrabajoLinea.objects.bulk_create(build_lineas(alta))
+
+        diario = self.arriendo("U042-D1", "Dia", date(2026, 10, 1), tarifa="100")
+        for serie in ("U042-D1", "U042-D2"):
+            ArriendoItem.objects.create(
+                arriendo=diario, maquinaria=Maquinaria.objects.get_or_create(serie=serie, defaults={"marca": "JLG"})[0],
+            )
+        # Una FACT sin OT con fechas cubre una semana desde su emisión.
+        semanal = self.arriendo("U042-S", "Semana", date(2026, 9, 1))
+        Documento.objects.create(tipo="FACT", numero="1", fecha_emision=date(2026, 9, 22), arriendo=semanal)
+        self.arriendo("U042-X", "Dia", date(2026, 10, 1), cliente=None)
+        self.arriendo("U042-T", "Dia", date(2026, 10, 1), estado="Terminado")
+        # "activo" en minúsculas también es un arriendo activo.
+        self.arriendo("U042-T2", "Dia", date(2026, 10, 1), estado="activo", cliente=None)
+
+        preview = self.facturar("--dry-run", "--chunk-size", "2")
+        self.assertEqual(OrdenTrabajo.objects.filter(tipo="PROL").count(), 0)
+        result = self.facturar("--chunk-size", "2")
+        for key in ("ordenes", "lineas", "monto_neto", "omitidos"):
+            self.assertEqual(preview[key], result[key])
+        self.assertEqual((result["arriendos"], result["ordenes"], result["lineas"]), (5, 3, 4))
+        self.assertEqual(result["omitidos"]["sin_cliente"], 2)
+        self.assertEqual(result["monto_neto"], "3000.00")
+
+        prol = OrdenTrabajo.objects.get(tipo="PROL", arriendo=mensual)
+        self.assertEqual((prol.estado, prol.es_facturable, prol.monto_total), ("PEND", True, Decimal("1190.00")))
+        self.assertEqual(
+            (prol.detalle_lineas[0]["desde"], prol.detalle_lineas[0]["hasta"]), ("2026-10-01", "2026-10-31")
+        )
+        self.assertEqual(prol.cliente_rut_cache, "42-2")
+        self.assertEqual(prol.obra_nombre, "Obra U042")
+
+        dia = OrdenTrabajo.objects.get(tipo="PROL", arriendo=diario)
+        self.assertEqual(dia.series_cache, ["U042-D1", "U042-D2"])
+        self.assertEqual(dia.monto_neto, Decimal("1000.00"))
+        self.assertEqual(dia.lineas.filter(cantidad_periodo=5, maquinaria__isnull=False).count(), 2)
+
+        semana = OrdenTrabajo.objects.get(tipo="PROL", arriendo=semanal)
+        self.assertEqual(
+            (semana.detalle_lineas[0]["desde"], semana.detalle_lineas[0]["hasta"]), ("2026-09-29", "2026-10-05")
+        )
+
+        again = self.facturar()
+        self.assertEqual(again["ordenes"], 0)
+        self.assertEqual(OrdenTrabajo.objects.filter(tipo="PROL").count(), 3)
+
+        # Una OT anulada deja el periodo otra vez por cobrar.
+        OrdenTrabajo.objects.filter(pk=prol.pk).update(estado="ANUL")
+        self.assertEqual(self.facturar()["ordenes"], 1)
+
+    def test_cobertura_sin_lineas_normalizadas(self):
+        # OT de datos antiguos: solo detalle_lineas, sin OrdenTrabajoLinea.
+        legado = self.arriendo("U042-L", "Semana", date(2026, 9, 1))
+        factura = Documento.objects.create(
+            tipo="FACT", numero="2", fecha_emision=date(2026, 10, 3), arriendo=legado,
+        )
+        OrdenTrabajo.objects.create(
+            tipo="PROL", cliente=self.cliente, arriendo=legado, factura=factura,
+            detalle_lineas=[{"serie": "U042-L", "desde": "2026-09-29", "hasta": "2026-10-12"}],
+        )
+        # OT sin fechas y sin FACT: la cobertura es desconocida y no se cobra.
+        incierto = self.arriendo("U042-I", "Dia", date(2026, 9, 1))
+        OrdenTrabajo.objects.create(
+            tipo="ALTA", cliente=self.cliente, arriendo=incierto, detalle_lineas=[{"serie": "U042-I"}],
+        )
+
+        result = self.facturar()
+        self.assertEqual(result["ordenes"], 0)
+        self.assertEqual(result["omitidos"]["sin_cobertura"], 1)
+        self.assertEqual(OrdenTrabajo.objects.filter(tipo="PROL").count(), 1)
+
+    def test_alta_abierta_no_se_cobra_dos_veces(self):
+        # ALTA sin "hasta": cubre el mes que cobró, con o sin líneas normalizadas.
+        linea = {"desde": "2026-09-01", "unidad": "Mes", "cantidadPeriodo": 1}
+        for serie, normalizar in (("U042-A1", True), ("U042-A2", False)):
+            arriendo = self.arriendo(serie, "Mes", date(2026, 9, 1))
+            alta = OrdenTrabajo.objects.create(
+                tipo="ALTA", cliente=self.cliente, arriendo=arriendo, maquinaria=arriendo.maquinaria,
+                detalle_lineas=[dict(linea, serie=serie)],
+            )
+            if normalizar:
+                OrdenTrabajoLinea.objects.bulk_create(build_lineas(alta))
+
+        self.assertEqual(self.facturar(fecha="2026-09-20")["ordenes"], 0)
+        self.assertEqual(self.facturar(fecha="2026-10-05")["ordenes"], 2)
+        self.assertEqual(self.facturar(fecha="2026-10-20")["ordenes"], 0)
+        periodos = {
+            (ot.detalle_lineas[0]["desde"], ot.detalle_lineas[0]["hasta"])
+            for ot in OrdenTrabajo.objects.filter(tipo="PROL")
+        }
+        self.assertEqual(periodos, {("2026-10-01", "2026-10-31")})
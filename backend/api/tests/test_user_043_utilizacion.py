@@ -0,0 +1,104 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Arriendo, ArriendoItem, Documento, Maquinaria, UtilizacionDiaria
+from api.utilizacion import utilizacion_por_categoria
+
+
+class UtilizacionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("u043-staff", password="test", is_staff=True))
+        self.hoy = timezone.now().date()
+        self.b = self.hoy - timedelta(days=40)
+        b = self.b
+
+        self.m1 = Maquinaria.objects.create(marca="Genie", serie="U043-1", categoria="equipos_altura")
+        self.m2 = Maquinaria.objects.create(marca="Volvo", serie="U043-2", categoria="camiones")
+        self.m3 = Maquinaria.objects.create(marca="Volvo", serie="U043-3", categoria="camiones")
+        Maquinaria.objects.create(marca="Volvo", serie="U043-4", categoria="camiones")
+
+        primero = self.arriendo(self.m1, b, b + timedelta(days=9), "Terminado")
+        self.arriendo(self.m1, b + timedelta(days=5), b + timedelta(days=14), "Terminado")
+        Documento.objects.create(tipo="GD", numero="1", fecha_emision=b, arriendo=primero)
+        multi = self.arriendo(self.m2, b + timedelta(days=20), b + timedelta(days=21), "Activo")
+        for maq in (self.m2, self.m3):
+            ArriendoItem.objects.create(arriendo=multi, maquinaria=maq)
+
+    def arriendo(self, maq, inicio, termino, estado):
+        return Arriendo.objects.create(
+            maquinaria=maq, fecha_inicio=inicio, fecha_termino=termino,
+            periodo="Dia", tarifa=Decimal("1"), estado=estado,
+        )
+
+    def get(self, **params):
+        params.setdefault("desde", self.b.isoformat())
+        params.setdefault("hasta", (self.b + timedelta(days=29)).isoformat())
+        response = self.client.get("/maquinarias/utilizacion", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_por_maquina_y_categoria(self):
+        body = self.get(agrupar="maquina")
+        self.assertEqual(body["dias"], 30)
+        self.assertEqual(
+            [(f["serie"], f["arrendada"], f["en_transito"], f["disponible"]) for f in body["filas"]],
+            [("U043-1", 14, 1, 15), ("U043-2", 10, 0, 20), ("U043-3", 10, 0, 20), ("U043-4", 0, 0, 30)],
+        )
+
+        body = self.get()
+        self.assertEqual(body["fuente"], "vivo")
+        self.assertEqual(
+            [(f["categoria"], f["maquina_dias"], f["arrendada"], f["en_transito"]) for f in body["filas"]],
+            [("camiones", 90, 20, 0), ("equipos_altura", 30, 14, 1)],
+        )
+        self.assertEqual(body["filas"][0]["utilizacion"], round(20 / 90, 4))
+
+        self.assertEqual(self.client.get("/maquinarias/utilizacion", {"desde": "x"}).status_code, 400)
+        self.assertEqual(self.client.get("/maquinarias/utilizacion", {"agrupar": "obra"}).status_code, 400)
+
+    def test_resumen_diario_coincide_con_el_calculo_en_vivo(self):
+        out = StringIO()
+        call_command(
+            "rebuild_utilizacion", "--desde", self.b.isoformat(),
+            "--hasta", (self.b + timedelta(days=29)).isoformat(), "--chunk-days", "7", stdout=out,
+        )
+        result = json.loads(out.getvalue())
+        self.assertEqual((result["dias"], result["chunks"], result["filas"]), (30, 5, 60))
+        self.assertEqual(
+            UtilizacionDiaria.objects.get(fecha=self.b, categoria="equipos_altura").en_transito, 1
+        )
+
+        resumen = self.get()
+        self.assertEqual(resumen["fuente"], "resumen")
+        vivo, _ = utilizacion_por_categoria(self.b, self.b + timedelta(days=29), usar_rollup=False)
+        self.assertEqual(resumen["filas"], vivo)
+
+        hasta = self.hoy.isoformat()
+        mixto = self.get(hasta=hasta)
+        self.assertEqual(mixto["fuente"], "mixto")
+        vivo, _ = utilizacion_por_categoria(self.b, self.hoy, usar_rollup=False)
+        self.assertEqual(mixto["filas"], vivo)
+
+    def test_rango_futuro_no_cuenta_dias_por_venir(self):
+        futuro = Maquinaria.objects.create(marca="JLG", serie="U043-5", categoria="generadores")
+        sin_fin = Maquinaria.objects.create(marca="JLG", serie="U043-6", categoria="generadores")
+        self.arriendo(futuro, self.hoy - timedelta(days=4), self.hoy + timedelta(days=20), "Activo")
+        self.arriendo(sin_fin, self.hoy - timedelta(days=1), None, "activo")
+
+        body = self.get(
+            agrupar="maquina", desde=(self.hoy - timedelta(days=9)).isoformat(),
+            hasta=(self.hoy + timedelta(days=10)).isoformat(),
+        )
+        filas = {f["serie"]: f for f in body["filas"]}
+        # Hasta hoy inclusive: 5 y 2 días; los 10 días futuros quedan disponibles.
+        self.assertEqual((filas["U043-5"]["arrendada"], filas["U043-5"]["disponible"]), (5, 15))
+        self.assertEqual((filas["U043-6"]["arrendada"], filas["U043-6"]["disponible"]), (2, 18))
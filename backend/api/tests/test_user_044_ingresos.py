@@ -0,0 +1,175 @@
+import importlib
+import json
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.ingresos import consultar
+from api.models import Arriendo, ArriendoItem, Cliente, Documento, IngresoMensual, Maquinaria, OrdenTrabajo
+
+
+def resumen():
+    return sorted(
+        IngresoMensual.objects.values_list(
+            "mes", "cliente_id", "categoria", "tipo", "documentos", "monto_neto", "monto_total"
+        )
+    )
+
+
+class IngresoMensualTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("u044-staff", password="test", is_staff=True))
+        self.cli_a = Cliente.objects.create(razon_social="Cliente A", rut="44-1")
+        self.cli_b = Cliente.objects.create(razon_social="Cliente B", rut="44-2")
+        self.grua = Maquinaria.objects.create(marca="Genie", serie="U044-1", categoria="equipos_altura")
+        camion = Maquinaria.objects.create(marca="Volvo", serie="U044-2", categoria="camiones")
+        self.arr_a = self.arriendo(self.cli_a, maquinaria=self.grua)
+        self.arr_b = self.arriendo(self.cli_b)
+        ArriendoItem.objects.create(arriendo=self.arr_b, maquinaria=camion)
+
+    def arriendo(self, cliente, **extra):
+        return Arriendo.objects.create(
+            cliente=cliente, fecha_inicio=date(2026, 1, 1), periodo="Mes",
+            tarifa=Decimal("1000"), estado="Activo", **extra,
+        )
+
+    def doc(self, tipo, numero, fecha, neto, arriendo=None):
+        arriendo = arriendo or self.arr_a
+        neto = Decimal(neto)
+        return Documento.objects.create(
+            tipo=tipo, numero=numero, fecha_emision=fecha, arriendo=arriendo,
+            cliente=arriendo.cliente, monto_neto=neto, monto_iva=neto * Decimal("0.19"),
+            monto_total=neto * Decimal("1.19"),
+        )
+
+    def test_senales_mantienen_el_resumen(self):
+        fact = self.doc("FACT", "1", date(2026, 1, 10), "1000")
+        self.doc("FACT", "2", date(2026, 1, 20), "500")
+        self.doc("NC", "3", date(2026, 1, 25), "200")
+        self.doc("GD", "4", date(2026, 1, 5), "0")
+        self.doc("FACT", "5", date(2026, 2, 3), "300", arriendo=self.arr_b)
+        self.assertEqual(
+            resumen(),
+            [
+                (date(2026, 1, 1), self.cli_a.id, "equipos_altura", "FACT", 2, Decimal("1500"), Decimal("1785")),
+                (date(2026, 1, 1), self.cli_a.id, "equipos_altura", "NC", 1, Decimal("200"), Decimal("238")),
+                (date(2026, 2, 1), self.cli_b.id, "camiones", "FACT", 1, Decimal("300"), Decimal("357")),
+            ],
+        )
+
+        # Cambiar monto y mes mueve el documento entre filas; borrar lo descuenta.
+        fact.fecha_emision = date(2026, 2, 1)
+        fact.monto_neto = Decimal("800")
+        fact.save()
+        fila = IngresoMensual.objects.get(mes=date(2026, 2, 1), cliente=self.cli_a, tipo="FACT")
+        self.assertEqual((fila.documentos, fila.monto_neto), (1, Decimal("800")))
+        fila = IngresoMensual.objects.get(mes=date(2026, 1, 1), cliente=self.cli_a, tipo="FACT")
+        self.assertEqual((fila.documentos, fila.monto_neto), (1, Decimal("500")))
+        fact.delete()
+        fila = IngresoMensual.objects.get(mes=date(2026, 2, 1), cliente=self.cli_a, tipo="FACT")
+        self.assertEqual((fila.documentos, fila.monto_neto), (0, Decimal("0")))
+
+        incremental = [f for f in resumen() if f[4]]
+        out = StringIO()
+        call_command("rebuild_ingresos", stdout=out)
+        self.assertEqual(json.loads(out.getvalue())["filas"], 3)
+        self.assertEqual(resumen(), incremental)
+
+    def test_guia_no_consulta_la_fila_de_ingreso(self):
+        guia = self.doc("GD", "10", date(2026, 3, 2), "0")
+        guia.numero = "10-B"
+        with self.assertNumQueries(2):  # tipo guardado + UPDATE
+            guia.save()
+        self.assertFalse(IngresoMensual.objects.exists())
+
+        # Los cambios de tipo hacia y desde GD siguen moviendo el resumen.
+        guia.tipo, guia.monto_neto = "FACT", Decimal("100")
+        guia.save()
+        fila = IngresoMensual.objects.get(tipo="FACT")
+        self.assertEqual((fila.documentos, fila.monto_neto), (1, Decimal("100")))
+        guia.tipo = "GD"
+        guia.save()
+        fila.refresh_from_db()
+        self.assertEqual((fila.documentos, fila.monto_neto), (0, Decimal("0")))
+
+    def test_migracion_llena_el_resumen_con_documentos_previos(self):
+        self.doc("FACT", "20", date(2025, 3, 4), "1000")
+        self.doc("NC", "21", date(2025, 3, 9), "100")
+        self.doc("FACT", "22", date(2025, 4, 1), "50", arriendo=self.arr_b)
+        esperado = resumen()
+        # Documentos emitidos antes de que existiera la tabla del resumen.
+        IngresoMensual.objects.all().delete()
+
+        migracion = importlib.import_module("api.migrations.0020_backfill_ingresomensual")
+        migracion.llenar_resumen(apps, None)
+        self.assertEqual(resumen(), esperado)
+        filas, fuente = consultar(date(2025, 1, 1), date(2025, 12, 31), ["mes"])
+        self.assertEqual(fuente, "resumen")
+        self.assertEqual(
+            [(f["mes"], f["documentos"], f["monto_neto"]) for f in filas],
+            [("2025-03", 2, Decimal("900")), ("2025-04", 1, Decimal("50"))],
+        )
+
+    def test_emision_por_lote_suma_al_resumen(self):
+        ot = OrdenTrabajo.objects.create(
+            cliente=self.cli_a, maquinaria=self.grua, arriendo=self.arr_a, tipo="ALTA",
+            estado="PEND", es_facturable=True,
+            monto_neto=Decimal("100"), monto_iva=Decimal("19"), monto_total=Decimal("119"),
+        )
+        response = self.client.post(
+            "/ordenes/emitir-lote", {"tipo_documento": "FACT", "ids": [ot.id]}, format="json"
+        )
+        self.assertEqual(response.json()["emitidas"], 1, response.content)
+        ot.refresh_from_db()
+        fila = IngresoMensual.objects.get(tipo="FACT")
+        self.assertEqual(
+            (fila.mes, fila.cliente_id, fila.categoria, fila.documentos, fila.monto_total),
+            (ot.factura.fecha_emision.replace(day=1), self.cli_a.id, "equipos_altura", 1, Decimal("119")),
+        )
+
+    def test_endpoint_resumen_y_documentos_coinciden(self):
+        self.doc("FACT", "1", date(2026, 1, 10), "1000")
+        self.doc("NC", "2", date(2026, 1, 25), "200")
+        self.doc("ND", "3", date(2026, 2, 3), "50")
+        self.doc("FACT", "4", date(2026, 3, 3), "300", arriendo=self.arr_b)
+
+        response = self.client.get(
+            "/reportes/ingresos", {"desde": "2026-01", "hasta": "2026-03", "agrupar": "mes,cliente"}
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        self.assertEqual((body["desde"], body["hasta"], body["fuente"]), ("2026-01-01", "2026-03-31", "resumen"))
+        self.assertEqual(
+            [(f["mes"], f["cliente"], f["documentos"], f["monto_neto"]) for f in body["filas"]],
+            [
+                ("2026-01", "Cliente A", 2, "800.00"),
+                ("2026-02", "Cliente A", 1, "50.00"),
+                ("2026-03", "Cliente B", 1, "300.00"),
+            ],
+        )
+
+        for agrupar in (["mes"], ["categoria", "tipo"], ["cliente"]):
+            desde, hasta = date(2026, 1, 1), date(2026, 3, 31)
+            self.assertEqual(
+                consultar(desde, hasta, agrupar)[0],
+                consultar(desde, hasta, agrupar, usar_resumen=False)[0],
+            )
+
+        parcial = self.client.get(
+            "/reportes/ingresos", {"desde": "2026-01-15", "hasta": "2026-03-31", "categoria": "equipos_altura"}
+        ).json()
+        self.assertEqual(parcial["fuente"], "documentos")
+        self.assertEqual(
+            [(f["mes"], f["monto_neto"]) for f in parcial["filas"]],
+            [("2026-01", "-200.00"), ("2026-02", "50.00")],
+        )
+
+        self.assertEqual(self.client.get("/reportes/ingresos", {"agrupar": "obra"}).status_code, 400)
+        self.assertEqual(self.client.get("/reportes/ingresos", {"desde": "2026-13"}).status_code, 400)
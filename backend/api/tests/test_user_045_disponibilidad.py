@@ -0,0 +1,104 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.disponibilidad import SIN_FIN, fin_ocupacion
+from api.models import Arriendo, ArriendoItem, Maquinaria
+
+
+class DisponibilidadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("u045-ventas", password="test"))
+        self.hoy = timezone.now().date()
+        hoy = self.hoy
+
+        def maq(serie, **extra):
+            extra.setdefault("categoria", "equipos_altura")
+            return Maquinaria.objects.create(marca="Genie", serie=serie, **extra)
+
+        self.libre = maq("U045-libre", altura=Decimal("12"), tipo_altura="tijera", combustible="electrico")
+        self.planificada = maq("U045-plan", altura=Decimal("12"), tipo_altura="tijera", combustible="electrico")
+        self.vencida = maq("U045-vencida", altura=Decimal("12"), tipo_altura="tijera", combustible="electrico")
+        self.item = maq("U045-item", altura=Decimal("16"), tipo_altura="brazo", combustible="diesel")
+        maq("U045-venta", altura=Decimal("12"), tipo_altura="tijera", estado="Para venta")
+        self.camion = maq("U045-camion", categoria="camiones")
+
+        # Arriendo pasado de la máquina libre: no la ocupa en el futuro.
+        self.arriendo(self.libre, hoy - timedelta(days=30), hoy - timedelta(days=10), "Terminado")
+        # Activo con término planificado en 5 días.
+        self.arriendo(self.planificada, hoy - timedelta(days=3), hoy + timedelta(days=5), "Activo")
+        # Activo con término ya vencido: sigue afuera sin fecha de vuelta.
+        self.arriendo(self.vencida, hoy - timedelta(days=20), hoy - timedelta(days=2), "Activo")
+        # Reserva futura por ítem de un arriendo multi-máquina.
+        multi = self.arriendo(None, hoy + timedelta(days=10), hoy + timedelta(days=12), "Activo")
+        ArriendoItem.objects.create(arriendo=multi, maquinaria=self.item)
+
+    def arriendo(self, maq, inicio, termino, estado):
+        return Arriendo.objects.create(
+            maquinaria=maq, fecha_inicio=inicio, fecha_termino=termino,
+            periodo="Dia", tarifa=Decimal("1"), estado=estado,
+        )
+
+    def series(self, **params):
+        response = self.client.get("/maquinarias/disponibles", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        self.assertEqual(body["total"], len(body["filas"]))
+        return [fila["serie"] for fila in body["filas"]]
+
+    def fecha(self, dias):
+        return (self.hoy + timedelta(days=dias)).isoformat()
+
+    def test_cruce_de_fechas(self):
+        self.assertEqual(
+            self.series(desde=self.fecha(1), hasta=self.fecha(3)),
+            ["U045-camion", "U045-item", "U045-libre"],
+        )
+        self.assertEqual(
+            self.series(desde=self.fecha(6), hasta=self.fecha(9)),
+            ["U045-camion", "U045-item", "U045-libre", "U045-plan"],
+        )
+        self.assertEqual(
+            self.series(desde=self.fecha(12), hasta=self.fecha(40)),
+            ["U045-camion", "U045-libre", "U045-plan"],
+        )
+
+    def test_estado_activo_sin_distinguir_mayusculas(self):
+        # Igual que utilizacion y las pantallas de estado (estado__iexact).
+        Arriendo.objects.filter(maquinaria=self.vencida).update(estado="activo")
+        Arriendo.objects.filter(maquinaria=self.planificada).update(estado="ACTIVO", fecha_termino=None)
+        self.assertEqual(
+            self.series(desde=self.fecha(30), hasta=self.fecha(40)),
+            ["U045-camion", "U045-item", "U045-libre"],
+        )
+        self.assertEqual(fin_ocupacion("activo", self.hoy, self.hoy - timedelta(days=1), self.hoy), SIN_FIN)
+
+    def test_filtros_de_especificacion(self):
+        self.assertEqual(
+            self.series(
+                desde=self.fecha(6), hasta=self.fecha(9), categoria="equipos_altura",
+                tipo_altura="tijera", combustible="electrico", altura_min="10", altura_max="12",
+            ),
+            ["U045-libre", "U045-plan"],
+        )
+        self.assertEqual(self.series(desde=self.fecha(1), altura_min="14"), ["U045-item"])
+        fila = self.client.get("/maquinarias/disponibles", {"altura_min": "14"}).json()["filas"][0]
+        self.assertEqual((fila["altura"], fila["combustible"]), ("16.00", "diesel"))
+
+        for params in ({"desde": "x"}, {"altura_min": "alto"}, {"desde": self.fecha(3), "hasta": self.fecha(1)}):
+            self.assertEqual(self.client.get("/maquinarias/disponibles", params).status_code, 400)
+
+    def test_una_consulta_sin_importar_el_historial(self):
+        for i in range(20):
+            self.arriendo(self.camion, self.hoy - timedelta(days=400 - i * 10), self.hoy - timedelta(days=395 - i * 10), "Terminado")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertIn("U045-camion", self.series(desde=self.fecha(1)))
+        consultas = [q["sql"] for q in ctx.captured_queries if "api_maquinaria" in q["sql"]]
+        self.assertEqual(len(consultas), 1)
@@ -0,0 +1,171 @@
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.disponibilidad import detectar_solapes
+from api.models import Arriendo, ArriendoItem, Cliente, Maquinaria, OrdenTrabajo
+
+
+class SolapesTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("u046-staff", password="test", is_staff=True))
+        self.cliente = Cliente.objects.create(razon_social="Cliente U046", rut="46-1")
+        self.hoy = timezone.now().date()
+        self.genie = Maquinaria.objects.create(marca="Genie", serie="U046-1")
+        self.jlg = Maquinaria.objects.create(marca="JLG", serie="U046-2")
+        # Reservada del día 10 al 20 desde hoy.
+        self.reserva = self.arriendo(self.genie, 10, 20)
+
+    def dia(self, n):
+        return self.hoy + timedelta(days=n)
+
+    def arriendo(self, maq, inicio, termino, estado="Activo"):
+        return Arriendo.objects.create(
+            cliente=self.cliente, maquinaria=maq, fecha_inicio=self.dia(inicio),
+            fecha_termino=None if termino is None else self.dia(termino),
+            periodo="Dia", tarifa=Decimal("1"), estado=estado,
+        )
+
+    def detectar(self, *args):
+        out = StringIO()
+        call_command("detectar_solapes", *args, stdout=out)
+        return json.loads(out.getvalue())
+
+    def test_barrido_reporta_todos_los_pares(self):
+        # A=[1,10] llega más lejos, pero B=[2,3] y C=[3,5] también se cruzan.
+        a, b, c = (date(2026, 10, n) for n in (1, 2, 3))
+        ocupaciones = {7: [(a, date(2026, 10, 10), 1), (b, b.replace(day=3), 2), (c, c.replace(day=5), 3)]}
+        self.assertEqual(
+            [solape[1:3] for solape in detectar_solapes(ocupaciones)],
+            [(1, 2), (2, 3), (1, 3)],
+        )
+
+    def test_barrido_reporta_conflictos(self):
+        self.arriendo(self.genie, 0, 5)
+        self.assertEqual(self.detectar()["conflictos"], 0)
+
+        pisa = self.arriendo(self.genie, 18, 35)
+        multi = self.arriendo(None, 30, None)
+        ArriendoItem.objects.create(arriendo=multi, maquinaria=self.genie)
+        ArriendoItem.objects.create(arriendo=multi, maquinaria=self.jlg)
+        sin_fin = self.arriendo(self.jlg, 40, None, estado="Terminado")
+
+        result = self.detectar("--limit", "1")
+        self.assertEqual((result["conflictos"], result["maquinas_con_conflicto"]), (3, 2))
+        self.assertEqual(
+            result["detalle"],
+            [{
+                "maquinaria_id": self.genie.id, "arriendo_a": self.reserva.id, "arriendo_b": pisa.id,
+                "desde": self.dia(18).isoformat(), "hasta": self.dia(20).isoformat(),
+            }],
+        )
+        detalle = self.detectar()["detalle"]
+        self.assertEqual(
+            [(d["arriendo_a"], d["arriendo_b"], d["hasta"]) for d in detalle[1:]],
+            [(pisa.id, multi.id, self.dia(35).isoformat()), (multi.id, sin_fin.id, self.dia(40).isoformat())],
+        )
+        with self.assertRaises(CommandError):
+            self.detectar("--fail-on-conflict")
+
+    def test_api_de_arriendos_rechaza_doble_reserva(self):
+        def post(inicio, termino, maq=self.genie):
+            return self.client.post(
+                "/arriendos",
+                {
+                    "maquinaria": maq.id, "cliente": self.cliente.id,
+                    "fecha_inicio": self.dia(inicio).isoformat(), "fecha_termino": self.dia(termino).isoformat(),
+                    "periodo": "Dia", "tarifa": "1", "estado": "Activo",
+                },
+                format="json",
+            )
+
+        response = post(15, 30)
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertIn(f"#{self.reserva.id}", response.json()["maquinaria"][0])
+        self.assertEqual(post(21, 30).status_code, 201)
+        self.assertEqual(post(15, 30, maq=self.jlg).status_code, 201)
+
+        # Editar el propio arriendo no choca consigo mismo.
+        response = self.client.patch(
+            f"/arriendos/{self.reserva.id}", {"fecha_termino": self.dia(20).isoformat()}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_alta_de_ot_rechaza_maquina_ocupada(self):
+        def alta(serie, inicio, termino):
+            return self.client.post(
+                "/ordenes",
+                {
+                    "tipo": "ALTA", "meta_cliente": "Cliente U046",
+                    "lineas": [{
+                        "serie": serie, "valor": "1000", "unidad": "Dia",
+                        "desde": self.dia(inicio).isoformat(), "hasta": self.dia(termino).isoformat(),
+                    }],
+                },
+                format="json",
+            )
+
+        response = alta("U046-1", 5, 12)
+        self.assertEqual(response.status_code, 409, response.content)
+        self.assertEqual([c["arriendo_id"] for c in response.json()["conflictos"]], [self.reserva.id])
+        self.assertEqual(alta("U046-1", 1, 9).status_code, 201)
+        self.assertEqual(alta("U046-2", 5, 12).status_code, 201)
+
+    def test_edicion_valida_solo_cambios_de_ocupacion_e_items(self):
+        # Solape heredado (creado antes de la validación): otros cambios pasan.
+        pisa = self.arriendo(self.genie, 18, 25)
+        url = f"/arriendos/{pisa.id}"
+        self.assertEqual(self.client.patch(url, {"tarifa": "2"}, format="json").status_code, 200)
+        self.assertEqual(
+            self.client.patch(url, {"fecha_termino": self.dia(26).isoformat()}, format="json").status_code, 400
+        )
+
+        multi = self.arriendo(None, 30, 40)
+        ArriendoItem.objects.create(arriendo=multi, maquinaria=self.jlg)
+        otro = self.arriendo(self.jlg, 50, 60)
+        response = self.client.patch(
+            f"/arriendos/{multi.id}", {"fecha_termino": self.dia(55).isoformat()}, format="json"
+        )
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertIn(f"#{otro.id}", response.json()["maquinaria"][0])
+
+    def test_arriendo_de_servicio_no_ocupa_la_maquina(self):
+        servicio = self.arriendo(self.genie, 15, 16, estado="Terminado")
+        OrdenTrabajo.objects.create(tipo="SERV", cliente=self.cliente, maquinaria=self.genie, arriendo=servicio)
+        self.assertEqual(self.detectar()["conflictos"], 0)
+        disponibles = self.client.get(
+            "/maquinarias/disponibles", {"desde": self.dia(30).isoformat(), "hasta": self.dia(31).isoformat()}
+        ).json()
+        self.assertIn(self.genie.id, [m["id"] for m in disponibles["filas"]])
+
+        # Si además tiene una OT de arriendo, vuelve a contar.
+        OrdenTrabajo.objects.create(tipo="ALTA", cliente=self.cliente, maquinaria=self.genie, arriendo=servicio)
+        self.assertEqual(self.detectar()["conflictos"], 1)
+
+    def test_emision_no_crea_arriendo_en_conflicto(self):
+        ot = OrdenTrabajo.objects.create(
+            tipo="ALTA", cliente=self.cliente, maquinaria=self.genie,
+            detalle_lineas=[{
+                "serie": "U046-1", "desde": self.dia(12).isoformat(), "hasta": self.dia(14).isoformat(),
+            }],
+        )
+        antes = Arriendo.objects.count()
+        response = self.client.post(f"/ordenes/{ot.id}/emitir", {"tipo_documento": "GD"}, format="json")
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertIn(f"#{self.reserva.id}", response.json()["detail"])
+        self.assertEqual(Arriendo.objects.count(), antes)
+
+        lote = self.client.post(
+            "/ordenes/emitir-lote", {"tipo_documento": "GD", "ids": [ot.id], "facturable": True}, format="json"
+        ).json()
+        self.assertEqual((lote["emitidas"], lote["fallidas"]), (0, 1))
+        self.assertEqual(Arriendo.objects.count(), antes)
@@ -0,0 +1,95 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.models import Arriendo, ArriendoItem, Cliente, Documento, Maquinaria, OrdenTrabajo, OrdenTrabajoLinea
+
+
+class HistorialTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("u047-staff", password="test", is_staff=True))
+        self.cliente = Cliente.objects.create(razon_social="Cliente U047", rut="47-1")
+        self.maq = Maquinaria.objects.create(marca="Genie", serie="U047-1")
+        self.otra = Maquinaria.objects.create(marca="JLG", serie="U047-2")
+        self.url = f"/maquinarias/{self.maq.id}/historial"
+
+    def arriendo(self, inicio, maq=None, docs=()):
+        arr = Arriendo.objects.create(
+            cliente=self.cliente, maquinaria=maq, fecha_inicio=inicio,
+            fecha_termino=inicio + timedelta(days=5), periodo="Dia", tarifa=Decimal("1"), estado="Terminado",
+        )
+        for tipo, numero, dias in docs:
+            Documento.objects.create(
+                tipo=tipo, numero=numero, fecha_emision=inicio + timedelta(days=dias), arriendo=arr,
+                monto_total=Decimal("119") if tipo == "FACT" else None,
+            )
+        return arr
+
+    def poblar(self, cantidad):
+        for i in range(cantidad):
+            self.arriendo(
+                date(2025, 1, 1) + timedelta(days=10 * i), maq=self.maq,
+                docs=[("GD", f"{i}1", 0), ("FACT", f"{i}2", 5)],
+            )
+
+    def test_lista_sin_paginar_usa_el_prefetch(self):
+        self.poblar(2)
+        self.arriendo(date(2026, 1, 1), maq=self.maq)
+
+        def consultas():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+            return response.json(), len(ctx.captured_queries)
+
+        body, pocas = consultas()
+        self.assertEqual([f["documento"] for f in body], ["—", "Factura 12", "Factura 02"])
+        self.poblar(6)
+        _, muchas = consultas()
+        self.assertEqual(pocas, muchas)
+
+    def test_linea_de_tiempo_paginada(self):
+        viejo = self.arriendo(date(2025, 3, 1), maq=self.maq, docs=[("GD", "1", 0), ("FACT", "2", 3)])
+        multi = self.arriendo(date(2025, 6, 1), docs=[("GD", "3", 0)])
+        ArriendoItem.objects.create(arriendo=multi, maquinaria=self.maq)
+        self.arriendo(date(2025, 7, 1), maq=self.otra, docs=[("GD", "4", 0)])
+        ot = OrdenTrabajo.objects.create(cliente=self.cliente, tipo="ALTA", arriendo=multi)
+        OrdenTrabajoLinea.objects.create(orden=ot, posicion=0, maquinaria=self.maq, serie="U047-1")
+        hoy = ot.fecha_creacion.date()
+
+        body = self.client.get(self.url, {"page": 1, "page_size": 4}).json()
+        self.assertEqual((body["count"], body["page"], body["page_size"]), (6, 1, 4))
+        self.assertEqual(
+            [(e["tipo"], e["fecha"]) for e in body["results"]],
+            [
+                ("ot", hoy.isoformat()),
+                ("GD", "2025-06-01"),
+                ("arriendo", "2025-06-01"),
+                ("FACT", "2025-03-04"),
+            ],
+        )
+        self.assertEqual(body["results"][3]["monto_total"], "119.00")
+        segunda = self.client.get(self.url, {"page": 2, "page_size": 4}).json()["results"]
+        self.assertEqual(
+            [(e["tipo"], e["id"]) for e in segunda], [("GD", viejo.documentos.get(tipo="GD").id), ("arriendo", viejo.id)]
+        )
+
+        self.assertEqual(self.client.get(self.url, {"page": "x"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"page": 1, "page_size": 1000}).status_code, 400)
+        self.assertEqual(self.client.get("/maquinarias/999999/historial", {"page": 1}).status_code, 404)
+
+    def test_consultas_constantes_por_pagina(self):
+        def consultas(cantidad):
+            self.poblar(cantidad)
+            with CaptureQueriesContext(connection) as ctx:
+                body = self.client.get(self.url, {"page": 1, "page_size": 10}).json()
+            self.assertEqual(len(body["results"]), min(10, body["count"]))
+            return len(ctx.captured_queries)
+
+        self.assertEqual(consultas(2), consultas(20))
@@ -0,0 +1,68 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.models import Arriendo, ArriendoItem, Cliente, Documento, Maquinaria
+
+
+class EstadoPorItemTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("u048-staff", password="test", is_staff=True))
+        self.cliente = Cliente.objects.create(razon_social="Cliente U048", rut="48-1")
+        self.n = 0
+
+    def maq(self):
+        self.n += 1
+        return Maquinaria.objects.create(marca="Genie", serie=f"U048-{self.n}")
+
+    def arriendo(self, maquinaria=None, items=()):
+        arr = Arriendo.objects.create(
+            cliente=self.cliente, maquinaria=maquinaria, fecha_inicio=date(2026, 5, 1),
+            periodo="Dia", tarifa=Decimal("1"), estado="Activo",
+        )
+        for maq in items:
+            ArriendoItem.objects.create(arriendo=arr, maquinaria=maq)
+        Documento.objects.create(tipo="GD", numero=str(arr.id), fecha_emision=date(2026, 5, 1), arriendo=arr)
+        return arr
+
+    def estado(self, path="/ordenes/estado-arriendos", **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_una_fila_por_item_con_respaldo_legacy(self):
+        legacy_maq = self.maq()
+        legacy = self.arriendo(maquinaria=legacy_maq)
+        items = [self.maq() for _ in range(3)]
+        multi = self.arriendo(maquinaria=items[0], items=items)
+        libre = self.maq()
+
+        filas = self.estado()
+        self.assertEqual(
+            [(f["id"], f["item_id"] is not None, f["serie"]) for f in filas],
+            [(legacy.id, False, legacy_maq.serie)] + [(multi.id, True, m.serie) for m in items],
+        )
+        self.assertEqual({f["documento"] for f in filas if f["id"] == multi.id}, {f"G{multi.id}"})
+
+        # La búsqueda encuentra la máquina aunque solo esté en un ítem.
+        self.assertEqual([f["id"] for f in self.estado(query=items[2].serie)], [multi.id] * 3)
+
+        # Las máquinas de los ítems tampoco aparecen en bodega.
+        bodega = {f["serie"] for f in self.estado("/ordenes/estado-bodega")}
+        self.assertEqual(bodega, {libre.serie})
+
+    def test_consultas_no_crecen_con_los_items(self):
+        def consultas(cantidad):
+            arr = self.arriendo(items=[self.maq() for _ in range(cantidad)])
+            with CaptureQueriesContext(connection) as ctx:
+                filas = self.estado()
+            self.assertEqual(sum(1 for f in filas if f["id"] == arr.id), cantidad)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(consultas(1), consultas(8))
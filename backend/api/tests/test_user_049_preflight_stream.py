@@ -0,0 +1,77 @@
+import hashlib
+import json
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.models import Arriendo, Cliente, Documento, Maquinaria, OrdenTrabajo
+
+
+class PreflightStreamTests(TestCase):
+    def setUp(self):
+        cliente = Cliente.objects.create(razon_social="Cliente U049", rut="49-1")
+        known = Maquinaria.objects.create(marca="Genie", serie="KNOWN")
+        other = Maquinaria.objects.create(marca="Genie", serie="OTHER")
+        Maquinaria.objects.create(marca="Genie", serie="other")
+
+        def rental(machine, **extra):
+            return Arriendo.objects.create(
+                maquinaria=machine, cliente=cliente, fecha_inicio=date(2026, 1, 1),
+                periodo="Dia", tarifa=Decimal("1"), **extra,
+            )
+
+        def order(rental=None, machine=None, lines=()):
+            return OrdenTrabajo.objects.create(
+                arriendo=rental, maquinaria=machine, cliente=cliente, tipo="ALTA",
+                detalle_lineas=lines,
+            )
+
+        first = rental(known)
+        rental(known)
+        rental(None, estado="Terminado")
+        order(first, known, [{"serie": "known"}, {"serie": "KNOWN"}, "x", {"serie": "other"}])
+        order(first, other, {"serie": "KNOWN"})
+        order(None, None, [{}, {"serie": 7}, {"serie": " "}, {"serie": "missing"}])
+        Documento.objects.create(tipo="GD", numero="1", fecha_emision=date(2026, 1, 2), arriendo=first)
+
+    def run_preflight(self, *args):
+        out = StringIO()
+        call_command("multi_machine_preflight", *args, stdout=out)
+        return out.getvalue()
+
+    def test_stream_hash_matches_batch_report(self):
+        raw = self.run_preflight().strip()
+        batch = json.loads(raw)
+        self.assertGreater(batch["summary"]["manual_review_findings"], 8)
+
+        # Bloques chicos y spool a disco desde el primer byte.
+        with mock.patch(
+            "api.management.commands.multi_machine_preflight.SPOOL_MAX_BYTES", 0
+        ):
+            lines = self.run_preflight("--stream", "--chunk-size", "1").splitlines()
+        records = [json.loads(line) for line in lines]
+        final = records[-1]
+        self.assertEqual(final["kind"], "summary")
+        self.assertEqual(final["summary"], batch["summary"])
+        self.assertEqual(final["canonical_sha256"], hashlib.sha256(raw.encode()).hexdigest())
+
+        def of(kind):
+            return [{k: v for k, v in r.items() if k != "kind"} for r in records if r["kind"] == kind]
+
+        self.assertEqual(of("deterministic_pair"), batch["deterministic_pairs"])
+        self.assertEqual(of("active_duplicate_machine_group"), batch["active_duplicate_machine_groups"])
+        self.assertEqual(of("protected_document_link"), batch["protected_document_links"])
+        # Los hallazgos salen en orden de generación; el conjunto es el mismo.
+        self.assertCountEqual(of("finding"), batch["manual_review"])
+
+    def test_empty_database(self):
+        OrdenTrabajo.objects.all().delete()
+        Documento.objects.all().delete()
+        Arriendo.objects.all().delete()
+        raw = self.run_preflight().strip()
+        final = json.loads(self.run_preflight("--stream").splitlines()[-1])
+        self.assertEqual(final["canonical_sha256"], hashlib.sha256(raw.encode()).hexdigest())
@@ -0,0 +1,104 @@
+import json
+import os
+import sqlite3
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from api.management.commands.multi_machine_preflight import id_shards
+from api.models import Arriendo, Cliente, Maquinaria, OrdenTrabajo
+
+
+class WorkersData:
+    def setUp(self):
+        cliente = Cliente.objects.create(razon_social="Cliente U050", rut="50-1")
+        known = Maquinaria.objects.create(marca="Genie", serie="U050-A")
+        other = Maquinaria.objects.create(marca="Genie", serie="U050-B")
+        Maquinaria.objects.create(marca="Genie", serie="u050-b")
+        rental = Arriendo.objects.create(
+            maquinaria=known, cliente=cliente, fecha_inicio=date(2026, 1, 1),
+            periodo="Dia", tarifa=Decimal("1"),
+        )
+        lines = [
+            [{"serie": "U050-A"}, {"serie": "u050-a"}],
+            [{"serie": "U050-B"}],
+            [{"serie": "missing"}, {}, "x"],
+            {"serie": "U050-A"},
+        ]
+        for i in range(10):
+            OrdenTrabajo.objects.create(
+                arriendo=rental if i % 2 else None, maquinaria=other if i % 3 else None,
+                cliente=cliente, tipo="ALTA", detalle_lineas=lines[i % len(lines)],
+            )
+
+    def run_command(self, name, *args):
+        out, err = StringIO(), StringIO()
+        call_command(name, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+
+
+class PreflightWorkersTests(WorkersData, TestCase):
+    def test_id_shards(self):
+        self.assertEqual(id_shards(1, 10, 3), [(1, 4), (5, 8), (9, 10)])
+        self.assertEqual(id_shards(5, 6, 8), [(5, 5), (6, 6)])
+        self.assertEqual(id_shards(7, 7, 4), [(7, 7)])
+
+    def test_workers_produce_identical_output(self):
+        serial, _ = self.run_command("multi_machine_preflight")
+        self.assertGreater(json.loads(serial)["summary"]["manual_review_findings"], 5)
+        # La base de pruebas está en memoria y dentro de una transacción:
+        # los rangos se revisan en este proceso y se avisa por stderr.
+        parallel, err = self.run_command("multi_machine_preflight", "--workers", "3")
+        self.assertEqual(parallel, serial)
+        self.assertIn("--workers", err)
+
+        stream_serial, _ = self.run_command("multi_machine_preflight", "--stream", "--chunk-size", "2")
+        stream_parallel, _ = self.run_command(
+            "multi_machine_preflight", "--stream", "--chunk-size", "2", "--workers", "4"
+        )
+        self.assertEqual(
+            json.loads(stream_parallel.splitlines()[-1]), json.loads(stream_serial.splitlines()[-1])
+        )
+
+        classified, _ = self.run_command("classify_multi_machine_cases")
+        classified_parallel, err = self.run_command("classify_multi_machine_cases", "--workers", "2")
+        self.assertEqual(classified_parallel, classified)
+        self.assertIn("--workers", err)
+
+    def test_workers_must_be_positive(self):
+        with self.assertRaises(CommandError):
+            self.run_command("multi_machine_preflight", "--workers", "0")
+
+
+class PreflightProcessPoolTests(WorkersData, TransactionTestCase):
+    """El pool real: los procesos leen una copia en archivo de la base de pruebas."""
+
+    def test_pool_matches_serial(self):
+        handle, path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        connection.connection.backup(target)
+        target.close()
+
+        serial, _ = self.run_command("multi_machine_preflight")
+        stream_serial, _ = self.run_command("multi_machine_preflight", "--stream", "--chunk-size", "3")
+        # El padre sigue con su conexión abierta (mismos datos); los procesos
+        # reciben el NAME del archivo.
+        with mock.patch.dict(connection.settings_dict, {"NAME": path}):
+            parallel, err = self.run_command("multi_machine_preflight", "--workers", "2")
+            stream_parallel, _ = self.run_command(
+                "multi_machine_preflight", "--stream", "--chunk-size", "3", "--workers", "2"
+            )
+        self.assertEqual(err, "")
+        self.assertEqual(parallel, serial)
+        self.assertEqual(stream_parallel.splitlines()[-1], stream_serial.splitlines()[-1])
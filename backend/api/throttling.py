@@ -0,0 +1,90 @@
+# backend/api/throttling.py
+"""
+Throttle de fuerza bruta para ``/auth/login``.
+
+Token bucket guardado en el caché de Django (``default``), con dos cubetas:
+una por IP y otra por IP + usuario. Se evalúa en ``initial()`` de DRF, antes
+de consultar la base o calcular el hash de la clave, así una ráfaga de
+credential stuffing no satura la CPU ni el lock de escritura de SQLite.
+
+Leer, descontar y guardar las cubetas no es atómico, así que se hace bajo un
+lock por IP tomado con ``cache.add`` (las dos cubetas son de esa IP): dos
+solicitudes simultáneas no gastan la misma ficha. Si el lock no se obtiene a
+tiempo la solicitud se rechaza. Con varios workers el caché debe ser
+compartido (ver ``CACHES`` en settings).
+"""
+
+import hashlib
+from time import sleep, time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics
+
+
+def _bucket_settings(name, capacity, per_minute):
+    return (
+        getattr(settings, f"LOGIN_THROTTLE_{name}_BURST", capacity),
+        getattr(settings, f"LOGIN_THROTTLE_{name}_PER_MINUTE", per_minute),
+    )
+
+
+# Lock de las cubetas: vence solo si el proceso que lo tiene muere.
+LOCK_SECONDS = 2
+LOCK_ATTEMPTS = 20
+LOCK_RETRY_SECONDS = 0.005
+
+
+def _acquire(lock_key):
+    for _ in range(LOCK_ATTEMPTS):
+        if cache.add(lock_key, 1, timeout=LOCK_SECONDS):
+            return True
+        sleep(LOCK_RETRY_SECONDS)
+    return False
+
+
+class LoginBruteForceThrottle(BaseThrottle):
+    cache_prefix = "login:bucket"
+
+    def allow_request(self, request, view):
+        ident = self.get_ident(request)
+        lock_key = f"{self.cache_prefix}:lock:{ident}"
+        if not _acquire(lock_key):
+            metrics.incr("login.throttled.lock")
+            self._wait = 1
+            return False
+        try:
+            return self._spend(request, ident)
+        finally:
+            cache.delete(lock_key)
+
+    def _spend(self, request, ident):
+        username = (request.data.get("username") or "").strip().lower()
+        user_key = hashlib.sha1(f"{ident}|{username}".encode("utf-8")).hexdigest()
+        buckets = (
+            ("ip", f"{self.cache_prefix}:ip:{ident}", *_bucket_settings("IP", 30, 30)),
+            ("user", f"{self.cache_prefix}:user:{user_key}", *_bucket_settings("USER", 10, 5)),
+        )
+
+        now = time()
+        self._wait = None
+        states = []
+        for name, key, capacity, per_minute in buckets:
+            tokens, stamp = cache.get(key) or (float(capacity), now)
+            tokens = min(float(capacity), tokens + (now - stamp) * per_minute / 60.0)
+            if tokens < 1:
+                metrics.incr(f"login.throttled.{name}")
+                self._wait = (1 - tokens) * 60.0 / per_minute if per_minute else None
+                return False
+            states.append((key, tokens, capacity, per_minute))
+
+        for key, tokens, capacity, per_minute in states:
+            # Expira cuando la cubeta ya se habría rellenado por completo.
+            timeout = int(capacity * 60 / per_minute) + 1 if per_minute else None
+            cache.set(key, (tokens - 1, now), timeout=timeout)
+        return True
+
+    def wait(self):
+        return self._wait
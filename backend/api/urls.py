@@ -6,8 +6,9 @@ from .views import (
     DocumentoViewSet,           # ← consulta de documentos
     OrdenTrabajoViewSet,        # ← estado de arriendos/servicios
     UserViewSet,
-    register, login, recover_start,
+    register, login, recover_start, metricas, reporte_ingresos,
 )
+from . import async_views
 
 router = SimpleRouter(trailing_slash="")
 router.register(r"maquinarias", MaquinariaViewSet, basename="maquinarias")
@@ -26,6 +27,17 @@ urlpatterns = [
     path("auth/register", register),
     path("auth/login",    login),
     path("auth/recover",  recover_start),
+    path("metricas",      metricas),
+    path("reportes/ingresos", reporte_ingresos),
+
+    # Lecturas async (ASGI) para polling del dashboard
+    path("async/ordenes/estado-arriendos", async_views.estado_arriendos),
+    path("async/ordenes/estado-bodega",    async_views.estado_bodega),
+    path("async/maquinarias",              async_views.maquinarias_list),
+    path("async/clientes",                 async_views.clientes_list),
+    # Stream SSE de cambios de flota
+    path("eventos/flota",                  async_views.eventos_flota),
+
     path("", include(router.urls)),
 ]
 
@@ -0,0 +1,221 @@
+# backend/api/utilizacion.py
+"""
+Utilización de la flota (``GET /maquinarias/utilizacion``).
+
+Cada día de cada máquina cae en una sola categoría:
+
+- ``en_transito``: ese día se emitió una GD de un arriendo suyo (entrega,
+  traslado o retiro).
+- ``arrendada``: el día está dentro de un arriendo. Las máquinas salen de
+  ``ArriendoItem`` o, en arriendos antiguos, de ``Arriendo.maquinaria``. Un
+  arriendo ``Activo`` cuenta hasta hoy, tenga o no término: los días que aún
+  no pasan no son utilización, aunque el rango pedido los incluya.
+- ``disponible``: el resto.
+
+Los intervalos se leen en una sola consulta (LEFT JOIN con los ítems), se
+ordenan y funden por máquina, y se cuentan con sumas de intervalos y
+arreglos de diferencias: nunca se recorre máquina × día.
+``UtilizacionDiaria`` guarda los conteos de días cerrados por categoría
+(``rebuild_utilizacion``) para que un rango de varios años sea una suma.
+"""
+
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from .models import Arriendo, Documento, Maquinaria, UtilizacionDiaria
+
+MAQUINA_VALUES = ("id", "serie", "marca", "modelo", "categoria")
+
+
+def _fundir(intervalos):
+    """Ordena y une intervalos ``(inicio, fin)`` inclusivos que se tocan."""
+    fundidos = []
+    for inicio, fin in sorted(intervalos):
+        if fundidos and inicio <= fundidos[-1][1] + timedelta(days=1):
+            if fin > fundidos[-1][1]:
+                fundidos[-1][1] = fin
+        else:
+            fundidos.append([inicio, fin])
+    return [(inicio, fin) for inicio, fin in fundidos]
+
+
+def cargar_intervalos(desde, hasta, hoy=None):
+    """``{maquinaria_id: [(inicio, fin), ...]}`` fundidos y recortados a ``[desde, hasta]``."""
+    hoy = hoy or timezone.now().date()
+    filas = (
+        Arriendo.objects.filter(fecha_inicio__lte=hasta)
+        .filter(
+            Q(estado__iexact="Activo")
+            | Q(fecha_termino__gte=desde)
+            | Q(fecha_termino__isnull=True, fecha_inicio__gte=desde)
+        )
+        .values_list("maquinaria_id", "items__maquinaria_id", "fecha_inicio", "fecha_termino", "estado")
+    )
+    por_maquina = defaultdict(list)
+    for maq_id, item_maq_id, inicio, termino, estado in filas:
+        maq_id = item_maq_id or maq_id
+        if not maq_id:
+            continue
+        if estado.lower() == "activo":
+            fin = hoy
+        else:
+            fin = termino or inicio
+        inicio, fin = max(inicio, desde), min(fin, hasta)
+        if inicio <= fin:
+            por_maquina[maq_id].append((inicio, fin))
+    return {maq_id: _fundir(intervalos) for maq_id, intervalos in por_maquina.items()}
+
+
+def cargar_transito(desde, hasta):
+    """``{maquinaria_id: [fechas]}`` con GD emitidas en el rango."""
+    filas = (
+        Documento.objects.filter(tipo="GD", fecha_emision__range=(desde, hasta))
+        .values_list("arriendo__maquinaria_id", "arriendo__items__maquinaria_id", "fecha_emision")
+    )
+    por_maquina = defaultdict(set)
+    for maq_id, item_maq_id, fecha in filas:
+        maq_id = item_maq_id or maq_id
+        if maq_id:
+            por_maquina[maq_id].add(fecha)
+    return {maq_id: sorted(fechas) for maq_id, fechas in por_maquina.items()}
+
+
+def _dentro(intervalos, fecha):
+    i = bisect_right(intervalos, fecha, key=lambda intervalo: intervalo[0]) - 1
+    return i >= 0 and fecha <= intervalos[i][1]
+
+
+def _fila(dias, arrendada, en_transito):
+    return {
+        "dias": dias,
+        "arrendada": arrendada,
+        "en_transito": en_transito,
+        "disponible": dias - arrendada - en_transito,
+        "utilizacion": round(arrendada / dias, 4) if dias else 0.0,
+    }
+
+
+def utilizacion_por_maquina(desde, hasta, maquinas=None, hoy=None):
+    """Una fila por máquina con días arrendada / en tránsito / disponible."""
+    dias = (hasta - desde).days + 1
+    intervalos = cargar_intervalos(desde, hasta, hoy)
+    transito = cargar_transito(desde, hasta)
+    maquinas = Maquinaria.objects.all() if maquinas is None else maquinas
+
+    filas = []
+    for maq in maquinas.order_by("id").values(*MAQUINA_VALUES):
+        propios = intervalos.get(maq["id"], [])
+        fechas = transito.get(maq["id"], [])
+        en_arriendo = sum((fin - inicio).days + 1 for inicio, fin in propios)
+        solapadas = sum(1 for fecha in fechas if _dentro(propios, fecha))
+        filas.append({**maq, **_fila(dias, en_arriendo - solapadas, len(fechas))})
+    return filas
+
+
+def conteos_diarios(desde, hasta, hoy=None):
+    """
+    ``{(fecha, categoria): (maquinas, arrendadas, en_transito)}`` para cada día
+    del rango, con arreglos de diferencias por categoría.
+    """
+    dias = (hasta - desde).days + 1
+    categorias = dict(Maquinaria.objects.values_list("id", "categoria"))
+    flota = defaultdict(int)
+    for categoria in categorias.values():
+        flota[categoria] += 1
+
+    intervalos = cargar_intervalos(desde, hasta, hoy)
+    transito = cargar_transito(desde, hasta)
+    delta = {categoria: [0] * (dias + 1) for categoria in flota}
+    en_transito = {categoria: [0] * dias for categoria in flota}
+    for maq_id, propios in intervalos.items():
+        categoria = categorias.get(maq_id)
+        if categoria is None:
+            continue
+        for inicio, fin in propios:
+            delta[categoria][(inicio - desde).days] += 1
+            delta[categoria][(fin - desde).days + 1] -= 1
+    for maq_id, fechas in transito.items():
+        categoria = categorias.get(maq_id)
+        if categoria is None:
+            continue
+        propios = intervalos.get(maq_id, [])
+        for fecha in fechas:
+            i = (fecha - desde).days
+            en_transito[categoria][i] += 1
+            if _dentro(propios, fecha):
+                # El día cuenta como tránsito, no como arrendado.
+                delta[categoria][i] -= 1
+                delta[categoria][i + 1] += 1
+
+    conteos = {}
+    for categoria, total in flota.items():
+        arrendadas = 0
+        for i in range(dias):
+            arrendadas += delta[categoria][i]
+            fecha = desde + timedelta(days=i)
+            conteos[(fecha, categoria)] = (total, arrendadas, en_transito[categoria][i])
+    return conteos
+
+
+def _acumular(acumulado, categoria, maquina_dias, arrendada, en_transito):
+    fila = acumulado.setdefault(
+        categoria, {"maquina_dias": 0, "arrendada": 0, "en_transito": 0}
+    )
+    fila["maquina_dias"] += maquina_dias
+    fila["arrendada"] += arrendada
+    fila["en_transito"] += en_transito
+
+
+def _rollup_hasta(desde, hasta):
+    """Último día hasta el que ``UtilizacionDiaria`` cubre ``[desde, ...]`` sin huecos, o None."""
+    ultimo = min(hasta, timezone.now().date() - timedelta(days=1))
+    if ultimo < desde:
+        return None
+    resumen = UtilizacionDiaria.objects.filter(fecha__range=(desde, ultimo)).aggregate(
+        ultima=Max("fecha"), dias=Count("fecha", distinct=True)
+    )
+    if resumen["ultima"] is None:
+        return None
+    ultimo = resumen["ultima"]
+    if resumen["dias"] == (ultimo - desde).days + 1:
+        return ultimo
+    return None
+
+
+def utilizacion_por_categoria(desde, hasta, usar_rollup=True, hoy=None):
+    """
+    Una fila por categoría. Los días cerrados cubiertos por el resumen diario
+    se suman desde ``UtilizacionDiaria``; el resto se calcula en vivo.
+    Devuelve ``(filas, fuente)``.
+    """
+    acumulado = {}
+    inicio_vivo = desde
+    fuente = "vivo"
+    cubierto = _rollup_hasta(desde, hasta) if usar_rollup else None
+    if cubierto is not None:
+        sumas = (
+            UtilizacionDiaria.objects.filter(fecha__range=(desde, cubierto))
+            .values("categoria")
+            .annotate(m=Sum("maquinas"), a=Sum("arrendadas"), t=Sum("en_transito"))
+        )
+        for fila in sumas:
+            _acumular(acumulado, fila["categoria"], fila["m"], fila["a"], fila["t"])
+        inicio_vivo = cubierto + timedelta(days=1)
+        fuente = "resumen" if cubierto == hasta else "mixto"
+
+    if inicio_vivo <= hasta:
+        for fila in utilizacion_por_maquina(inicio_vivo, hasta, hoy=hoy):
+            _acumular(acumulado, fila["categoria"], fila["dias"], fila["arrendada"], fila["en_transito"])
+
+    filas = []
+    for categoria in sorted(acumulado):
+        valores = acumulado[categoria]
+        dias = valores["maquina_dias"]
+        fila = _fila(dias, valores["arrendada"], valores["en_transito"])
+        fila.pop("dias")
+        filas.append({"categoria": categoria, "maquina_dias": dias, **fila})
+    return filas, fuente
@@ -1,17 +1,19 @@
 # backend/api/views.py
-from django.db import IntegrityError, transaction
-from django.db.models import Q, Case, When, IntegerField, F, Value, Exists, OuterRef
-from django.db.models.functions import Replace
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import Q, Case, When, IntegerField, BooleanField, F, Value, Prefetch, Exists, OuterRef
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower, Replace
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from django.utils import timezone
 
 from rest_framework import viewsets, status
-from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.decorators import api_view, permission_classes, action, throttle_classes
 from rest_framework.exceptions import MethodNotAllowed
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, SAFE_METHODS
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.settings import api_settings
 
 from decimal import Decimal
 import re
@@ -19,7 +21,7 @@ from datetime import date as _date, datetime as _dt
 
 from .models import (
     Maquinaria, Cliente, Obra, Arriendo,
-    Documento, OrdenTrabajo, UserSecurity, DOC_TIPO
+    Documento, FolioDocumento, OrdenTrabajo, OrdenTrabajoLinea, UserSecurity, DOC_TIPO
 )
 from .serializers import (
     MaquinariaSerializer, ClienteSerializer, ObraSerializer,
@@ -33,16 +35,89 @@ from .permissions import (
     IsStaffOrSuperUser,
     IsSuperUserOnly,
 )
+from .authentication import (
+    LOGIN_LOCKED,
+    LOGIN_UNKNOWN,
+    AuthzRefreshToken,
+    add_pending_failure,
+    clear_pending_failures,
+    get_login_state,
+    pending_failures,
+    set_login_state,
+    take_pending_failures,
+)
+from . import metrics
+from .db_routers import enable_replica_reads, is_primary_sticky, mark_primary_sticky, replica_reads
+from .disponibilidad import (
+    MAQUINA_VALUES as DISPONIBLE_VALUES,
+    conflictos_maquinas,
+    fin_ocupacion,
+    maquinas_disponibles,
+)
+from .estado import (
+    CLIENTE_EMPRESA,
+    estado_arriendos_rows,
+    estado_bodega_rows,
+)
+from .events import publish_fleet_change
+from .historial import (
+    MAX_PAGE_SIZE as HISTORIAL_MAX_PAGE_SIZE,
+    PAGE_SIZE as HISTORIAL_PAGE_SIZE,
+    pagina as historial_pagina,
+)
+from .idempotency import idempotent
+from .ingresos import GRUPOS as GRUPOS_INGRESO, consultar as consultar_ingresos, registrar_documentos
+from .lean_serializers import documento_rows, enrich_ot_row, lean_enabled, ot_list_rows
+from .ot_lineas import build_lineas, sync_lineas
+from .renderers import ColumnarJSONRenderer
+from .sparse import Expansion, SparseFieldsMixin
+from .throttling import LoginBruteForceThrottle
+from .utilizacion import utilizacion_por_categoria, utilizacion_por_maquina
 
 MAX_FAILED = 5
 
+# Acciones de solo lectura que pueden atenderse desde la réplica.
+REPLICA_READ_ACTIONS = frozenset({
+    "list",
+    "retrieve",
+    "historial",
+    "utilizacion",
+    "disponibles",
+    "estado_arriendos",
+    "estado_bodega",
+})
+
+
+class ReplicaReadMixin:
+    """
+    Atiende las acciones seguras de lectura desde la réplica. Tras una
+    escritura exitosa el usuario queda fijado al primario por
+    ``REPLICA_STICKY_SECONDS`` para que lea lo que acaba de escribir.
+    """
+
+    replica_read_actions = REPLICA_READ_ACTIONS
 
-def _active_rentals():
-    """Legacy operational source for machinery that remains out on rent."""
-    return Arriendo.objects.filter(estado__iexact="Activo")
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads(False):
+            return super().dispatch(request, *args, **kwargs)
 
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method in SAFE_METHODS
+            and self.action in self.replica_read_actions
+            and not is_primary_sticky(request.user)
+        ):
+            enable_replica_reads()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            mark_primary_sticky(getattr(request, "user", None))
+        return response
 
-class CriticalEntityViewSet(viewsets.ModelViewSet):
+
+class CriticalEntityViewSet(SparseFieldsMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """Base de contención: lectura autenticada, escritura interna y sin borrado."""
 
     permission_classes = [IsAuthenticatedReadStaffWrite]
@@ -50,13 +125,6 @@ class CriticalEntityViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         raise MethodNotAllowed(request.method)
 
-# Cliente “empresa” (usado en Bodega y OT RETI)
-CLIENTE_EMPRESA = {
-    "rut": "16.357.179-K",
-    "razon_social": "Franz Heim SPA",
-    "direccion": "Bodega 4061, Macul",
-}
-
 
 def _get_or_create_sec(u: User) -> UserSecurity:
     sec, _ = UserSecurity.objects.get_or_create(user=u)
@@ -83,6 +151,25 @@ def _next_doc_number(tipo: str) -> str:
     return f"{n:04d}"
 
 
+def _next_doc_numbers(tipo: str, cantidad: int) -> list:
+    """
+    Reserva un bloque contiguo de ``cantidad`` números a continuación del
+    último emitido. Debe correr en la transacción que crea los documentos: la
+    fila ``FolioDocumento`` del tipo queda bloqueada hasta el commit, así que
+    otra emisión espera y sigue desde el bloque reservado aquí.
+    """
+    FolioDocumento.objects.get_or_create(tipo=tipo)
+    if connection.vendor == "sqlite":
+        # SQLite ignora select_for_update: el UPDATE toma el lock de escritura.
+        FolioDocumento.objects.filter(tipo=tipo).update(ultimo=F("ultimo"))
+    folio = FolioDocumento.objects.select_for_update().get(tipo=tipo)
+    # Documentos creados por fuera (admin, datos antiguos) también cuentan.
+    primero = max(folio.ultimo + 1, int(_next_doc_number(tipo)))
+    folio.ultimo = primero + cantidad - 1
+    folio.save(update_fields=["ultimo"])
+    return [f"{n:04d}" for n in range(primero, primero + cantidad)]
+
+
 def _parse_date(val):
     if not val:
         return None
@@ -144,7 +231,7 @@ def _infer_maquinaria_from_ot(ot: OrdenTrabajo):
     for l in det:
         s = (l.get("serie") or "").strip()
         if s:
-            return Maquinaria.objects.filter(serie__iexact=s).first()
+            return Maquinaria.objects.filter(serie__iexact=s).order_by("id").first()
     return None
 
 
@@ -169,14 +256,11 @@ def _infer_periodo_from_ot(ot: OrdenTrabajo):
     return u
 
 
-def _ensure_arriendo_for_ot(ot: OrdenTrabajo):
+def _arriendo_para_ot(ot: OrdenTrabajo):
     """
-    Si una OT de arriendo/traslado no tiene arriendo asociado,
-    crea uno “mínimo” para habilitar emisión de GD/FACT.
+    Arriendo “mínimo” (sin guardar) para una OT de arriendo/traslado sin
+    arriendo asociado, que habilita emitir GD/FACT. None si no hay cliente.
     """
-    if ot.arriendo_id:
-        return ot.arriendo
-
     cliente = ot.cliente
     if not cliente:
         return None
@@ -191,7 +275,7 @@ def _ensure_arriendo_for_ot(ot: OrdenTrabajo):
 
     tarifa = ot.monto_neto or Decimal("0")
 
-    arr = Arriendo.objects.create(
+    return Arriendo(
         cliente=cliente,
         maquinaria=maq,
         obra=obra_obj,
@@ -202,66 +286,306 @@ def _ensure_arriendo_for_ot(ot: OrdenTrabajo):
         estado="Activo",
     )
 
-    ot.arriendo = arr
-    ot.save(update_fields=["arriendo"])
-    return arr
+
+def _ocupacion_para_ot(ot: OrdenTrabajo):
+    """``(máquinas, desde, fin)`` que ocuparía el arriendo creado para una OT ALTA."""
+    maq = _infer_maquinaria_from_ot(ot)
+    maquinas = {maq and maq.id, *ot.lineas.exclude(maquinaria=None).values_list("maquinaria_id", flat=True)}
+    maquinas.discard(None)
+    desde, hasta = _infer_fechas_from_ot(ot)
+    return maquinas, desde, fin_ocupacion("Activo", desde, hasta, timezone.now().date())
+
+
+def _conflictos_para_ot(ot: OrdenTrabajo, reservas=None):
+    """
+    Arriendos que ya ocupan las máquinas de una OT ALTA sin arriendo en las
+    fechas del arriendo que ``_arriendo_para_ot`` crearía para ella.
+
+    ``reservas`` (``{ot_id: ocupación}``) trae los arriendos que el mismo lote
+    ya decidió crear y aún no están en la base; un choque con ellos se
+    devuelve como ``{"ot_id": ...}``. Sin conflictos, la ocupación de ``ot``
+    se agrega a ``reservas``.
+    """
+    if ot.tipo != "ALTA" or ot.arriendo_id:
+        return []
+    maquinas, desde, fin = _ocupacion_para_ot(ot)
+    hoy = timezone.now().date()
+    conflictos = conflictos_maquinas(maquinas, desde, fin, hoy=hoy)
+    if reservas is None:
+        return conflictos
+    conflictos += [
+        {"ot_id": ot_id}
+        for ot_id, (otras, otro_desde, otro_fin) in reservas.items()
+        if maquinas & otras and desde <= otro_fin and otro_desde <= fin
+    ]
+    if not conflictos:
+        reservas[ot.id] = (maquinas, desde, fin)
+    return conflictos
+
+
+def _arriendo_para_serv(ot: OrdenTrabajo):
+    """Arriendo “Terminado” (sin guardar) contra el que se factura una OT de servicio."""
+    fecha_desde, fecha_hasta = _infer_fechas_from_ot(ot)
+    return Arriendo(
+        cliente=ot.cliente,
+        maquinaria=_infer_maquinaria_from_ot(ot),
+        obra=None,
+        fecha_inicio=fecha_desde,
+        fecha_termino=fecha_hasta,
+        periodo="Dia",
+        tarifa=ot.monto_neto or Decimal("0"),
+        estado="Terminado",
+    )
+
+
+def _guardar_arriendos_nuevos(ots):
+    """
+    Guarda de una vez los arriendos que ``_preparar_emision`` dejó sin
+    guardar en ``ots`` y los enlaza a sus OT (un INSERT y un UPDATE por lote).
+    """
+    nuevas = [ot for ot in ots if ot.arriendo_id is None and ot.arriendo is not None]
+    if not nuevas:
+        return
+    Arriendo.objects.bulk_create([ot.arriendo for ot in nuevas])
+    for ot in nuevas:
+        # Reasignar copia el id nuevo a arriendo_id sin perder el caché.
+        ot.arriendo = ot.arriendo
+    OrdenTrabajo.objects.bulk_update(nuevas, ["arriendo"])
+
+
+def _bloquear_ots(ids):
+    """
+    Lock de escritura sobre las OT ``ids`` antes de leerlas para emitir.
+
+    En PostgreSQL es ``select_for_update``. SQLite lo ignora, así que ahí se
+    toma el lock de escritura de la base con un ``UPDATE`` que no cambia nada:
+    una emisión concurrente espera (``timeout`` de SQLite) a que la primera
+    confirme y recién entonces lee la guía/factura que dejó.
+    """
+    if connection.vendor == "sqlite":
+        OrdenTrabajo.objects.filter(id__in=ids).update(id=F("id"))
+    else:
+        list(OrdenTrabajo.objects.select_for_update().filter(id__in=ids).values_list("id", flat=True))
+
+
+# Campos de OrdenTrabajo que cambia una emisión.
+EMISION_OT_FIELDS = {
+    "FACT": ["factura", "estado", "es_facturable", "fecha_cierre"],
+    "GD": ["guia", "es_facturable", "estado", "fecha_cierre"],
+}
+
+
+def _preparar_emision(ot: OrdenTrabajo, tipo_doc: str, reservas=None):
+    """
+    Valida que ``ot`` pueda emitir ``tipo_doc`` y deja en ``ot.arriendo`` (sin
+    guardar) el arriendo que falte; ``_guardar_arriendos_nuevos`` los guarda.
+    ``reservas`` es la de ``_conflictos_para_ot`` para un lote.
+    Devuelve el motivo del rechazo, o None si se puede emitir.
+    """
+    if tipo_doc == "FACT":
+        if ot.factura_id:
+            return "La orden ya tiene una factura asociada."
+        if not ot.cliente_id:
+            return "La orden no tiene cliente asociado."
+        if ot.tipo == "SERV":
+            if not ot.arriendo_id:
+                ot.arriendo = _arriendo_para_serv(ot)
+        elif not ot.arriendo_id:
+            return "La orden no tiene arriendo asociado; no se puede facturar todavía."
+        return None
+
+    if ot.guia_id:
+        return "La orden ya tiene una guía asociada."
+    # ✅ si falta arriendo en ALTA/PROL/TRAS lo creamos (para que nunca falle emitir GD)
+    if not ot.arriendo_id:
+        if ot.tipo not in ("ALTA", "PROL", "TRAS"):
+            return "La orden no tiene arriendo asociado; no se puede emitir una guía todavía."
+        # El arriendo creado al vuelo tampoco puede reservar dos veces una máquina.
+        conflictos = _conflictos_para_ot(ot, reservas)
+        arriendos = [f"#{c['arriendo_id']}" for c in conflictos if "arriendo_id" in c]
+        if arriendos:
+            return f"Hay máquinas ya arrendadas en esas fechas (arriendo {', '.join(arriendos)})."
+        if conflictos:
+            ots = ", ".join(f"#{c['ot_id']}" for c in conflictos)
+            return f"Hay máquinas reservadas en esas fechas por otra orden del lote (OT {ots})."
+        ot.arriendo = _arriendo_para_ot(ot)
+        if ot.arriendo is None:
+            return "No se pudo crear arriendo asociado automáticamente."
+    if not (ot.cliente_id or ot.arriendo.cliente_id):
+        return "La orden no tiene cliente asociado."
+    return None
+
+
+def _documento_emision(ot: OrdenTrabajo, tipo_doc: str, numero: str, facturable=False):
+    """``Documento`` sin guardar que emite ``ot`` (la OT ya debe tener arriendo)."""
+    arr = ot.arriendo
+    obra_id = arr.obra_id if arr else None
+    fecha_emision = ot.fecha_emision_doc or timezone.now().date()
+
+    if tipo_doc == "FACT":
+        return Documento(
+            tipo="FACT",
+            numero=numero,
+            fecha_emision=fecha_emision,
+            monto_neto=ot.monto_neto or 0,
+            monto_iva=ot.monto_iva or 0,
+            monto_total=ot.monto_total or 0,
+            arriendo=arr,
+            cliente_id=ot.cliente_id,
+            obra_destino_id=obra_id,
+            relacionado_con_id=ot.guia_id,
+        )
+
+    con_montos = facturable is True
+    if ot.tipo in ("ALTA", "TRAS"):
+        obra_origen_id, obra_destino_id = None, obra_id
+    else:
+        obra_origen_id, obra_destino_id = obra_id, None
+    return Documento(
+        tipo="GD",
+        numero=numero,
+        fecha_emision=fecha_emision,
+        monto_neto=(ot.monto_neto or Decimal("0")) if con_montos else Decimal("0"),
+        monto_iva=(ot.monto_iva or Decimal("0")) if con_montos else Decimal("0"),
+        monto_total=(ot.monto_total or Decimal("0")) if con_montos else Decimal("0"),
+        arriendo=arr,
+        cliente_id=ot.cliente_id or (arr.cliente_id if arr else None),
+        obra_origen_id=obra_origen_id,
+        obra_destino_id=obra_destino_id,
+        es_retiro=(ot.tipo == "RETI"),
+    )
+
+
+def _aplicar_emision(ot: OrdenTrabajo, doc: Documento, facturable=False):
+    """
+    Deja en ``ot`` (sin guardar) el efecto de emitir ``doc``.
+
+    En un retiro también cierra el arriendo y libera la máquina en memoria;
+    devuelve ese arriendo para que quien llama lo guarde, o None.
+    """
+    if doc.tipo == "FACT":
+        ot.factura = doc
+        ot.estado = "PROC"
+        ot.es_facturable = False
+        ot.fecha_cierre = timezone.now()
+        return None
+
+    ot.guia = doc
+    if ot.tipo == "RETI":
+        ot.es_facturable = False
+        ot.estado = "PROC"
+        ot.fecha_cierre = timezone.now()
+
+        arr = ot.arriendo
+        arr.estado = "Terminado"
+        arr.fecha_termino = doc.fecha_emision
+        if arr.maquinaria_id:
+            arr.maquinaria.estado = "Disponible"
+        return arr
+
+    ot.es_facturable = facturable is True
+    ot.estado = "PEND" if facturable is True else "PROC"
+    return None
 
 
 # =======================
 #   Maquinarias
 # =======================
+def search_maquinarias(qs, q, activos=True):
+    """Búsqueda del listado de maquinarias (serie exacta primero)."""
+    if activos:
+        qs = qs.prefetch_related(
+            Prefetch(
+                "arriendos",
+                queryset=(
+                    Arriendo.objects.filter(estado="Activo")
+                    .select_related("obra")
+                    .order_by("-fecha_inicio")
+                ),
+                to_attr="arriendos_activos",
+            )
+        )
+    if q:
+        qs = (
+            qs.filter(
+                Q(serie__iexact=q)
+                | Q(marca__icontains=q)
+                | Q(modelo__icontains=q)
+            )
+            .annotate(
+                serie_match=Case(
+                    When(serie__iexact=q, then=1),
+                    default=0,
+                    output_field=IntegerField(),
+                )
+            )
+            .order_by("-serie_match", "marca", "modelo")
+        )
+    return qs
+
+
 class MaquinariaViewSet(CriticalEntityViewSet):
     queryset = Maquinaria.objects.all()
     serializer_class = MaquinariaSerializer
+    # ``obra`` sale de los arriendos activos precargados, no de una columna.
+    sparse_sources = {"obra": ()}
 
     def list(self, request, *args, **kwargs):
         q = (request.GET.get("query") or "").strip()
-        qs = self.get_queryset()
-        if q:
-            qs = (
-                qs.filter(
-                    Q(serie__iexact=q)
-                    | Q(marca__icontains=q)
-                    | Q(modelo__icontains=q)
-                )
-                .annotate(
-                    serie_match=Case(
-                        When(serie__iexact=q, then=1),
-                        default=0,
-                        output_field=IntegerField(),
-                    )
-                )
-                .order_by("-serie_match", "marca", "modelo")
-            )
-
+        activos = self.sparse is None or self.sparse.wants("obra")
+        qs = search_maquinarias(self.get_queryset(), q, activos=activos)
         serializer = self.get_serializer(qs, many=True)
         return Response(serializer.data)
 
+    def perform_update(self, serializer):
+        estado_anterior = serializer.instance.estado
+        maq = serializer.save()
+        if maq.estado != estado_anterior:
+            publish_fleet_change("maquinaria.estado", maquinaria_ids=[maq.id])
+
     @action(
         detail=True,
         methods=["get"],
         permission_classes=[IsStaffOrSuperUser],
     )
     def historial(self, request, pk=None):
-        try:
-            maq = Maquinaria.objects.get(pk=pk)
-        except Maquinaria.DoesNotExist:
+        """
+        Sin ``page``: lista de arriendos de la máquina con su último documento.
+        Con ``page`` (y ``page_size``): línea de tiempo paginada de arriendos,
+        OT, GD y FACT (ver ``historial.pagina``).
+        """
+        if not Maquinaria.objects.filter(pk=pk).exists():
             return Response({"detail": "Maquinaria no encontrada"}, status=404)
 
+        if "page" in request.GET:
+            try:
+                page = int(request.GET.get("page") or 1)
+                page_size = int(request.GET.get("page_size") or HISTORIAL_PAGE_SIZE)
+            except ValueError:
+                return Response({"detail": "page y page_size deben ser enteros."}, status=400)
+            if page < 1 or not 1 <= page_size <= HISTORIAL_MAX_PAGE_SIZE:
+                return Response(
+                    {"detail": f"page debe ser >= 1 y page_size entre 1 y {HISTORIAL_MAX_PAGE_SIZE}."},
+                    status=400,
+                )
+            return Response(historial_pagina(pk, page, page_size), status=200)
+
         arriendos = (
-            Arriendo.objects.filter(maquinaria=maq)
+            Arriendo.objects.filter(maquinaria_id=pk)
             .select_related("obra")
-            .prefetch_related("documentos")
+            .prefetch_related(
+                Prefetch(
+                    "documentos",
+                    queryset=Documento.objects.order_by("-fecha_emision", "-id"),
+                    to_attr="documentos_recientes",
+                )
+            )
             .order_by("-fecha_inicio", "-id")
         )
 
         historial = []
         for arr in arriendos:
-            doc = (
-                arr.documentos.all()
-                .order_by("-fecha_emision", "-id")
-                .first()
-            )
+            doc = arr.documentos_recientes[0] if arr.documentos_recientes else None
             doc_label = (
                 f"{doc.get_tipo_display()} {doc.numero}" if doc else "—"
             )
@@ -275,31 +599,132 @@ class MaquinariaViewSet(CriticalEntityViewSet):
             )
         return Response(historial, status=200)
 
+    @action(detail=False, methods=["get"], url_path="disponibles")
+    def disponibles(self, request):
+        """
+        Máquinas libres en todo ``[desde, hasta]`` (por defecto, hoy) que
+        cumplen ``categoria`` (una o varias, separadas por coma),
+        ``tipo_altura``, ``combustible`` y ``altura_min``/``altura_max``.
+        """
+        hoy = timezone.now().date()
+        desde_raw = (request.GET.get("desde") or "").strip()
+        desde = _parse_date(desde_raw) if desde_raw else hoy
+        hasta_raw = (request.GET.get("hasta") or "").strip()
+        hasta = _parse_date(hasta_raw) if hasta_raw else desde
+        if desde is None or hasta is None:
+            return Response({"detail": "desde y hasta deben tener formato YYYY-MM-DD."}, status=400)
+        if hasta < desde:
+            return Response({"detail": "hasta debe ser posterior o igual a desde."}, status=400)
+
+        maquinas = Maquinaria.objects.all()
+        categorias = [c.strip() for c in (request.GET.get("categoria") or "").split(",") if c.strip()]
+        if categorias:
+            maquinas = maquinas.filter(categoria__in=categorias)
+        for campo in ("tipo_altura", "combustible"):
+            valor = (request.GET.get(campo) or "").strip()
+            if valor:
+                maquinas = maquinas.filter(**{campo: valor})
+        for param, lookup in (("altura_min", "altura__gte"), ("altura_max", "altura__lte")):
+            raw = (request.GET.get(param) or "").strip()
+            if not raw:
+                continue
+            try:
+                maquinas = maquinas.filter(**{lookup: Decimal(raw.replace(",", "."))})
+            except (ArithmeticError, ValueError):
+                return Response({"detail": f"{param} debe ser numérico."}, status=400)
+
+        filas = list(
+            maquinas_disponibles(desde, hasta, maquinas, hoy=hoy)
+            .order_by("categoria", "marca", "modelo", "serie")
+            .values(*DISPONIBLE_VALUES)
+        )
+        for fila in filas:
+            # Igual que el DecimalField del serializer: texto, no float.
+            if fila["altura"] is not None:
+                fila["altura"] = str(fila["altura"])
+        return Response(
+            {"desde": desde, "hasta": hasta, "total": len(filas), "filas": filas},
+            status=200,
+        )
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="utilizacion",
+        permission_classes=[IsStaffOrSuperUser],
+    )
+    def utilizacion(self, request):
+        """
+        Días arrendada / en tránsito / disponible entre ``desde`` y ``hasta``
+        (por defecto, el mes en curso), agrupados por ``categoria`` o ``maquina``.
+        """
+        hoy = timezone.now().date()
+        fechas = {}
+        for nombre, defecto in (("desde", hoy.replace(day=1)), ("hasta", hoy)):
+            raw = (request.GET.get(nombre) or "").strip()
+            fechas[nombre] = _parse_date(raw) if raw else defecto
+            if fechas[nombre] is None:
+                return Response({"detail": f"{nombre} debe tener formato YYYY-MM-DD."}, status=400)
+        desde, hasta = fechas["desde"], fechas["hasta"]
+        if hasta < desde:
+            return Response({"detail": "hasta debe ser posterior o igual a desde."}, status=400)
+
+        agrupar = (request.GET.get("agrupar") or "categoria").strip().lower()
+        categoria = (request.GET.get("categoria") or "").strip()
+        if agrupar == "maquina":
+            maquinas = Maquinaria.objects.all()
+            if categoria:
+                maquinas = maquinas.filter(categoria=categoria)
+            filas, fuente = utilizacion_por_maquina(desde, hasta, maquinas), "vivo"
+        elif agrupar == "categoria":
+            filas, fuente = utilizacion_por_categoria(desde, hasta)
+            if categoria:
+                filas = [fila for fila in filas if fila["categoria"] == categoria]
+        else:
+            return Response({"detail": "agrupar debe ser 'categoria' o 'maquina'."}, status=400)
+
+        return Response(
+            {
+                "desde": desde,
+                "hasta": hasta,
+                "dias": (hasta - desde).days + 1,
+                "agrupar": agrupar,
+                "fuente": fuente,
+                "filas": filas,
+            },
+            status=200,
+        )
+
 
 # =======================
 #   Clientes
 # =======================
+def search_clientes(qs, q):
+    """Búsqueda del listado de clientes (RUT numérico o texto)."""
+    if q:
+        if q.isdigit():
+            normalized = Replace(
+                Replace(F("rut"), Value("."), Value("")),
+                Value("-"),
+                Value(""),
+            )
+            qs = qs.annotate(rut_norm=normalized).filter(
+                rut_norm__startswith=q
+            )
+        else:
+            qs = qs.filter(
+                Q(razon_social__icontains=q) | Q(rut__icontains=q)
+            )
+    return qs
+
+
 class ClienteViewSet(CriticalEntityViewSet):
     queryset = Cliente.objects.all()
     serializer_class = ClienteSerializer
 
     def list(self, request, *args, **kwargs):
         q = (request.GET.get("query") or "").strip()
-        qs = self.get_queryset()
-        if q:
-            if q.isdigit():
-                normalized = Replace(
-                    Replace(F("rut"), Value("."), Value("")),
-                    Value("-"),
-                    Value(""),
-                )
-                qs = qs.annotate(rut_norm=normalized).filter(
-                    rut_norm__startswith=q
-                )
-            else:
-                qs = qs.filter(
-                    Q(razon_social__icontains=q) | Q(rut__icontains=q)
-                )
+        qs = search_clientes(self.get_queryset(), q)
         serializer = self.get_serializer(qs, many=True)
         return Response(serializer.data)
 
@@ -329,13 +754,32 @@ class ArriendoViewSet(CriticalEntityViewSet):
         resp = super().create(request, *args, **kwargs)
         return resp
 
+    def perform_create(self, serializer):
+        arr = serializer.save()
+        publish_fleet_change("arriendo.creado", arriendo_ids=[arr.id])
+
+    def perform_update(self, serializer):
+        estado_anterior = serializer.instance.estado
+        maq_anterior = serializer.instance.maquinaria_id
+        arr = serializer.save()
+        if arr.estado != estado_anterior or arr.maquinaria_id != maq_anterior:
+            publish_fleet_change(
+                "arriendo.estado",
+                arriendo_ids=[arr.id],
+                maquinaria_ids=[maq_anterior],
+            )
+
 
 # =======================
 #   Documentos (consulta)
 # =======================
-class DocumentoViewSet(viewsets.ReadOnlyModelViewSet):
+class DocumentoViewSet(SparseFieldsMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsStaffOrSuperUser]
     serializer_class = DocumentoDetalleSerializer
+    sparse_expandable = {
+        "relacionado_con": Expansion(),
+        "relaciones_inversas": Expansion(many=True),
+    }
     queryset = (
         Documento.objects.select_related(
             "cliente", "arriendo", "obra_origen", "obra_destino", "relacionado_con"
@@ -365,6 +809,8 @@ class DocumentoViewSet(viewsets.ReadOnlyModelViewSet):
             qs = qs.filter(fecha_emision__lte=hasta)
 
         qs = qs.order_by("-fecha_emision", "-id")
+        if self.sparse is None and self.paginator is None and lean_enabled(self.basename):
+            return Response(documento_rows(qs))
         page = self.paginate_queryset(qs)
         if page is not None:
             ser = self.get_serializer(page, many=True)
@@ -373,11 +819,103 @@ class DocumentoViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(ser.data)
 
 
-class OrdenTrabajoViewSet(viewsets.ModelViewSet):
+def _like_escape(texto):
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def detalle_serie_sql(vendor, contiene=False):
+    """
+    SQL booleano: alguna línea de ``detalle_lineas`` tiene la serie buscada.
+
+    En ambos motores se compara la serie de cada línea recortada y en
+    minúsculas. ``trim``/``btrim`` solo quitan espacios, así que el término
+    se recorta igual (``strip(" ")``, no todo espacio Unicode). SQLite
+    recorre el JSON con ``json_each``; Postgres, cuando la búsqueda es
+    exacta, usa el índice GIN ``ot_detalle_series_gin`` sobre
+    ``ot_detalle_series(detalle_lineas)`` (migración 0019).
+    Devuelve ``(sql, armar_param)``.
+    """
+    columna = "{}.{}".format(
+        connection.ops.quote_name(OrdenTrabajo._meta.db_table),
+        connection.ops.quote_name("detalle_lineas"),
+    )
+    if vendor == "postgresql":
+        if not contiene:
+            return (
+                f"ot_detalle_series({columna}) @> ARRAY[%s]::text[]",
+                lambda serie: serie.strip(" ").lower(),
+            )
+        return (
+            "EXISTS (SELECT 1 FROM jsonb_array_elements("
+            f"CASE WHEN jsonb_typeof({columna}) = 'array' THEN {columna} ELSE '[]'::jsonb END"
+            ") AS l WHERE lower(btrim(l.value ->> 'serie')) LIKE lower(%s) ESCAPE '\\')",
+            lambda serie: f"%{_like_escape(serie.strip(' '))}%",
+        )
+
+    # SQLite (JSON1). CASE evita aplicar json_extract a elementos no objeto.
+    valor = "CASE WHEN l.type = 'object' THEN lower(trim(json_extract(l.value, '$.serie'))) END"
+    if contiene:
+        return (
+            f"EXISTS (SELECT 1 FROM json_each({columna}) AS l "
+            f"WHERE {valor} LIKE lower(%s) ESCAPE '\\')",
+            lambda serie: f"%{_like_escape(serie.strip(' '))}%",
+        )
+    return (
+        f"EXISTS (SELECT 1 FROM json_each({columna}) AS l WHERE {valor} = lower(%s))",
+        lambda serie: serie.strip(" "),
+    )
+
+
+def _detalle_serie_match(serie, contiene=False):
+    sql, param = detalle_serie_sql(connection.vendor, contiene)
+    return RawSQL(sql, (param(serie),), output_field=BooleanField())
+
+
+def search_ordenes(qs, serie="", q=""):
+    """Filtros ``serie`` (exacta en líneas) y ``query`` (búsqueda global) de /ordenes."""
+    if serie:
+        qs = qs.alias(_serie_en_lineas=_detalle_serie_match(serie)).filter(
+            _serie_en_lineas=True
+        )
+    if q:
+        condicion = (
+            Q(_serie_parcial=True)
+            | Q(cliente__razon_social__icontains=q)
+            | Q(cliente__rut__icontains=q)
+            | Q(maquinaria__serie__icontains=q)
+            | Q(obra_nombre__icontains=q)
+            | Q(orden_compra__icontains=q)
+        )
+        if q.isdigit():
+            condicion |= Q(id=int(q))
+        qs = qs.alias(_serie_parcial=_detalle_serie_match(q, contiene=True)).filter(condicion)
+    return qs
+
+
+# Pantallas de estado: además de JSON normal, ``?format=columns``.
+ESTADO_RENDERERS = [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer]
+
+# Claves que agrega ``_enrich_ot_rows`` y las columnas que lee para armarlas.
+OT_ENRICH_COLUMNS = (
+    "maquinaria__serie",
+    "cliente_rut_cache", "cliente_razon_cache", "cliente__rut", "cliente__razon_social",
+    "series_cache", "detalle_lineas",
+    "orden_compra_cache", "orden_compra", "observaciones",
+    "vendedor", "fecha_emision_doc",
+)
+OT_ENRICH_KEYS = (
+    "cliente_nombre", "cliente_razon_social",
+    "rut_cliente", "cliente_rut", "rut",
+    "serie", "maquinaria_serie", "series_maquinas", "series",
+    "orden_compra", "oc", "vendedor",
+)
+
+
+class OrdenTrabajoViewSet(SparseFieldsMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_permissions(self):
-        if self.action == "emitir":
+        if self.action in ("emitir", "emitir_lote"):
             return [CanEmitDocuments()]
         if self.action == "destroy":
             return [IsSuperUserOnly()]
@@ -397,6 +935,11 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
             "cliente", "arriendo", "maquinaria", "factura", "guia"
         )
     )
+    sparse_expandable = {"factura": Expansion(), "guia": Expansion()}
+    sparse_sources = {
+        "maquinaria_label": ("maquinaria__marca", "maquinaria__modelo", "maquinaria__serie"),
+    }
+    sparse_extra = {key: OT_ENRICH_COLUMNS for key in OT_ENRICH_KEYS}
 
 
     def _has_emitted_documents(self, ot):
@@ -433,62 +976,50 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
             )
         return super().destroy(request, *args, **kwargs)
 
+    def _publish_ot_change(self, tipo, ot):
+        publish_fleet_change(
+            tipo,
+            ot_ids=[ot.id],
+            arriendo_ids=[ot.arriendo_id],
+            maquinaria_ids=[ot.maquinaria_id],
+        )
+
     def _enrich_ot_rows(self, queryset, base_data):
         filas = []
         for ot, row in zip(queryset, base_data):
-            cli = ot.cliente
             maq = ot.maquinaria
 
-            rut = cli.rut if cli else ""
-            razon = cli.razon_social if cli else ""
-            serie_principal = maq.serie if maq else ""
-
-            series_lineas = []
-            det = getattr(ot, "detalle_lineas", None) or []
-            try:
-                for l in det:
-                    s = (l.get("serie") or "").strip()
-                    if s and s not in series_lineas:
-                        series_lineas.append(s)
-            except Exception:
-                pass
-
-            oc_attr = getattr(ot, "orden_compra", None)
-            if oc_attr:
-                oc = str(oc_attr)
+            # Derivados guardados al escribir la OT; las filas antiguas (NULL)
+            # se calculan al vuelo hasta correr refresh_ot_denormalized.
+            if ot.cliente_rut_cache is not None:
+                rut = ot.cliente_rut_cache
+                razon = ot.cliente_razon_cache or ""
             else:
-                oc = ""
-                obs = getattr(ot, "observaciones", "") or ""
-                m = re.search(r"OC:\s*(.+)", obs)
-                if m:
-                    oc = m.group(1).strip()
-
-            vendedor = getattr(ot, "vendedor", "") or ""
-
-            r = dict(row)
-            r.setdefault("cliente_nombre", razon)
-            r.setdefault("cliente_razon_social", razon)
-            r.setdefault("cliente_razon", razon)
-
-            r["rut_cliente"] = rut
-            r["cliente_rut"] = rut
-            r["rut"] = rut
-
-            r["serie"] = serie_principal
-            r["maquinaria_serie"] = serie_principal
+                cli = ot.cliente
+                rut = cli.rut if cli else ""
+                razon = cli.razon_social if cli else ""
 
-            r["series_maquinas"] = series_lineas
-            r["series"] = series_lineas
-
-            r["orden_compra"] = oc
-            r["oc"] = oc
-            r["vendedor"] = vendedor
-
-            r.setdefault("fecha_emision_doc", getattr(ot, "fecha_emision_doc", None))
-
-            filas.append(r)
+            filas.append(
+                enrich_ot_row(
+                    row,
+                    rut=rut,
+                    razon=razon,
+                    serie_principal=maq.serie if maq else "",
+                    series=(
+                        ot.series_cache if ot.series_cache is not None else ot.series_lineas()
+                    ),
+                    oc=(
+                        ot.orden_compra_cache
+                        if ot.orden_compra_cache is not None
+                        else ot.orden_compra_efectiva()
+                    ),
+                    vendedor=getattr(ot, "vendedor", "") or "",
+                    fecha_emision_doc=getattr(ot, "fecha_emision_doc", None),
+                )
+            )
         return filas
 
+    @idempotent("ordenes.create")
     def create(self, request, *args, **kwargs):
         data = request.data or {}
 
@@ -574,6 +1105,7 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
 
         # ---------- Procesar líneas / totales ----------
         detalle_lineas = []
+        maquinas_lineas = {}
         total_neto = Decimal("0")
         total_iva = Decimal("0")
         total_total = Decimal("0")
@@ -610,9 +1142,11 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
             total_iva += iva
             total_total += total
 
-            maq = Maquinaria.objects.filter(serie__iexact=serie).first()
+            maq = Maquinaria.objects.filter(serie__iexact=serie).order_by("id").first()
             if maq and maquinaria_principal is None:
                 maquinaria_principal = maq
+            if maq:
+                maquinas_lineas.setdefault(serie.lower(), maq.id)
 
             detalle_lineas.append(
                 {
@@ -668,6 +1202,22 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
             if periodo not in ("Dia", "Semana", "Mes"):
                 periodo = "Dia"
 
+            # Una ALTA no puede reservar una máquina ya ocupada en esas fechas.
+            if tipo == "ALTA":
+                hoy = timezone.now().date()
+                conflictos = conflictos_maquinas(
+                    {maquinaria_principal and maquinaria_principal.id, *maquinas_lineas.values()},
+                    desde, fin_ocupacion("Activo", desde, hasta, hoy), hoy=hoy,
+                )
+                if conflictos:
+                    return Response(
+                        {
+                            "detail": "Hay máquinas ya arrendadas en esas fechas.",
+                            "conflictos": conflictos,
+                        },
+                        status=409,
+                    )
+
             obra_obj = _resolve_or_create_obra(meta_obra, meta_direccion) if meta_obra else None
 
             # tarifa: usa el "valor" del equipo (sin flete)
@@ -706,6 +1256,8 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
             **extra_kwargs,
         )
 
+        OrdenTrabajoLinea.objects.bulk_create(build_lineas(ot, maquinas_lineas))
+
         if meta_oc and not hasattr(OrdenTrabajo, "orden_compra"):
             texto = (ot.observaciones or "").strip()
             if texto:
@@ -714,10 +1266,47 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
             ot.observaciones = texto
             ot.save(update_fields=["observaciones"])
 
+        self._publish_ot_change("ot.creada", ot)
         ser = self.get_serializer(ot)
         data_resp = self._enrich_ot_rows([ot], [ser.data])[0]
         return Response(data_resp, status=201)
 
+    def perform_update(self, serializer):
+        ot = serializer.save()
+        if "detalle_lineas" in serializer.validated_data:
+            sync_lineas(ot)
+
+    @staticmethod
+    def _filter_lineas(qs, params):
+        """Filtros sobre OrdenTrabajoLinea (``linea_*``), sin duplicar OT."""
+        lineas = OrdenTrabajoLinea.objects.filter(orden=OuterRef("pk"))
+        filtrado = False
+
+        serie = (params.get("linea_serie") or "").strip()
+        if serie:
+            lineas = lineas.alias(serie_lower=Lower("serie")).filter(
+                serie_lower=Lower(Value(serie))
+            )
+            filtrado = True
+
+        maq_id = (params.get("linea_maquinaria") or "").strip()
+        if maq_id:
+            if not maq_id.isdigit():
+                return qs.none()
+            lineas = lineas.filter(maquinaria_id=int(maq_id))
+            filtrado = True
+
+        desde = _parse_date(params.get("linea_desde"))
+        if desde:
+            lineas = lineas.filter(desde__gte=desde)
+            filtrado = True
+        hasta = _parse_date(params.get("linea_hasta"))
+        if hasta:
+            lineas = lineas.filter(desde__lte=hasta)
+            filtrado = True
+
+        return qs.filter(Exists(lineas)) if filtrado else qs
+
     def list(self, request, *args, **kwargs):
         qs = self.get_queryset()
 
@@ -743,22 +1332,44 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
                 factura__isnull=True,
             )
 
+        qs = self._filter_lineas(qs, request.GET)
+        qs = search_ordenes(
+            qs,
+            serie=(request.GET.get("serie") or "").strip(" "),
+            q=(request.GET.get("query") or "").strip(" "),
+        )
+
         qs = qs.order_by("-fecha_creacion")
+        if self.sparse is None and self.paginator is None and lean_enabled(self.basename):
+            return Response(ot_list_rows(qs))
         page = self.paginate_queryset(qs)
         if page is not None:
             ser = self.get_serializer(page, many=True)
-            data = self._enrich_ot_rows(page, list(ser.data))
+            data = self._list_rows(page, list(ser.data))
             return self.get_paginated_response(data)
 
         ser = self.get_serializer(qs, many=True)
-        data = self._enrich_ot_rows(qs, list(ser.data))
+        data = self._list_rows(qs, list(ser.data))
         return Response(data)
 
+    def _list_rows(self, queryset, base_data):
+        # Con ?fields= solo se enriquece si se pidió algún alias.
+        if self.sparse is not None and not self.sparse.wants_any(OT_ENRICH_KEYS):
+            return base_data
+        return self.sparse_rows(self._enrich_ot_rows(queryset, base_data))
+
     @action(detail=True, methods=["post"], url_path="emitir")
+    @idempotent("ordenes.emitir")
     def emitir(self, request, pk=None):
         ot = self.get_object()
-        data = request.data or {}
+        # Emisiones simultáneas de la misma OT se serializan con el lock de la
+        # fila: la segunda ve la guía/factura que dejó la primera.
+        with transaction.atomic():
+            _bloquear_ots([ot.pk])
+            ot = OrdenTrabajo.objects.get(pk=ot.pk)
+            return self._emitir(ot, request.data or {})
 
+    def _emitir(self, ot, data):
         tipo_doc = (data.get("tipo_documento") or "").upper().strip()
         accion_raw = str(data.get("accion") or "").lower().strip()
         facturable_flag = data.get("facturable", None)
@@ -814,374 +1425,168 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
                 status=400,
             )
 
-        fecha_emision = getattr(ot, "fecha_emision_doc", None) or timezone.now().date()
-
-        # ------- FACT -------
-        if tipo_doc == "FACT":
-            hoy = fecha_emision
-            cliente = ot.cliente
-            if not cliente:
-                return Response({"detail": "La orden no tiene cliente asociado."}, status=400)
-
-            if ot.tipo == "SERV":
-                arr = ot.arriendo
-                if arr is None:
-                    maq = _infer_maquinaria_from_ot(ot)
-                    fecha_desde, fecha_hasta = _infer_fechas_from_ot(ot)
-
-                    arr = Arriendo.objects.create(
-                        cliente=cliente,
-                        maquinaria=maq,
-                        obra=None,
-                        fecha_inicio=fecha_desde,
-                        fecha_termino=fecha_hasta,
-                        periodo="Dia",
-                        tarifa=ot.monto_neto or Decimal("0"),
-                        estado="Terminado",
-                    )
-                    ot.arriendo = arr
-                    ot.save(update_fields=["arriendo"])
-            else:
-                if not ot.arriendo_id:
-                    return Response(
-                        {
-                            "detail": (
-                                "La orden no tiene arriendo asociado; "
-                                "no se puede facturar todavía."
-                            )
-                        },
-                        status=400,
-                    )
-
-            arr = ot.arriendo
-            numero = _next_doc_number("FACT")
-            with transaction.atomic():
-                fact = Documento.objects.create(
-                    tipo="FACT",
-                    numero=numero,
-                    fecha_emision=hoy,
-                    monto_neto=ot.monto_neto or 0,
-                    monto_iva=ot.monto_iva or 0,
-                    monto_total=ot.monto_total or 0,
-                    arriendo=arr,
-                    cliente=cliente,
-                    obra_destino=arr.obra if arr and arr.obra_id else None,
-                    relacionado_con=ot.guia if ot.guia_id else None,
-                )
-
-                ot.factura = fact
-                ot.estado = "PROC"
-                ot.es_facturable = False
-                ot.fecha_cierre = timezone.now()
-                ot.save(update_fields=["factura", "estado", "es_facturable", "fecha_cierre"])
-
-            ser = self.get_serializer(ot)
-            data_resp = self._enrich_ot_rows([ot], [ser.data])[0]
-            return Response(data_resp, status=200)
-
-        # ------- GD -------
-        if ot.guia_id:
-            return Response({"detail": "La orden ya tiene una guía asociada."}, status=400)
-
-        # ✅ si falta arriendo en ALTA/PROL/TRAS lo creamos (para que nunca falle emitir GD)
-        if not ot.arriendo_id:
-            if ot.tipo in ("ALTA", "PROL", "TRAS"):
-                arr = _ensure_arriendo_for_ot(ot)
-                if not arr:
-                    return Response({"detail": "No se pudo crear arriendo asociado automáticamente."}, status=400)
-            else:
-                return Response(
-                    {"detail": "La orden no tiene arriendo asociado; no se puede emitir una guía todavía."},
-                    status=400,
-                )
-
-        arr = ot.arriendo
-        cliente = ot.cliente or (arr.cliente if arr and arr.cliente_id else None)
-        if not cliente:
-            return Response({"detail": "La orden no tiene cliente asociado."}, status=400)
-
-        numero = _next_doc_number("GD")
-
-        es_gd_facturable = facturable_flag is True
-        es_retiro = (ot.tipo == "RETI")  # ✅ retiro solo cuando es RETI
-
-        if es_gd_facturable:
-            monto_neto = ot.monto_neto or Decimal("0")
-            monto_iva = ot.monto_iva or Decimal("0")
-            monto_total = ot.monto_total or Decimal("0")
-        else:
-            monto_neto = Decimal("0")
-            monto_iva = Decimal("0")
-            monto_total = Decimal("0")
-
-        if ot.tipo == "ALTA":
-            obra_origen = None
-            obra_destino = arr.obra if arr and arr.obra_id else None
-        elif ot.tipo == "TRAS":
-            obra_origen = None
-            obra_destino = arr.obra if arr and arr.obra_id else None
-        elif ot.tipo == "RETI":
-            obra_origen = arr.obra if arr and arr.obra_id else None
-            obra_destino = None
-        else:
-            obra_origen = arr.obra if arr and arr.obra_id else None
-            obra_destino = None
+        detail = _preparar_emision(ot, tipo_doc)
+        if detail:
+            return Response({"detail": detail}, status=400)
+        _guardar_arriendos_nuevos([ot])
 
         with transaction.atomic():
-            gd = Documento.objects.create(
-                tipo="GD",
-                numero=numero,
-                fecha_emision=fecha_emision,
-                monto_neto=monto_neto,
-                monto_iva=monto_iva,
-                monto_total=monto_total,
-                arriendo=arr,
-                cliente=cliente,
-                obra_origen=obra_origen,
-                obra_destino=obra_destino,
-                es_retiro=es_retiro,
-            )
-
-            ot.guia = gd
-
-            if ot.tipo == "RETI":
-                ot.es_facturable = False
-                ot.estado = "PROC"
-                ot.fecha_cierre = timezone.now()
-
-                arr.estado = "Terminado"
-                arr.fecha_termino = fecha_emision
+            numero = _next_doc_numbers(tipo_doc, 1)[0]
+            doc = _documento_emision(ot, tipo_doc, numero, facturable_flag)
+            doc.save()
+            arr = _aplicar_emision(ot, doc, facturable_flag)
+            if arr is not None:
                 arr.save(update_fields=["estado", "fecha_termino"])
-
                 if arr.maquinaria_id:
-                    maq = arr.maquinaria
-                    maq.estado = "Disponible"
-                    maq.save(update_fields=["estado"])
-            else:
-                if es_gd_facturable:
-                    ot.es_facturable = True
-                    ot.estado = "PEND"
-                else:
-                    ot.es_facturable = False
-                    ot.estado = "PROC"
-
-            ot.save(update_fields=["guia", "es_facturable", "estado", "fecha_cierre"])
+                    arr.maquinaria.save(update_fields=["estado"])
+            ot.save(update_fields=EMISION_OT_FIELDS[tipo_doc])
 
+        self._publish_ot_change("ot.emitida", ot)
         ser = self.get_serializer(ot)
         data_resp = self._enrich_ot_rows([ot], [ser.data])[0]
         return Response(data_resp, status=200)
 
-    @action(detail=False, methods=["get"], url_path="estado-arriendos")
-    def estado_arriendos(self, request):
-        q = (request.GET.get("query") or "").strip()
-
-        arr_qs = (
-            _active_rentals().select_related("cliente", "maquinaria", "obra")
-            .prefetch_related("documentos", "ordenes")
-            .filter(maquinaria_id__isnull=False)
-        )
-
-        if q:
-            arr_qs = arr_qs.filter(
-                Q(cliente__razon_social__icontains=q)
-                | Q(cliente__rut__icontains=q)
-                | Q(maquinaria__marca__icontains=q)
-                | Q(maquinaria__modelo__icontains=q)
-                | Q(maquinaria__serie__icontains=q)
+    @action(detail=False, methods=["post"], url_path="emitir-lote")
+    @idempotent("ordenes.emitir_lote")
+    def emitir_lote(self, request):
+        """
+        Emite el mismo tipo de documento para muchas OTs (cierre de mes).
+
+        Body: ``tipo_documento`` ("FACT"/"GD"), ``ids`` (lista) o
+        ``solo_facturacion_pendiente: true`` y, para GD, ``facturable``.
+        Cada bloque de ``EMISION_LOTE_CHUNK_SIZE`` OTs va en su propia
+        transacción con folios correlativos; la respuesta trae el resultado
+        de cada OT en el orden pedido.
+        """
+        data = request.data or {}
+        tipo_doc = str(data.get("tipo_documento") or "").upper().strip()
+        if tipo_doc not in ("FACT", "GD"):
+            return Response(
+                {"detail": "tipo_documento inválido. Debe ser 'GD' o 'FACT'."}, status=400
             )
+        facturable = data.get("facturable", False)
+        if not isinstance(facturable, bool):
+            return Response({"detail": "facturable debe ser un booleano JSON."}, status=400)
 
-        def _label(doc):
-            if not doc:
-                return ""
-            if doc.tipo == "FACT":
-                pref = "F"
-            elif doc.tipo == "GD":
-                pref = "G"
-            else:
-                pref = doc.get_tipo_display()[0]
-            return f"{pref}{doc.numero}"
-
-        filas = []
-        for arr in arr_qs.order_by("id"):
-            if not arr.documentos.exists():
-                continue
-
-            ot = arr.ordenes.all().order_by("-fecha_creacion", "-id").first()
-
-            # ✅ preferimos lo que está asociado a la OT (consistencia con toasts)
-            gd = ot.guia if ot and ot.guia_id else (
-                arr.documentos.filter(tipo="GD", es_retiro=False).order_by("fecha_emision", "id").last()
-            )
-            fact = ot.factura if ot and ot.factura_id else (
-                arr.documentos.filter(tipo="FACT").order_by("fecha_emision", "id").last()
+        ids = data.get("ids")
+        solo_fact = (
+            str(data.get("solo_facturacion_pendiente") or "").lower().strip()
+            in ("1", "true", "t", "yes", "y")
+        )
+        if ids is not None:
+            if not isinstance(ids, list) or not all(type(i) is int for i in ids):
+                return Response({"detail": "ids debe ser una lista de enteros."}, status=400)
+            ids = list(dict.fromkeys(ids))
+        elif solo_fact:
+            ids = list(
+                OrdenTrabajo.objects.filter(
+                    estado="PEND", es_facturable=True, factura__isnull=True
+                )
+                .order_by("id")
+                .values_list("id", flat=True)
             )
-
-            if not gd and not fact:
-                # no hay nada relevante que mostrar
-                continue
-
-            ultimo_mov = gd or fact or arr.documentos.order_by("fecha_emision", "id").last()
-            if not ultimo_mov:
-                continue
-
-            doc_label = _label(ultimo_mov)
-            doc_tipo = ultimo_mov.tipo
-            doc_numero = ultimo_mov.numero
-            doc_fecha = ultimo_mov.fecha_emision
-
-            factura_label = _label(fact) if fact else ""
-            factura_numero = fact.numero if fact else None
-            factura_fecha = fact.fecha_emision if fact else None
-
-            if ot:
-                pref_ot = ot.tipo_comercial or (ot.tipo[:1] if ot.tipo else "OT")
-                folio_ot = f"{pref_ot}{str(ot.id).zfill(4)}"
-                oc = getattr(ot, "orden_compra", "") or ""
-                vendedor = getattr(ot, "vendedor", "") or ""
-                ot_tipo = ot.tipo
-            else:
-                folio_ot = ""
-                oc = ""
-                vendedor = ""
-                ot_tipo = ""
-
-            filas.append(
-                {
-                    "id": arr.id,  # id del arriendo
-                    "documento": doc_label or "—",
-                    "doc_tipo": doc_tipo,
-                    "doc_numero": doc_numero,
-                    "doc_fecha": doc_fecha,
-                    "factura": factura_label,
-                    "factura_numero": factura_numero,
-                    "factura_fecha": factura_fecha,
-                    "marca": arr.maquinaria.marca if arr.maquinaria_id else "",
-                    "modelo": arr.maquinaria.modelo if arr.maquinaria_id else "",
-                    "altura": getattr(arr.maquinaria, "altura", None) if arr.maquinaria_id else None,
-                    "serie": arr.maquinaria.serie if arr.maquinaria_id else "",
-                    "desde": arr.fecha_inicio,
-                    "hasta": arr.fecha_termino,
-                    "cliente": arr.cliente.razon_social if arr.cliente_id else "",
-                    "rut_cliente": arr.cliente.rut if arr.cliente_id else "",
-                    "obra": arr.obra.nombre if arr.obra_id else "",
-                    "ot_id": ot.id if ot else None,
-                    "ot_folio": folio_ot,
-                    "orden_compra": oc,
-                    "vendedor": vendedor,
-                    "ot_tipo": ot_tipo,
-                }
+        else:
+            return Response(
+                {"detail": "Indique ids o solo_facturacion_pendiente."}, status=400
             )
 
-        return Response(filas, status=200)
+        maximo = settings.EMISION_LOTE_MAX_ORDENES
+        if len(ids) > maximo:
+            return Response({"detail": f"Máximo {maximo} órdenes por lote."}, status=400)
 
-    @action(detail=False, methods=["get"], url_path="estado-bodega")
-    def estado_bodega(self, request):
-        q = (request.GET.get("query") or "").strip()
-        active_rental = _active_rentals().filter(maquinaria_id=OuterRef("pk"))
-        maq_qs = (
-            Maquinaria.objects.filter(estado__iexact="Disponible")
-            .annotate(_has_active_rental=Exists(active_rental))
-            .filter(_has_active_rental=False)
+        resultados = {}
+        size = max(settings.EMISION_LOTE_CHUNK_SIZE, 1)
+        for start in range(0, len(ids), size):
+            bloque = ids[start:start + size]
+            try:
+                with transaction.atomic():
+                    resultados.update(self._emitir_bloque(bloque, tipo_doc, facturable))
+            except DatabaseError:
+                # El bloque se revierte entero; los anteriores ya quedaron
+                # emitidos y un reintento solo toma las OTs pendientes.
+                for ot_id in bloque:
+                    resultados[ot_id] = {
+                        "id": ot_id, "ok": False, "detail": "Error al emitir; reintente.",
+                    }
+
+        filas = [
+            resultados.get(ot_id) or {"id": ot_id, "ok": False, "detail": "No encontrada."}
+            for ot_id in ids
+        ]
+        emitidas = sum(1 for fila in filas if fila["ok"])
+        metrics.incr("ordenes.emitir_lote.emitidas", emitidas)
+        return Response(
+            {
+                "tipo_documento": tipo_doc,
+                "emitidas": emitidas,
+                "fallidas": len(filas) - emitidas,
+                "resultados": filas,
+            },
+            status=200,
         )
 
-        if q:
-            maq_qs = maq_qs.filter(
-                Q(marca__icontains=q) | Q(modelo__icontains=q) | Q(serie__icontains=q)
-            )
-
-        def _label(doc):
-            if not doc:
-                return ""
-            if doc.tipo == "GD":
-                pref = "G"
-            elif doc.tipo == "FACT":
-                pref = "F"
-            else:
-                pref = doc.get_tipo_display()[0]
-            return f"{pref}{doc.numero}"
-
-        filas = []
-        for maq in maq_qs.order_by("marca", "modelo", "serie"):
-            arr_last = (
-                Arriendo.objects.filter(maquinaria=maq)
-                .select_related("obra", "cliente")
-                .order_by("-fecha_inicio", "-id")
-                .first()
-            )
-
-            gd_retiro = (
-                Documento.objects.filter(arriendo__maquinaria=maq, tipo="GD", es_retiro=True)
-                .order_by("fecha_emision", "id")
-                .last()
-            )
-
-            doc_label = _label(gd_retiro)
-            doc_fecha = gd_retiro.fecha_emision if gd_retiro else None
-            doc_numero = gd_retiro.numero if gd_retiro else None
-            doc_tipo = gd_retiro.tipo if gd_retiro else None
+    def _emitir_bloque(self, ids, tipo_doc, facturable):
+        # Mismo lock que /emitir, tomado antes de leer las OTs.
+        _bloquear_ots(ids)
+        ots = (
+            OrdenTrabajo.objects.filter(id__in=ids)
+            .select_related("arriendo__maquinaria", "cliente", "maquinaria")
+            .order_by("id")
+        )
 
-            fact = (
-                Documento.objects.filter(arriendo__maquinaria=maq, tipo="FACT")
-                .order_by("fecha_emision", "id")
-                .last()
-            )
-            factura_label = _label(fact) if fact else ""
-            factura_numero = fact.numero if fact else None
-            factura_fecha = fact.fecha_emision if fact else None
-
-            ot_retiro = (
-                OrdenTrabajo.objects.filter(guia=gd_retiro)
-                .order_by("-fecha_creacion", "-id")
-                .first()
-                if gd_retiro
-                else None
-            )
-            if ot_retiro:
-                pref_ot = ot_retiro.tipo_comercial or (ot_retiro.tipo[:1] if ot_retiro.tipo else "OT")
-                folio_ot = f"{pref_ot}{str(ot_retiro.id).zfill(4)}"
-                oc = getattr(ot_retiro, "orden_compra", "") or ""
-                vendedor = getattr(ot_retiro, "vendedor", "") or ""
-                ot_tipo = ot_retiro.tipo
-                ot_id = ot_retiro.id
+        resultados, listas, reservas = {}, [], {}
+        for ot in ots:
+            detail = _preparar_emision(ot, tipo_doc, reservas)
+            if detail:
+                resultados[ot.id] = {"id": ot.id, "ok": False, "detail": detail}
             else:
-                folio_ot = ""
-                oc = ""
-                vendedor = ""
-                ot_tipo = ""
-                ot_id = None
-
-            obra_nombre = ""
-            if arr_last and arr_last.obra_id:
-                obra_nombre = arr_last.obra.nombre
+                listas.append(ot)
+        if not listas:
+            return resultados
+        _guardar_arriendos_nuevos(listas)
+
+        numeros = _next_doc_numbers(tipo_doc, len(listas))
+        docs = [
+            _documento_emision(ot, tipo_doc, numero, facturable)
+            for ot, numero in zip(listas, numeros)
+        ]
+        Documento.objects.bulk_create(docs)
+        # bulk_create no dispara señales: el resumen de ingresos se suma aquí.
+        registrar_documentos(docs)
+
+        cerrados = [
+            arr
+            for arr in (_aplicar_emision(ot, doc, facturable) for ot, doc in zip(listas, docs))
+            if arr is not None
+        ]
+        OrdenTrabajo.objects.bulk_update(listas, EMISION_OT_FIELDS[tipo_doc])
+        if cerrados:
+            Arriendo.objects.bulk_update(cerrados, ["estado", "fecha_termino"])
+            Maquinaria.objects.filter(
+                id__in=[arr.maquinaria_id for arr in cerrados if arr.maquinaria_id]
+            ).update(estado="Disponible")
+
+        publish_fleet_change(
+            "ot.emitida",
+            ot_ids=[ot.id for ot in listas],
+            arriendo_ids=[ot.arriendo_id for ot in listas],
+            maquinaria_ids=[ot.maquinaria_id for ot in listas],
+        )
+        for ot, doc in zip(listas, docs):
+            resultados[ot.id] = {
+                "id": ot.id, "ok": True, "documento_id": doc.id, "numero": doc.numero,
+            }
+        return resultados
 
-            filas.append(
-                {
-                    "id": maq.id,
-                    "marca": maq.marca,
-                    "modelo": maq.modelo or "",
-                    "altura": getattr(maq, "altura", None),
-                    "serie": maq.serie or "",
-                    "cliente": CLIENTE_EMPRESA["razon_social"],
-                    "rut_cliente": CLIENTE_EMPRESA["rut"],
-                    "obra": obra_nombre,
-                    "desde": None,
-                    "hasta": None,
-                    "documento": doc_label,
-                    "doc_tipo": doc_tipo,
-                    "doc_numero": doc_numero,
-                    "doc_fecha": doc_fecha,
-                    "factura": factura_label,
-                    "factura_numero": factura_numero,
-                    "factura_fecha": factura_fecha,
-                    "ot_id": ot_id,
-                    "ot_folio": folio_ot,
-                    "orden_compra": oc,
-                    "vendedor": vendedor,
-                    "ot_tipo": ot_tipo,
-                }
-            )
+    @action(detail=False, methods=["get"], url_path="estado-arriendos", renderer_classes=ESTADO_RENDERERS)
+    def estado_arriendos(self, request):
+        q = (request.GET.get("query") or "").strip()
+        return Response(estado_arriendos_rows(q), status=200)
 
-        return Response(filas, status=200)
+    @action(detail=False, methods=["get"], url_path="estado-bodega", renderer_classes=ESTADO_RENDERERS)
+    def estado_bodega(self, request):
+        q = (request.GET.get("query") or "").strip()
+        return Response(estado_bodega_rows(q), status=200)
 
 
 # =======================
@@ -1206,39 +1611,85 @@ def register(request):
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@throttle_classes([LoginBruteForceThrottle])
 def login(request):
     username = (request.data.get("username") or "").strip()
     password = (request.data.get("password") or "")
     if not username or not password:
         return Response({"detail": "Usuario y contraseña son requeridos."}, status=400)
 
-    user = User.objects.filter(username__iexact=username).first()
-    if user:
-        sec = _get_or_create_sec(user)
-        if sec.is_locked:
-            return Response({"detail": 'Cuenta bloqueada. Use "Recuperar clave".'}, status=403)
+    # Estado reciente: inexistente o bloqueado se rechaza sin ir a la base.
+    state = get_login_state(username)
+    if state is not None:
+        metrics.incr("login.rejected_cached")
+    if state == LOGIN_LOCKED:
+        return Response({"detail": 'Cuenta bloqueada. Use "Recuperar clave".'}, status=403)
+    if state == LOGIN_UNKNOWN:
+        return Response({"detail": "Credenciales inválidas."}, status=400)
 
-    user = authenticate(username=username, password=password)
-    if user is None:
-        u = User.objects.filter(username__iexact=username).first()
-        if u:
-            sec = _get_or_create_sec(u)
-            sec.failed_attempts += 1
-            if sec.failed_attempts >= MAX_FAILED:
-                sec.is_locked = True
-                sec.locked_at = timezone.now()
-            sec.save(update_fields=["failed_attempts", "is_locked", "locked_at"])
+    # Una sola consulta (usa el índice sobre LOWER(username)): todos los
+    # usuarios que coinciden sin distinguir mayúsculas, con su UserSecurity.
+    candidatos = list(
+        User.objects.select_related("security")
+        .alias(username_lower=Lower("username"))
+        .filter(username_lower=Lower(Value(username)))
+        .order_by("pk")
+    )
+    if not candidatos:
+        # authenticate() igual: calcula un hash de relleno (mismo tiempo que
+        # un usuario existente) y emite user_login_failed.
+        authenticate(request, username=username, password=password)
+        set_login_state(username, LOGIN_UNKNOWN)
         return Response({"detail": "Credenciales inválidas."}, status=400)
 
-    sec = _get_or_create_sec(user)
+    # El bloqueo se lleva en el primer usuario que coincide (como antes con
+    # username__iexact); la clave se valida contra el usuario exacto.
+    titular = candidatos[0]
+    sec = getattr(titular, "security", None) or _get_or_create_sec(titular)
     if sec.is_locked:
+        set_login_state(username, LOGIN_LOCKED)
         return Response({"detail": 'Cuenta bloqueada. Use "Recuperar clave".'}, status=403)
 
+    # La clave la validan los AUTHENTICATION_BACKENDS (usuario exacto; un
+    # usuario inactivo o con otras mayúsculas falla con el mismo costo de hash).
+    user = authenticate(request, username=username, password=password)
+    if user is None or not user.is_active:
+        metrics.incr("login.failed")
+        # Los fallos se acumulan en caché y se escriben en lote; el bloqueo
+        # se aplica igual al llegar a MAX_FAILED fallos efectivos.
+        pendientes = add_pending_failure(titular.pk)
+        efectivos = sec.failed_attempts + pendientes
+        flush_every = getattr(settings, "LOGIN_FAILED_FLUSH_EVERY", 3)
+        if efectivos >= MAX_FAILED or pendientes >= flush_every:
+            # Suma en la base (F) y bloquea con un UPDATE condicional: un
+            # flush concurrente de otro worker no pisa estos fallos.
+            tomados = take_pending_failures(titular.pk)
+            filas = UserSecurity.objects.filter(pk=sec.pk)
+            if tomados:
+                filas.update(failed_attempts=F("failed_attempts") + tomados)
+            filas.filter(is_locked=False, failed_attempts__gte=MAX_FAILED).update(
+                is_locked=True, locked_at=timezone.now()
+            )
+            sec.refresh_from_db(fields=["failed_attempts", "is_locked", "locked_at"])
+            metrics.incr("login.failed_flush")
+        if sec.is_locked:
+            set_login_state(username, LOGIN_LOCKED)
+        return Response({"detail": "Credenciales inválidas."}, status=400)
+
+    # Se sigue con la instancia ya cargada (trae su UserSecurity).
+    user = next((u for u in candidatos if u.pk == user.pk), user)
+    if user.pk != titular.pk:
+        sec = getattr(user, "security", None) or _get_or_create_sec(user)
+        if sec.is_locked:
+            return Response({"detail": 'Cuenta bloqueada. Use "Recuperar clave".'}, status=403)
+    if pending_failures(user.pk):
+        clear_pending_failures(user.pk)
     if sec.failed_attempts:
         sec.failed_attempts = 0
         sec.save(update_fields=["failed_attempts"])
+    metrics.incr("login.success")
 
-    refresh = RefreshToken.for_user(user)
+    refresh = AuthzRefreshToken.for_user(user)
     data = {
         "access": str(refresh.access_token),
         "refresh": str(refresh),
@@ -1264,7 +1715,82 @@ def recover_start(request):
     return Response({"detail": "Si el correo existe, se enviarán instrucciones."}, status=200)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+@api_view(["GET"])
+@permission_classes([IsSuperUserOnly])
+def metricas(request):
+    """Contadores en memoria de este worker (ver api.metrics)."""
+    return Response(metrics.snapshot(), status=200)
+
+
+def _mes_o_fecha(raw, fin=False):
+    """``YYYY-MM`` (primer o último día del mes) o ``YYYY-MM-DD``; None si no sirve."""
+    if re.fullmatch(r"\d{4}-\d{2}", raw):
+        try:
+            inicio = _date.fromisoformat(f"{raw}-01")
+        except ValueError:
+            return None
+        if not fin:
+            return inicio
+        siguiente = inicio.replace(year=inicio.year + inicio.month // 12, month=inicio.month % 12 + 1)
+        return _date.fromordinal(siguiente.toordinal() - 1)
+    return _parse_date(raw) if re.fullmatch(r"\d{4}-\d{2}-\d{2}", raw) else None
+
+
+@api_view(["GET"])
+@permission_classes([IsStaffOrSuperUser])
+def reporte_ingresos(request):
+    """
+    Ingresos (FACT + ND − NC) entre ``desde`` y ``hasta`` (``YYYY-MM`` o
+    ``YYYY-MM-DD``; por defecto, el año en curso) agrupados por ``agrupar``
+    (``mes``, ``cliente``, ``categoria``, ``tipo``, separados por coma).
+    """
+    hoy = timezone.now().date()
+    fechas = {}
+    for nombre, defecto, fin in (
+        ("desde", hoy.replace(month=1, day=1), False),
+        ("hasta", hoy.replace(month=12, day=31), True),
+    ):
+        raw = (request.GET.get(nombre) or "").strip()
+        fechas[nombre] = _mes_o_fecha(raw, fin) if raw else defecto
+        if fechas[nombre] is None:
+            return Response(
+                {"detail": f"{nombre} debe tener formato YYYY-MM o YYYY-MM-DD."}, status=400
+            )
+    desde, hasta = fechas["desde"], fechas["hasta"]
+    if hasta < desde:
+        return Response({"detail": "hasta debe ser posterior o igual a desde."}, status=400)
+
+    agrupar = [g.strip() for g in (request.GET.get("agrupar") or "mes").lower().split(",") if g.strip()]
+    if not agrupar or any(g not in GRUPOS_INGRESO for g in agrupar):
+        return Response(
+            {"detail": f"agrupar admite: {', '.join(GRUPOS_INGRESO)}."}, status=400
+        )
+    agrupar = list(dict.fromkeys(agrupar))
+
+    cliente = (request.GET.get("cliente") or "").strip()
+    if cliente and not cliente.isdigit():
+        return Response({"detail": "cliente debe ser un id numérico."}, status=400)
+    tipo = (request.GET.get("tipo") or "").upper().strip()
+
+    filas, fuente = consultar_ingresos(
+        desde,
+        hasta,
+        agrupar,
+        cliente=int(cliente) if cliente else None,
+        categoria=(request.GET.get("categoria") or "").strip() or None,
+        tipo=tipo or None,
+    )
+    # Montos como texto, igual que los DecimalField de los serializers.
+    for fila in filas:
+        for campo in ("monto_neto", "monto_iva", "monto_total"):
+            fila[campo] = f"{fila[campo]:.2f}"
+    return Response(
+        {"desde": desde, "hasta": hasta, "agrupar": agrupar, "fuente": fuente, "filas": filas},
+        status=200,
+    )
+
+
+class UserViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = User.objects.order_by("id")
     serializer_class = UserSerializer
     permission_classes = [IsSuperUserOnly]
@@ -23,6 +23,20 @@ def env_list(name, default=None):
     return [item.strip() for item in value.split(',') if item.strip()]
 
 
+def env_int(name, default=0):
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    return int(value)
+
+
+def env_float(name, default=0.0):
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    return float(value)
+
+
 SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
 if not SECRET_KEY:
     raise RuntimeError(
@@ -78,6 +92,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # CORS primero
+    'api.compression.CompressionMiddleware',  # antes de todo lo que toque el body
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -113,6 +128,47 @@ DATABASES = {
     }
 }
 
+# --- Réplica de lectura (opcional) ---
+# Copia SQLite mantenida con `python manage.py sync_read_replica`. Solo atiende
+# acciones seguras de lectura (listados, estado, historial); ver api.db_routers.
+REPLICA_DB_NAME = os.environ.get('DJANGO_REPLICA_DB_NAME')
+if REPLICA_DB_NAME:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': REPLICA_DB_NAME,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['api.db_routers.ReadReplicaRouter']
+
+# Segundos que un usuario lee desde el primario después de escribir. La marca
+# vive en el caché: con réplica se exige un caché compartido (api.E001).
+REPLICA_STICKY_SECONDS = env_int('DJANGO_REPLICA_STICKY_SECONDS', default=15)
+
+# Stream SSE de cambios de flota (api.events). "local" sirve con un solo
+# worker; "database" comparte los eventos entre workers vía la tabla EventoFlota.
+FLEET_EVENTS_BROKER = os.environ.get('DJANGO_FLEET_EVENTS_BROKER', 'local')
+FLEET_EVENTS_POLL_SECONDS = env_float('DJANGO_FLEET_EVENTS_POLL_SECONDS', default=1.0)
+FLEET_EVENTS_HEARTBEAT_SECONDS = env_int('DJANGO_FLEET_EVENTS_HEARTBEAT_SECONDS', default=15)
+FLEET_EVENTS_MAX_STREAM_SECONDS = env_int('DJANGO_FLEET_EVENTS_MAX_STREAM_SECONDS', default=300)
+FLEET_EVENTS_RETENTION_SECONDS = env_int('DJANGO_FLEET_EVENTS_RETENTION_SECONDS', default=3600)
+
+# Caché de Django: throttle de login, fallos de login pendientes y estado
+# corto de login. LocMemCache es por proceso: con varios workers cada uno
+# lleva sus propias cubetas y contadores. En producción use un caché
+# compartido con add/incr atómicos (Redis o Memcached); `check --deploy`
+# avisa si sigue en LocMemCache.
+CACHE_BACKEND = (
+    os.environ.get('DJANGO_CACHE_BACKEND')
+    or 'django.core.cache.backends.locmem.LocMemCache'
+)
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', ''),
+    }
+}
+
 LANGUAGE_CODE = 'es-cl'
 TIME_ZONE = 'America/Santiago'
 USE_I18N = True
@@ -121,13 +177,65 @@ USE_TZ = False  # para que Date se guarde como yyyy-mm-dd simple
 STATIC_URL = 'static/'
 
 # ---------- DRF ----------
+# Autorización desde los claims del JWT (sin cargar User por request); ver
+# api.authentication. Desactivado por defecto.
+JWT_STATELESS_AUTHZ = env_bool('DJANGO_JWT_STATELESS_AUTHZ', default=False)
+AUTHZ_VERSION_CACHE_SECONDS = env_int('DJANGO_AUTHZ_VERSION_CACHE_SECONDS', default=30)
+# Segundos que login recuerda un usuario inexistente o bloqueado.
+LOGIN_STATE_CACHE_SECONDS = env_int('DJANGO_LOGIN_STATE_CACHE_SECONDS', default=60)
+
+# Throttle de login (token bucket en caché): ráfaga y recarga por minuto, por IP
+# y por IP + usuario. Los fallos se escriben en UserSecurity cada N intentos.
+LOGIN_THROTTLE_IP_BURST = env_int('DJANGO_LOGIN_THROTTLE_IP_BURST', default=30)
+LOGIN_THROTTLE_IP_PER_MINUTE = env_int('DJANGO_LOGIN_THROTTLE_IP_PER_MINUTE', default=30)
+LOGIN_THROTTLE_USER_BURST = env_int('DJANGO_LOGIN_THROTTLE_USER_BURST', default=10)
+LOGIN_THROTTLE_USER_PER_MINUTE = env_int('DJANGO_LOGIN_THROTTLE_USER_PER_MINUTE', default=5)
+LOGIN_FAILED_FLUSH_EVERY = env_int('DJANGO_LOGIN_FAILED_FLUSH_EVERY', default=3)
+
+# Listados servidos desde filas values() en vez de ModelSerializer (mismo JSON).
+# Basenames del router, p. ej. "ordenes,documentos".
+LEAN_READ_ENDPOINTS = env_list('DJANGO_LEAN_READ_ENDPOINTS', default=[])
+
+# Renderer/parser JSON con orjson (api/renderers.py).
+FAST_JSON = env_bool('DJANGO_FAST_JSON', default=True)
+
+# Compresión gzip/brotli de respuestas (api/compression.py). Las rutas
+# excluidas devuelven tokens o CSRF: no se comprimen (BREACH).
+COMPRESSION_ENABLED = env_bool('DJANGO_COMPRESSION_ENABLED', default=True)
+COMPRESSION_MIN_BYTES = env_int('DJANGO_COMPRESSION_MIN_BYTES', default=1024)
+COMPRESSION_EXCLUDED_PATHS = env_list(
+    'DJANGO_COMPRESSION_EXCLUDED_PATHS', default=['/auth/', '/admin/']
+)
+
+# Vigencia de las respuestas guardadas por Idempotency-Key (api/idempotency.py).
+IDEMPOTENCY_TTL_SECONDS = env_int('DJANGO_IDEMPOTENCY_TTL_SECONDS', default=86400)
+# Plazo de una solicitud en curso: pasado este tiempo un reintento la retoma.
+# Debe superar el timeout de los workers.
+IDEMPOTENCY_LEASE_SECONDS = env_int('DJANGO_IDEMPOTENCY_LEASE_SECONDS', default=300)
+
+# POST /ordenes/emitir-lote: OTs por transacción y tope de OTs por llamada.
+EMISION_LOTE_CHUNK_SIZE = env_int('DJANGO_EMISION_LOTE_CHUNK_SIZE', default=200)
+EMISION_LOTE_MAX_ORDENES = env_int('DJANGO_EMISION_LOTE_MAX_ORDENES', default=2000)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # <— JWT
+        'api.authentication.StatelessJWTAuthentication'
+        if JWT_STATELESS_AUTHZ
+        else 'rest_framework_simplejwt.authentication.JWTAuthentication',  # <— JWT
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',  # <— exigir login por defecto
     ],
+    # JSON con orjson (misma salida que DRF); sin orjson cae al de DRF.
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer' if FAST_JSON else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.FastJSONParser' if FAST_JSON else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 # ---------- SIMPLE JWT ----------
@@ -143,6 +251,9 @@ SIMPLE_JWT = {
     # Opcional: si quisieras rotar refresh tokens
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': False,
+
+    # /auth/refresh vuelve a sellar los claims de autorización (api.authentication)
+    'TOKEN_REFRESH_SERIALIZER': 'api.authentication.AuthzTokenRefreshSerializer',
 }
 
 # ---------- CORS ----------
@@ -161,6 +272,7 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'x-requested-with',
+    'idempotency-key',
 ]
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -1,8 +1,8 @@
 // src/components/CrearOT.jsx
-import { useMemo, useState, useEffect } from "react";
+import { useMemo, useState, useEffect, useRef } from "react";
 import { useLocation, useNavigate } from "react-router-dom";
 import { useAuth } from "../context/AuthContext";
-import { authFetch } from "../lib/api";
+import { authFetch, newIdempotencyKey } from "../lib/api";
 import { toast } from "react-toastify";
 
 const TIPO_OT = [
@@ -125,6 +125,7 @@ export default function CrearOT() {
   const location = useLocation();
 
   const [saving, setSaving] = useState(false);
+  const createKeyRef = useRef(null); // Idempotency-Key del POST /ordenes en curso
 
   // "NUEVA" | "RETIRO" | "EDITAR"
   const [modo, setModo] = useState("NUEVA");
@@ -829,9 +830,14 @@ export default function CrearOT() {
 
       if (arriendoId) payload.arriendo_id = arriendoId;
 
+      // Misma clave mientras no se cree la OT: un doble envío o reintento no duplica.
+      if (!createKeyRef.current) createKeyRef.current = newIdempotencyKey("ot-crear");
       const res = await authFetch(`${backendURL}/ordenes`, {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: {
+          "Content-Type": "application/json",
+          "Idempotency-Key": createKeyRef.current,
+        },
         token: auth?.access,
         refreshToken: auth?.refresh,
         backendURL,
@@ -843,6 +849,7 @@ export default function CrearOT() {
         throw new Error(txt || `Error ${res.status} al crear la OT`);
       }
 
+      createKeyRef.current = null;
       const otCreada = await res.json().catch(() => null);
       if (otCreada && otCreada.id) {
         // dejamos la OT lista para poder eliminarla si aún no tiene docs
@@ -3,6 +3,7 @@ import React, { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import { useAuth } from "../context/AuthContext";
 import { authFetch } from "../lib/api";
+import { decodeColumns } from "../lib/columns";
 
 function formatearFecha(fecha) {
   if (!fecha) return "—";
@@ -49,8 +50,8 @@ export default function EstadoArriendoMaquinas() {
     try {
       const base =
         targetTab === "bodega"
-          ? `${backendURL}/ordenes/estado-bodega`
-          : `${backendURL}/ordenes/estado-arriendos`;
+          ? `${backendURL}/ordenes/estado-bodega?format=columns`
+          : `${backendURL}/ordenes/estado-arriendos?format=columns`;
 
       const res = await authFetch(base, {
         method: "GET",
@@ -63,7 +64,7 @@ export default function EstadoArriendoMaquinas() {
         console.error("Error al cargar estado:", res.status);
         return;
       }
-      const data = await res.json();
+      const data = decodeColumns(await res.json());
       if (!Array.isArray(data)) return;
 
       if (targetTab === "bodega") setRowsBodega(data);
@@ -209,7 +210,8 @@ export default function EstadoArriendoMaquinas() {
                 </tr>
               ) : (
                 currentRows.map((row) => {
-                  const key = `${tab}-${row.id}`;
+                  // Un arriendo multi-máquina trae una fila por ítem (mismo id).
+                  const key = `${tab}-${row.id}-${row.item_id ?? ""}`;
                   const isHover = hoverKey === key;
                   const hoverStyle = isHover ? { background: "rgba(255,255,255,.03)" } : undefined;
 
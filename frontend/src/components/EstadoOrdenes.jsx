@@ -1,7 +1,7 @@
 // src/components/EstadoOrdenes.jsx
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useMemo, useRef, useState } from "react";
 import { useAuth } from "../context/AuthContext";
-import { authFetch } from "../lib/api";
+import { authFetch, newIdempotencyKey } from "../lib/api";
 import { toast } from "react-toastify";
 
 const PREFIX_TIPO = {
@@ -228,6 +228,8 @@ export default function EstadoOrdenes({ setView }) {
 
   // modal EMITIR
   const [otEmitir, setOtEmitir] = useState(null);
+  // Idempotency-Key por OT + acción, hasta que el backend confirme la emisión
+  const emitirKeysRef = useRef({});
 
   // ===== Cargar órdenes desde backend =====
   const load = async () => {
@@ -326,10 +328,20 @@ export default function EstadoOrdenes({ setView }) {
     const tipoDocumento =
       accion === "facturar" || accion === "emitir_factura" ? "FACT" : "GD";
 
+    // Misma clave mientras no haya respuesta OK: un reintento tras un
+    // timeout recibe la respuesta guardada en vez de emitir de nuevo.
+    const claveEmision = `${ot.id}:${accion}`;
+    if (!emitirKeysRef.current[claveEmision]) {
+      emitirKeysRef.current[claveEmision] = newIdempotencyKey(`ot-${ot.id}-emitir`);
+    }
+
     try {
       const res = await authFetch(`${backendURL}/ordenes/${ot.id}/emitir`, {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: {
+          "Content-Type": "application/json",
+          "Idempotency-Key": emitirKeysRef.current[claveEmision],
+        },
         token: auth?.access,
         body: JSON.stringify({
           accion, // p.ej.: "guia_no_facturable", "guia_facturable", "facturar"
@@ -345,6 +357,8 @@ export default function EstadoOrdenes({ setView }) {
         throw new Error(txt || `Error ${res.status} al emitir documento`);
       }
 
+      delete emitirKeysRef.current[claveEmision];
+
       // Intentamos leer el documento (guía o factura) que devuelve el backend
       let numeroDoc = null;
       let tipoDocRespuesta = tipoDocumento;
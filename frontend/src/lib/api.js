@@ -98,3 +98,17 @@ export async function authFetch(url, options = {}) {
 }
 
 
+
+/**
+ * newIdempotencyKey:
+ *   Valor para el header `Idempotency-Key` de POST que crean cosas
+ *   (crear OT, emitir GD/FACT). Reusar la misma clave en los reintentos de
+ *   una misma acción hace que el backend devuelva la respuesta original.
+ */
+export function newIdempotencyKey(prefix = "req") {
+  const rnd =
+    globalThis.crypto && typeof globalThis.crypto.randomUUID === "function"
+      ? globalThis.crypto.randomUUID()
+      : `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+  return `${prefix}-${rnd}`;
+}
@@ -0,0 +1,32 @@
+// frontend/src/lib/columns.js
+
+/**
+ * decodeColumns:
+ *   Convierte la respuesta de `?format=columns` del backend de vuelta a una
+ *   lista de objetos (misma forma que el JSON normal).
+ *     { columns, dicts, rows }          -> orient "rows" (por defecto)
+ *     { columns, dicts, data }          -> orient "columns"
+ *   Las columnas presentes en `dicts` vienen como índice al diccionario.
+ *   Si la respuesta ya es una lista (o un error), se devuelve tal cual.
+ */
+export function decodeColumns(payload) {
+  if (!payload || payload.format !== "columns") return payload;
+
+  const { columns = [], dicts = {}, count = 0 } = payload;
+  const lookups = columns.map((col) => dicts[col] || null);
+  const value = (c, raw) => {
+    const dict = lookups[c];
+    return dict && raw !== null && raw !== undefined ? dict[raw] : raw;
+  };
+
+  const out = new Array(count);
+  for (let i = 0; i < count; i += 1) {
+    const row = {};
+    for (let c = 0; c < columns.length; c += 1) {
+      const raw = payload.orient === "columns" ? payload.data[c][i] : payload.rows[i][c];
+      row[columns[c]] = value(c, raw);
+    }
+    out[i] = row;
+  }
+  return out;
+}